@@ -0,0 +1,129 @@
+from langchain.tools import tool
+import pandas as pd
+import logging
+from typing import Dict, Optional
+from config.settings import settings
+from utils.embedding_utils import EmbeddingService, get_embedding_service
+from utils.dataset_utils import resolve_dataframe
+from utils.column_index import get_column_index
+from utils.multi_dataset import MultiDataset
+from utils.parallel_query import should_parallelize
+from utils.tracing import set_attribute, traced
+from utils.query_engine import build_plan, execute_plan, format_answer, result_label
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisAgent:
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        """Usa o serviço de embeddings compartilhado do processo."""
+        self.embeddings = embedding_service or get_embedding_service()
+
+    @property
+    def model(self):
+        return self.embeddings.model
+
+    @staticmethod
+    def _column_total(df: pd.DataFrame, column: str, dataset: Optional[MultiDataset]):
+        """Soma da coluna: no dataset completo quando o df é só uma amostra (modo SQL ou vários CSVs)."""
+        if dataset is not None:
+            return dataset.column_sum(column)
+        return df[column].sum()
+
+    @tool("Analyze data and answer query")
+    @traced("Análise")
+    def analyze_and_answer(self, processed_data: Dict, query: str) -> Dict:
+        """
+        Analisa os dados e responde à pergunta do usuário usando embeddings para queries complexas.
+
+        Args:
+            processed_data: Dados processados no formato serializável
+            query: Pergunta do usuário
+
+        Returns:
+            Dicionário com a resposta e metadados; 'resolved' indica se a pergunta foi
+            respondida de forma determinística (sem precisar do LLM)
+        """
+        try:
+            logger.info(f"Analisando dados para a query: {query}")
+
+            # No modo SQL, em blocos, com vários CSVs, com índice de estatísticas ou em datasets grandes
+            # só uma amostra é carregada (para escolher colunas e montar o plano); as agregações vêm do
+            # índice, rodam no banco, bloco a bloco, em paralelo ou só sobre as colunas necessárias
+            handle = processed_data.get('data_handle')
+            dataset = None
+            if handle and (handle.get('format') in ('sql', 'multi') or handle.get('stats')
+                           or handle.get('chunked') or should_parallelize(handle)):
+                dataset = MultiDataset.from_handle(handle)
+                df = dataset.sample(settings.COLUMN_SAMPLE_SCAN_ROWS)
+            else:
+                # Carrega o dataset colunar referenciado pelo handle (ou registros inline legados);
+                # cópia rasa para não alterar o DataFrame compartilhado pelo cache de datasets
+                df = resolve_dataframe(processed_data).copy(deep=False)
+                df.columns = df.columns.str.lower()
+
+            # Gerar embedding da query
+            query_embedding = self.embeddings.encode(query.lower())
+
+            # Índice de colunas do dataset (amostras limitadas + matriz de embeddings normalizada)
+            index = get_column_index(df, self.embeddings, key=handle['path'] if handle else None)
+            relevant_columns = index.top_k(query_embedding, k=settings.ANALYSIS_TOP_K_COLUMNS)
+            most_relevant_col = relevant_columns[0][0]
+
+            # Análises básicas com base na coluna mais relevante
+            result = {
+                'query': query,
+                'answer': None,
+                'analysis': None,
+                'resolved': False,
+                'relevant_columns': relevant_columns,
+                'data_sample': processed_data['metadata']['sample']
+            }
+
+            # Agregações estruturadas: soma, contagem, média, top-N, agrupamentos e filtros de data
+            plan = build_plan(query, df, [col for col, _ in relevant_columns])
+            set_attribute('rows', processed_data['metadata']['num_rows'])
+            set_attribute('operation', plan['operation'] if plan else None)
+            if plan is not None:
+                if dataset is not None:
+                    aggregation, plan = dataset.execute_plan(plan)
+                else:
+                    aggregation = execute_plan(df, plan)
+                result['plan'] = plan
+                result['answer'] = format_answer(plan, aggregation)
+                if 'value' in aggregation:
+                    result['analysis'] = {result_label(plan): aggregation['value']}
+                else:
+                    result['table'] = aggregation['table']
+                result['resolved'] = True
+
+            # Lógica de análise aprimorada
+            elif 'total' in query.lower() and most_relevant_col in df.columns:
+                if pd.api.types.is_numeric_dtype(df[most_relevant_col]):
+                    total = self._column_total(df, most_relevant_col, dataset)
+                    result['answer'] = f"O total de {most_relevant_col} é {total:,.2f}"
+                    result['analysis'] = {f'total_{most_relevant_col}': total}
+                    result['resolved'] = True
+                else:
+                    result['answer'] = f"A coluna {most_relevant_col} não é numérica."
+
+            elif 'quantidade' in query.lower() and most_relevant_col in df.columns:
+                if pd.api.types.is_numeric_dtype(df[most_relevant_col]):
+                    count = self._column_total(df, most_relevant_col, dataset)
+                    result['answer'] = f"A quantidade total de {most_relevant_col} é {count:,.0f}"
+                    result['analysis'] = {f'total_{most_relevant_col}': count}
+                    result['resolved'] = True
+                else:
+                    result['answer'] = f"A coluna {most_relevant_col} não é numérica."
+
+            else:
+                # Resposta genérica baseada na coluna mais relevante
+                sample = df[most_relevant_col].head(5).to_list()
+                result['answer'] = f"Dados relevantes em '{most_relevant_col}': {', '.join(map(str, sample))}"
+                result['analysis'] = {f'sample_{most_relevant_col}': sample}
+
+            logger.info(f"Análise concluída. Resposta: {result['answer']}")
+            return result
+        except Exception as e:
+            logger.error(f"Erro na análise: {e}")
+            return {'error': str(e)}
\ No newline at end of file
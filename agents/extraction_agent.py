@@ -1,20 +1,67 @@
 from langchain.tools import tool
-from utils.logging_utils import log_agent
+from typing import Optional
+from config.settings import settings
+from utils.dataset_cache import get_dataset_cache
+from utils.file_utils import list_zip_csv_members
+from utils.tracing import set_attribute, traced
+import shutil
+import threading
 import zipfile
 import os
 
-class ExtractionAgent:
-    def __init__(self, monitor=None):
-        self.monitor = monitor  # Recebe o monitor
 
+def _extract_once(zip_ref: zipfile.ZipFile, extract_to: str):
+    """Extrai em um diretório temporário e renomeia: jobs concorrentes do mesmo upload não se misturam."""
+    if os.path.isdir(extract_to):
+        return
+    tmp_dir = f"{extract_to}.{os.getpid()}.{threading.get_ident()}.tmp"
+    zip_ref.extractall(tmp_dir)
+    try:
+        os.replace(tmp_dir, extract_to)
+    except OSError:
+        # Outro job concluiu a mesma extração antes
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class ExtractionAgent:
     @tool
-    @log_agent("Extração de ZIP")
-    def extract_zip_files(self, zip_path: str):
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            files = zip_ref.namelist()
-            zip_ref.extractall('data/temp')
+    @traced("Extração de ZIP")
+    def extract_zip_files(self, zip_path: str, stream: Optional[bool] = None, dataset_key: Optional[str] = None,
+                          extract_to: str = 'data/temp'):
+        """Lista os CSVs do ZIP. Em modo streaming os membros são lidos direto do ZIP, sem extração em disco."""
+        dataset = get_dataset_cache().get(dataset_key)
+        if dataset is not None and dataset.files is not None:
             return {
                 'success': True,
-                'files': files,
-                'extracted_to': 'data/temp'
-            }
\ No newline at end of file
+                'files': dataset.files,
+                'extracted_to': None,
+                'dataset_key': dataset_key
+            }
+
+        stream = settings.ZIP_STREAMING if stream is None else stream
+        if stream:
+            result = {
+                'success': True,
+                'files': list_zip_csv_members(zip_path),
+                'extracted_to': None
+            }
+        else:
+            if dataset is not None:
+                # Extração do upload, reaproveitada entre jobs e preservada na limpeza dos workspaces
+                extract_to = os.path.join(dataset.directory, 'extracted')
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                if dataset is not None:
+                    _extract_once(zip_ref, extract_to)
+                else:
+                    zip_ref.extractall(extract_to)
+                result = {
+                    'success': True,
+                    'files': [os.path.join(extract_to, name) for name in zip_ref.namelist()],
+                    'extracted_to': extract_to
+                }
+
+        if dataset is not None:
+            dataset.files = result['files']
+        result['dataset_key'] = dataset_key
+        set_attribute('files', len(result['files']))
+        return result
\ No newline at end of file
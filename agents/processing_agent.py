@@ -1,45 +1,301 @@
 from langchain.tools import tool
-#import pandas as pd
+import pandas as pd
 import logging
-from typing import Dict
-from utils.file_utils import load_csv
+from typing import Dict, List, Optional
+from config.settings import settings
+from utils.file_utils import is_zip_member, iter_csv_chunks, load_csv, split_zip_member
+from utils.sql_backend import SQLBackend, table_name_for
+from utils.dataset_utils import save_dataframe, union_handle
+from utils.nfe_schema import detect_schema
+from utils.column_stats import DatasetStats, build_stats, stats_path_for
+from utils.dataset_cache import DatasetEntry, get_dataset_cache
+from utils.tracing import set_attribute, traced
+import hashlib
+import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
+
+def _warehouse_key(csv_path: str) -> str:
+    """Sem o hash do upload, um banco por ZIP (ou diretório): os CSVs dele precisam estar juntos para joins."""
+    source = split_zip_member(csv_path)[0] if is_zip_member(csv_path) else os.path.dirname(csv_path)
+    return hashlib.sha256(os.path.abspath(source).encode('utf-8')).hexdigest()
+
+
+def process_into_warehouse(csv_path: str, dataset_key: Optional[str] = None) -> Dict:
+    """Carrega o CSV (uma única vez, em blocos) no banco embarcado do upload e retorna o handle da tabela."""
+    key = dataset_key or _warehouse_key(csv_path)
+    warehouse = SQLBackend.for_dataset(key)
+    table = table_name_for(csv_path)
+
+    stats_path = f"{os.path.splitext(warehouse.database)[0]}_{table}.stats.json"
+    partial: List[DatasetStats] = []
+
+    def collect_stats(chunk: pd.DataFrame):
+        # Índice de estatísticas na mesma leitura do CSV: um por bloco, mesclados no final
+        chunk_stats = DatasetStats.from_frame(chunk)
+        partial[:] = [partial[0].merge(chunk_stats) if partial else chunk_stats]
+
+    logger.info(f"Carregando {csv_path} na tabela {table} de {warehouse.database}")
+    num_rows = warehouse.load_csv(table, csv_path, on_chunk=collect_stats if settings.STATS_ENABLED else None)
+    if partial:
+        partial[0].save(stats_path)
+    sample = warehouse.head(table, 1)
+    data_handle = {
+        'format': 'sql',
+        'engine': warehouse.engine,
+        'database': warehouse.database,
+        'table': table,
+        'path': f"{warehouse.database}#{table}",
+        'num_rows': num_rows,
+        'columns': list(sample.columns)
+    }
+    if settings.STATS_ENABLED and os.path.exists(stats_path):
+        data_handle['stats'] = [stats_path]
+    return {
+        'data_handle': data_handle,
+        'metadata': {
+            'columns': list(sample.columns),
+            'num_rows': num_rows,
+            'sample': sample.to_dict(orient='records')[0] if not sample.empty else {}
+        }
+    }
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Pré-processamento básico; preenche vazios só nas colunas textuais para manter os dtypes."""
+    df = df.dropna(how='all')
+    text_columns = [
+        col for col in df.columns
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])
+    ]
+    if text_columns:
+        df[text_columns] = df[text_columns].fillna('')
+    return df
+
+
+def process_in_chunks(csv_path: str, workspace: Optional[str] = None, name: Optional[str] = None) -> Dict:
+    """
+    Processa o CSV em blocos de PROCESSING_CHUNK_SIZE linhas: cada bloco é limpo e salvo como
+    uma parte Parquet, e o índice de estatísticas é acumulado bloco a bloco. O arquivo nunca
+    fica inteiro em memória; o handle é uma união 'chunked', agregada parte a parte na análise.
+    """
+    name = name or uuid.uuid4().hex
+    parts: List[Dict] = []
+    stats: Optional[DatasetStats] = None
+    columns, sample, rows = None, {}, 0
+    for i, chunk in enumerate(iter_csv_chunks(csv_path, settings.PROCESSING_CHUNK_SIZE)):
+        chunk = clean_frame(chunk)
+        if columns is None:
+            columns = list(chunk.columns)
+        if chunk.empty:
+            continue
+        if not sample:
+            sample = chunk.head(1).to_dict(orient='records')[0]
+        parts.append(save_dataframe(chunk, workspace, name=f"{name}_{i:05d}"))
+        if settings.STATS_ENABLED:
+            chunk_stats = DatasetStats.from_frame(chunk)
+            stats = stats.merge(chunk_stats) if stats is not None else chunk_stats
+        rows += len(chunk)
+
+    if not parts:
+        parts.append(save_dataframe(pd.DataFrame(columns=columns or []), workspace, name=f"{name}_00000"))
+    data_handle = dict(union_handle(parts), chunked=True)
+    if stats is not None:
+        stats_path = os.path.join(os.path.dirname(parts[0]['path']), f"{name}.stats.json")
+        stats.save(stats_path)
+        data_handle['stats'] = [stats_path]
+    set_attribute('rows', rows)
+    set_attribute('chunks', len(parts))
+    logger.info(f"{csv_path} processado em {len(parts)} bloco(s) ({rows} linhas)")
+    return {
+        'data_handle': data_handle,
+        'metadata': {'columns': columns or [], 'num_rows': rows, 'sample': sample}
+    }
+
+
+def _backend_of(handle: Dict) -> str:
+    if handle['format'] == 'sql':
+        return 'sql'
+    return 'chunked' if handle.get('chunked') else 'parquet'
+
+
+def _handle_exists(handle: Dict) -> bool:
+    if handle['format'] == 'sql':
+        return True
+    if handle['format'] == 'union':
+        return all(_handle_exists(part) for part in handle['parts'])
+    return os.path.exists(handle['path'])
+
+
+def _process_csv(csv_path: str, workspace: Optional[str], dataset_key: Optional[str],
+                 dataset: Optional[DatasetEntry], backend: str) -> Dict:
+    cached = dataset.processed.get(csv_path) if dataset is not None else None
+    if cached is not None and _backend_of(cached['data_handle']) == backend \
+            and _handle_exists(cached['data_handle']):
+        logger.info(f"Reaproveitando processamento em cache: {csv_path}")
+        return cached
+
+    name = None
+    if dataset is not None:
+        name = f"{dataset_key}_{hashlib.sha1(csv_path.encode('utf-8')).hexdigest()[:12]}"
+        # Handles guardados no cache apontam para o diretório do dataset, não para o do job
+        workspace = dataset.directory
+
+    if backend == 'sql':
+        processed_data = process_into_warehouse(csv_path, dataset_key)
+        set_attribute('rows', processed_data['metadata']['num_rows'])
+        if dataset is not None:
+            dataset.processed[csv_path] = processed_data
+        return processed_data
+
+    if backend == 'chunked':
+        processed_data = process_in_chunks(csv_path, workspace, name)
+        if dataset is not None:
+            dataset.processed[csv_path] = processed_data
+        return processed_data
+
+    logger.info(f"Processando arquivo CSV: {csv_path}")
+
+    # Carrega o CSV usando a função corrigida
+    df = clean_frame(load_csv(csv_path))
+
+    set_attribute('rows', len(df))
+    set_attribute('bytes', int(df.memory_usage(deep=True).sum()))
+
+    # Os dados seguem por referência (arquivo colunar), não inline no resultado da tarefa
+    data_handle = save_dataframe(df, workspace, name=name)
+    if settings.STATS_ENABLED:
+        # Índice de estatísticas ao lado do dataset: respostas comuns sem reler os dados
+        stats_path = build_stats(df, stats_path_for(data_handle['path']))
+        if stats_path:
+            data_handle['stats'] = [stats_path]
+    processed_data = {
+        'data_handle': data_handle,
+        'metadata': {
+            'columns': list(df.columns),
+            'num_rows': len(df),
+            'sample': df.head(1).to_dict(orient='records')[0] if not df.empty else {}
+        }
+    }
+
+    if dataset is not None:
+        dataset.processed[csv_path] = processed_data
+        get_dataset_cache().put_frame(dataset_key, processed_data['data_handle']['path'], df)
+
+    logger.info("Processamento concluído com sucesso")
+    return processed_data
+
+
+@traced("Processamento de CSV")
+def process_csv(csv_path: str, workspace: Optional[str] = None, dataset_key: Optional[str] = None,
+                backend: Optional[str] = None) -> Dict:
+    """Processa um CSV (ver ProcessingAgent.process_csv_data), reaproveitando o cache do upload."""
+    try:
+        backend = backend or settings.PROCESSING_BACKEND
+        dataset = get_dataset_cache().get(dataset_key)
+        if dataset is None:
+            return _process_csv(csv_path, workspace, dataset_key, None, backend)
+        # O diretório do dataset é compartilhado: jobs do mesmo upload processam cada CSV uma vez
+        with dataset.lock_for(csv_path):
+            return _process_csv(csv_path, workspace, dataset_key, dataset, backend)
+    except Exception as e:
+        logger.error(f"Erro no processamento: {e}")
+        return {'error': str(e)}
+
+
+def _group_handle(results: List[Dict], backend: str) -> Dict:
+    """Junta os arquivos de mesmo layout em um único dataset (união lazy, sem copiar os dados)."""
+    handles = [result['data_handle'] for result in results]
+    if backend == 'sql' and len(handles) > 1:
+        warehouse = SQLBackend.from_handle(handles[0])
+        view = warehouse.create_union_view([handle['table'] for handle in handles])
+        handle = dict(handles[0], table=view, path=f"{warehouse.database}#{view}",
+                      num_rows=sum(h['num_rows'] for h in handles))
+        handle.pop('stats', None)
+    else:
+        handle = dict(union_handle(handles))
+    if any(h.get('chunked') for h in handles):
+        handle['chunked'] = True
+    if len(handles) > 1 and all(h.get('stats') for h in handles):
+        # A união tem o índice das partes (mesclados na leitura)
+        handle['stats'] = [path for h in handles for path in h['stats']]
+    handle['schema'] = detect_schema(handle['columns'])
+    return handle
+
+
 class ProcessingAgent:
     @tool("Process CSV data")
-    def process_csv_data(csv_path: str) -> Dict:
+    def process_csv_data(csv_path: str, workspace: Optional[str] = None, dataset_key: Optional[str] = None,
+                         backend: Optional[str] = None) -> Dict:
         """
-        Carrega e pré-processa os dados do CSV, retornando um formato serializável.
+        Carrega e pré-processa os dados do CSV, salvando-os em formato colunar no workspace
+        ou em uma tabela do banco embarcado do upload.
 
         Args:
             csv_path: Caminho para o arquivo CSV
+            workspace: Diretório da sessão onde o dataset é salvo (padrão: settings.WORKSPACE_DIR)
+            dataset_key: Hash do upload; reaproveita o processamento já feito para o mesmo CSV
+            backend: 'parquet', 'chunked' ou 'sql' (padrão: settings.PROCESSING_BACKEND)
 
         Returns:
-            Dicionário com os dados processados e metadados
+            Dicionário com o handle do dataset processado e metadados
         """
-        try:
-            logger.info(f"Processando arquivo CSV: {csv_path}")
-
-            # Carrega o CSV usando a função corrigida
-            df = load_csv(csv_path)
-
-            # Pré-processamento básico
-            df = df.dropna(how='all')
-            df = df.fillna('')
-
-            # Converte para formato serializável
-            processed_data = {
-                'data': df.to_dict(orient='records'),
-                'metadata': {
-                    'columns': list(df.columns),
-                    'num_rows': len(df),
-                    'sample': df.head(1).to_dict(orient='records')[0] if not df.empty else {}
-                }
-            }
+        return process_csv(csv_path, workspace, dataset_key, backend)
 
-            logger.info("Processamento concluído com sucesso")
-            return processed_data
-        except Exception as e:
-            logger.error(f"Erro no processamento: {e}")
-            return {'error': str(e)}
\ No newline at end of file
+    @tool("Process multiple CSV files")
+    @traced("Processamento de CSVs")
+    def process_csv_files(csv_paths: list, workspace: Optional[str] = None, dataset_key: Optional[str] = None,
+                          backend: Optional[str] = None) -> Dict:
+        """
+        Processa vários CSVs do upload como um único dataset: arquivos com as mesmas colunas
+        são unidos (ex.: um por período) e layouts diferentes de NF-e (cabeçalho e itens)
+        ficam disponíveis para join pela chave de acesso.
+
+        Args:
+            csv_paths: Caminhos dos arquivos CSV, em ordem de relevância
+            workspace: Diretório da sessão onde os datasets são salvos (padrão: settings.WORKSPACE_DIR)
+            dataset_key: Hash do upload; reaproveita o processamento já feito para cada CSV
+            backend: 'parquet', 'chunked' ou 'sql' (padrão: settings.PROCESSING_BACKEND)
+
+        Returns:
+            Dicionário com o handle do dataset combinado e metadados
+        """
+        backend = backend or settings.PROCESSING_BACKEND
+        groups: Dict[tuple, List[Dict]] = {}
+        files: Dict[tuple, List[str]] = {}
+        for csv_path in csv_paths:
+            result = process_csv(csv_path, workspace, dataset_key, backend)
+            if 'error' in result:
+                logger.warning(f"Arquivo ignorado na resposta com vários CSVs: {csv_path} ({result['error']})")
+                continue
+            columns = tuple(result['data_handle']['columns'])
+            groups.setdefault(columns, []).append(result)
+            files.setdefault(columns, []).append(csv_path)
+
+        if not groups:
+            return {'error': "Nenhum dos arquivos selecionados pôde ser processado"}
+
+        handles = [_group_handle(results, backend) for results in groups.values()]
+        first = next(iter(groups.values()))[0]
+        if len(handles) == 1:
+            data_handle = handles[0]
+        else:
+            data_handle = {
+                'path': '||'.join(handle['path'] for handle in handles),
+                'format': 'multi',
+                'datasets': handles,
+                'num_rows': sum(handle['num_rows'] for handle in handles),
+                'columns': list(dict.fromkeys(col.lower() for handle in handles for col in handle['columns']))
+            }
+        logger.info(f"{len(csv_paths)} arquivo(s) combinados em {len(handles)} dataset(s)")
+        return {
+            'data_handle': data_handle,
+            'metadata': {
+                'columns': data_handle['columns'],
+                'num_rows': data_handle['num_rows'],
+                'sample': first['metadata']['sample'],
+                'files': [path for paths in files.values() for path in paths]
+            }
+        }
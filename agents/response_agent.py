@@ -1,11 +1,13 @@
 from langchain.tools import tool
 import logging
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
 class ResponseAgent:
     @tool("Format response to user")
+    @traced("Formatação da resposta")
     def format_response(analysis_result: dict) -> str:
         """
         Formata a resposta para o usuário de forma amigável.
@@ -0,0 +1,141 @@
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from langchain.tools import tool
+from config.settings import settings
+from utils.file_utils import find_csv_files, load_csv
+from utils.dataset_cache import get_dataset_cache
+from utils.tracing import set_attribute, traced
+import pandas as pd
+import logging
+from utils.embedding_utils import EmbeddingService, get_embedding_service
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def cosine_similarity(query_embedding: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+    """Similaridade de cosseno entre um vetor e cada linha da matriz (sem depender do sentence_transformers)."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_embedding)
+    return (matrix @ query_embedding) / np.where(norms == 0, 1, norms)
+
+
+class SelectionAgent:
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        """Usa o serviço de embeddings compartilhado do processo."""
+        self.embeddings = embedding_service or get_embedding_service()
+
+    @property
+    def model(self):
+        return self.embeddings.model
+
+    @staticmethod
+    def profile_csv(csv_file: str, sample_rows: Optional[int] = None) -> str:
+        """Monta o contexto textual de um CSV a partir do cabeçalho e de poucas linhas."""
+        df = load_csv(csv_file, nrows=sample_rows or settings.SELECTION_SAMPLE_ROWS)
+        df.columns = df.columns.str.lower()
+
+        # Criar contexto: nome das colunas + amostra de dados
+        context_parts = [f"Coluna: {col}" for col in df.columns]
+        for col in df.columns[:3]:  # Limitar a 3 colunas pra desempenho
+            sample = df[col].astype(str).head(5).to_list()
+            context_parts.append(f"Amostra de {col}: {', '.join(sample)}")
+        return " ".join(context_parts)
+
+    def rank_csv_files(self, extracted_files: list, query: str, dataset_key: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Ordena os CSVs extraídos pela similaridade entre o perfil de cada um e a pergunta."""
+        # Encontrar todos os CSVs
+        csv_files = []
+        for file in extracted_files:
+            if file.lower().endswith('.csv'):
+                csv_files.append(file)
+            else:
+                csv_files.extend(find_csv_files(file))
+
+        set_attribute('files', len(csv_files))
+        if not csv_files:
+            logger.warning("Nenhum arquivo CSV encontrado")
+            return []
+
+        # Gerar embedding da query
+        query_embedding = np.asarray(self.embeddings.encode(query.lower()), dtype=np.float32)
+
+        # Perfilar os CSVs em paralelo (apenas cabeçalho + amostra de linhas)
+        dataset = get_dataset_cache().get(dataset_key)
+        profiles = dataset.profiles if dataset is not None else {}
+        pending = [csv_file for csv_file in csv_files if csv_file not in profiles]
+        if pending:
+            workers = max(1, min(settings.SELECTION_MAX_WORKERS, len(pending)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                profiles.update(zip(pending, executor.map(self.profile_csv, pending)))
+        contexts = [profiles[csv_file] for csv_file in csv_files]
+
+        # Embeddings dos contextos vêm do cache quando o arquivo já foi visto
+        context_embeddings = self.embeddings.encode_cached(contexts)
+        scores = cosine_similarity(query_embedding, context_embeddings)
+        similarities = [(csv_file, float(score)) for csv_file, score in zip(csv_files, scores)]
+        return sorted(similarities, key=lambda x: x[1], reverse=True)
+
+    @tool("Select relevant CSV file")
+    @traced("Seleção de CSV")
+    def select_relevant_csv(self, extracted_files: list, query: str, dataset_key: Optional[str] = None) -> Optional[str]:
+        """
+        Seleciona o arquivo CSV mais relevante baseado na pergunta do usuário usando embeddings.
+
+        Args:
+            extracted_files: Lista de arquivos extraídos
+            query: Pergunta do usuário
+            dataset_key: Hash do upload; reaproveita os perfis dos CSVs já calculados
+
+        Returns:
+            Caminho para o arquivo CSV mais relevante ou None
+        """
+        try:
+            logger.info(f"Selecionando CSV relevante para a query: {query}")
+            similarities = self.rank_csv_files(extracted_files, query, dataset_key)
+
+            # Selecionar o CSV com maior similaridade
+            if similarities:
+                best_csv, best_score = similarities[0]
+                logger.info(f"Arquivo selecionado: {best_csv} (Similaridade: {best_score:.2f})")
+                return best_csv
+
+            logger.warning("Nenhum arquivo CSV relevante encontrado")
+            return None
+        except Exception as e:
+            logger.error(f"Erro na seleção de CSV: {e}")
+            raise
+
+    @tool("Select relevant CSV files")
+    @traced("Seleção de CSVs")
+    def select_relevant_csvs(self, extracted_files: list, query: str, dataset_key: Optional[str] = None) -> List[Dict]:
+        """
+        Seleciona o conjunto de CSVs relevantes para a pergunta (ex.: cabeçalho e itens, vários períodos).
+
+        Args:
+            extracted_files: Lista de arquivos extraídos
+            query: Pergunta do usuário
+            dataset_key: Hash do upload; reaproveita os perfis dos CSVs já calculados
+
+        Returns:
+            Lista de {'path', 'score'} em ordem decrescente de similaridade; inclui os arquivos
+            até settings.SELECTION_SCORE_MARGIN abaixo do melhor, no máximo settings.SELECTION_MAX_FILES
+        """
+        try:
+            logger.info(f"Selecionando CSVs relevantes para a query: {query}")
+            similarities = self.rank_csv_files(extracted_files, query, dataset_key)
+            if not similarities:
+                logger.warning("Nenhum arquivo CSV relevante encontrado")
+                return []
+
+            best_score = similarities[0][1]
+            selected = [
+                {'path': csv_file, 'score': score}
+                for csv_file, score in similarities
+                if score >= best_score - settings.SELECTION_SCORE_MARGIN
+            ][:settings.SELECTION_MAX_FILES]
+            logger.info(f"{len(selected)} arquivo(s) selecionado(s): {[item['path'] for item in selected]}")
+            return selected
+        except Exception as e:
+            logger.error(f"Erro na seleção de CSVs: {e}")
+            raise
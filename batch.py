@@ -0,0 +1,215 @@
+"""
+Execução em lote, sem a interface Streamlit: responde perguntas padrão sobre vários ZIPs.
+
+O manifesto (JSON) lista os arquivos e as perguntas (arquivos × perguntas). Cada arquivo é
+atendido por um processo do pool, que carrega o modelo de embeddings uma única vez e
+reaproveita extração, perfis dos CSVs e datasets processados entre as perguntas do mesmo
+arquivo (cache de datasets pelo hash do conteúdo). As respostas saem em JSONL ou Parquet,
+uma linha por pergunta.
+
+Manifesto:
+    {
+        "questions": ["Qual o valor total das notas fiscais?", "Quantas notas por UF de destino?"],
+        "archives": ["filial_01/2024-01.zip", {"path": "filial_02/2024-01.zip", "questions": ["..."]}]
+    }
+
+Caminhos relativos são resolvidos a partir do diretório do manifesto; as perguntas de um
+arquivo somam-se às globais. Perguntas que o caminho rápido não resolve ficam com
+resolved=false (o lote não chama o LLM).
+
+Uso:
+    python batch.py manifesto.json --output respostas.jsonl
+    python batch.py manifesto.json --output respostas.parquet --workers 4
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from utils.logging_utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(path: str) -> List[Dict]:
+    """Lê o manifesto e retorna [{'archive': caminho absoluto, 'questions': [...]}] por arquivo."""
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    common = list(manifest.get('questions', []))
+
+    archives = []
+    for item in manifest.get('archives', []):
+        if isinstance(item, str):
+            item = {'path': item}
+        questions = common + [q for q in item.get('questions', []) if q not in common]
+        if not questions:
+            raise ValueError(f"Nenhuma pergunta para o arquivo {item['path']}")
+        archives.append({'archive': os.path.join(base_dir, item['path']), 'questions': questions})
+    if not archives:
+        raise ValueError("O manifesto não lista nenhum arquivo")
+    return archives
+
+
+def _init_worker(autotune: bool = False):
+    """
+    Inicialização de cada processo do pool: logging e modelo de embeddings carregado uma vez.
+
+    Nos processos do pool o autoajuste do lote fica desligado: cada um repetiria a mesma
+    medição, disputando os núcleos com os outros (EMBEDDING_BATCH_SIZE fixa o lote).
+    """
+    from utils.embedding_utils import warmup_embedding_service
+
+    setup_logging()
+    warmup_embedding_service(autotune=autotune)
+
+
+def _share_cores(workers: int):
+    """Divide os núcleos entre os processos do lote: agregação paralela e threads do modelo de embeddings."""
+    share = str(max(1, (os.cpu_count() or 1) // workers))
+    os.environ.setdefault('PARALLEL_WORKERS', share)
+    os.environ.setdefault('EMBEDDING_NUM_THREADS', share)
+
+
+def _record(archive: str, dataset_key: Optional[str], question: str) -> Dict:
+    return {
+        'archive': archive,
+        'dataset_key': dataset_key,
+        'question': question,
+        'resolved': False,
+        'cached': False,
+        'answer': None,
+        'analysis': None,
+        'selected_files': [],
+        'seconds': None,
+        'error': None
+    }
+
+
+def answer_archive(archive: str, questions: List[str]) -> List[Dict]:
+    """
+    Responde todas as perguntas sobre um ZIP no processo atual, pelo caminho rápido.
+
+    O dataset do arquivo fica no cache de datasets durante as perguntas: só a primeira paga
+    extração, perfis e processamento dos CSVs que usa.
+    """
+    from pipeline import run_pipeline
+    from utils.dataset_cache import get_dataset_cache, hash_file
+    from utils.embedding_utils import get_embedding_service
+    from utils.tracing import trace
+
+    try:
+        dataset_key = hash_file(archive)
+    except OSError as e:
+        logger.error(f"Arquivo inacessível {archive}: {e}")
+        return [dict(_record(archive, None, question), error=str(e)) for question in questions]
+
+    get_dataset_cache().get_or_create(dataset_key, archive)
+    embeddings = get_embedding_service()
+    records = []
+    for question in questions:
+        record = _record(archive, dataset_key, question)
+        start = time.perf_counter()
+        try:
+            with trace("Lote", archive=os.path.basename(archive)):
+                result = run_pipeline(archive, question, dataset_key, embeddings)
+            record.update(
+                resolved=result['resolved'],
+                cached=bool(result.get('cached')),
+                answer=result['answer'],
+                analysis=result['analysis'],
+                selected_files=result['selected_files']
+            )
+        except Exception as e:
+            logger.exception(f"Erro na pergunta '{question}' sobre {archive}")
+            record['error'] = str(e)
+        record['seconds'] = time.perf_counter() - start
+        records.append(record)
+    logger.info(f"{archive}: {sum(r['resolved'] for r in records)}/{len(records)} perguntas respondidas")
+    return records
+
+
+def write_parquet(records: List[Dict], path: str):
+    """Grava as respostas em Parquet; as colunas aninhadas (análise, arquivos) viram JSON."""
+    import pandas as pd
+
+    df = pd.DataFrame(records)
+    for col in ('analysis', 'selected_files'):
+        df[col] = [json.dumps(value, ensure_ascii=False, default=str) for value in df[col]]
+    df.to_parquet(path, index=False)
+
+
+def run_batch(archives: List[Dict], output: str, workers: int = 1) -> List[Dict]:
+    """
+    Executa o lote e grava as respostas em `output` (.parquet ou JSONL).
+
+    Com `workers` > 1 os arquivos são distribuídos em um pool de processos; em JSONL cada
+    arquivo é gravado assim que termina.
+    """
+    as_parquet = output.endswith('.parquet')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    records: List[Dict] = []
+
+    with open(os.devnull if as_parquet else output, 'w', encoding='utf-8') as jsonl:
+        def collect(archive_records: List[Dict]):
+            records.extend(archive_records)
+            for record in archive_records:
+                jsonl.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            jsonl.flush()
+
+        if workers <= 1:
+            _init_worker(autotune=True)
+            for item in archives:
+                collect(answer_archive(item['archive'], item['questions']))
+        else:
+            # Variáveis herdadas pelos processos 'spawn', que leem as settings na importação
+            _share_cores(workers)
+            # 'spawn': cada processo inicia limpo e carrega o próprio modelo de embeddings
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker) as pool:
+                futures = {pool.submit(answer_archive, item['archive'], item['questions']): item
+                           for item in archives}
+                for future in as_completed(futures):
+                    item = futures[future]
+                    try:
+                        collect(future.result())
+                    except Exception as e:
+                        logger.error(f"Falha no processo do arquivo {item['archive']}: {e}")
+                        collect([dict(_record(item['archive'], None, question), error=str(e))
+                                 for question in item['questions']])
+
+    if as_parquet:
+        write_parquet(records, output)
+    return records
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Responde perguntas em lote sobre vários ZIPs de NF-e")
+    parser.add_argument('manifest', help="Manifesto JSON com 'archives' e 'questions'")
+    parser.add_argument('--output', required=True, help="Arquivo de saída (.jsonl ou .parquet)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processos em paralelo, um arquivo por vez em cada (padrão: núcleos disponíveis)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    archives = load_manifest(args.manifest)
+    workers = min(args.workers or os.cpu_count() or 1, len(archives))
+    total = sum(len(item['questions']) for item in archives)
+    logger.info(f"Lote: {len(archives)} arquivo(s), {total} pergunta(s), {workers} processo(s)")
+
+    start = time.perf_counter()
+    records = run_batch(archives, args.output, workers)
+    resolved = sum(record['resolved'] for record in records)
+    errors = sum(record['error'] is not None for record in records)
+    print(f"{resolved}/{len(records)} perguntas respondidas, {errors} erro(s), "
+          f"{time.perf_counter() - start:.1f}s -> {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
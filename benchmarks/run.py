@@ -0,0 +1,213 @@
+"""
+Benchmark do pipeline de NF-e, totalmente offline.
+
+Gera um ZIP sintético na escala escolhida, mede cada etapa (extração, leitura dos CSVs,
+seleção, processamento e análise) com o modelo de embeddings stub e o LLM falso, e grava
+os resultados em JSON para comparação entre execuções.
+
+Uso:
+    python -m benchmarks.run --scale small
+    python -m benchmarks.run --scale medium --encoding latin1 --sep , --repeat 5
+    python -m benchmarks.run --scale small --compare benchmarks/results/small.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+SCALES = {
+    'small': {'periods': 1, 'notes_per_period': 500, 'extra_columns': 0},
+    'medium': {'periods': 3, 'notes_per_period': 5000, 'extra_columns': 0},
+    'large': {'periods': 6, 'notes_per_period': 20000, 'extra_columns': 10},
+}
+
+QUESTIONS = [
+    "Qual o valor total das notas fiscais?",
+    "Quais os 5 maiores emitentes por valor?",
+    "Quantas notas por UF de destino?",
+    "Qual o valor total por mês?",
+    "Qual a quantidade total de itens por produto?",
+]
+
+STAGES = ['extract_zip_files', 'load_csv', 'select_relevant_csv', 'process_csv_data', 'analyze_and_answer', 'llm_fallback']
+
+
+def _isolate(workdir: str):
+    """Aponta todos os diretórios de dados/caches para o workdir antes de importar o projeto."""
+    for name, sub in (('WORKSPACE_DIR', 'workspace'), ('UPLOADS_DIR', 'uploads'), ('JOBS_DIR', 'jobs'),
+                      ('WAREHOUSE_DIR', 'warehouse'), ('EMBEDDING_CACHE_DIR', 'embedding_cache')):
+        os.environ[name] = os.path.join(workdir, sub)
+    os.environ['TRACE_LOG_PATH'] = os.path.join(workdir, 'agent_performance.log')
+
+
+def _timed(durations: Dict[str, List[float]], stage: str, func: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    durations.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+
+def _summarize(runs: List[List[float]]) -> Dict:
+    """Por etapa: a primeira repetição (fria) e estatísticas das seguintes (quentes)."""
+    totals = [sum(run) for run in runs]
+    warm = totals[1:] or totals
+    return {
+        'runs': totals,
+        'calls_per_run': len(runs[0]),
+        'cold': totals[0],
+        'warm_median': statistics.median(warm),
+        'warm_min': min(warm),
+        'warm_max': max(warm),
+    }
+
+
+def _environment() -> Dict:
+    versions = {}
+    for module in ('pandas', 'numpy', 'pyarrow', 'duckdb'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+    }
+
+
+def run_benchmark(args) -> Dict:
+    _isolate(args.workdir)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # Imports do projeto só depois de configurar o ambiente (settings lê as variáveis na importação);
+    # os stubs vêm antes dos agentes, que não podem puxar o sentence_transformers na importação
+    from benchmarks.stubs import FakeLLM, StubEmbeddingModel
+    from agents import AnalysisAgent, ExtractionAgent, ProcessingAgent, SelectionAgent
+    from benchmarks.synthetic import generate_nfe_zip
+    from pipeline import call_tool
+    from utils.dataset_cache import get_dataset_cache, store_upload
+    from utils.embedding_utils import EmbeddingService
+    from utils.file_utils import load_csv
+    from utils.tracing import peak_rss_bytes
+
+    scale = dict(SCALES[args.scale])
+    for key in ('periods', 'notes_per_period', 'extra_columns'):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    zip_path = os.path.join(args.workdir, 'nfe_sintetico.zip')
+    start = time.perf_counter()
+    dataset = generate_nfe_zip(zip_path, encoding=args.encoding, sep=args.sep, seed=args.seed, **scale)
+    dataset['generation_seconds'] = time.perf_counter() - start
+
+    with open(zip_path, 'rb') as f:
+        dataset_key, stored_zip = store_upload(f.read())
+    embeddings = EmbeddingService('stub-hash', model=StubEmbeddingModel(latency=args.embedding_latency))
+    llm = FakeLLM(latency=args.llm_latency)
+    extraction_agent, selection_agent = ExtractionAgent(), SelectionAgent(embeddings)
+    processing_agent, analysis_agent = ProcessingAgent(), AnalysisAgent(embeddings)
+
+    runs: Dict[str, List[List[float]]] = {stage: [] for stage in STAGES}
+    answers = []
+    for repeat in range(args.repeat):
+        durations: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        get_dataset_cache().get_or_create(dataset_key, stored_zip)
+
+        extraction = _timed(durations, 'extract_zip_files', call_tool, extraction_agent, 'extract_zip_files',
+                            zip_path=stored_zip, dataset_key=dataset_key,
+                            extract_to=os.path.join(args.workdir, 'extracted'))
+        for csv_file in extraction['files']:
+            _timed(durations, 'load_csv', load_csv, csv_file)
+
+        for question in QUESTIONS:
+            selected = _timed(durations, 'select_relevant_csv', call_tool, selection_agent, 'select_relevant_csv',
+                              extracted_files=extraction['files'], query=question, dataset_key=dataset_key)
+            processed = _timed(durations, 'process_csv_data', call_tool, processing_agent, 'process_csv_data',
+                               csv_path=selected, dataset_key=dataset_key)
+            analysis = _timed(durations, 'analyze_and_answer', call_tool, analysis_agent, 'analyze_and_answer',
+                              processed_data=processed, query=question)
+            if not analysis.get('resolved'):
+                # Sem resposta determinística o pipeline recorreria ao LLM
+                _timed(durations, 'llm_fallback', llm.invoke, f"{question}\n{json.dumps(analysis, default=str)}")
+            if repeat == 0:
+                answers.append({
+                    'question': question,
+                    'selected_file': selected,
+                    'resolved': bool(analysis.get('resolved')),
+                    'answer': analysis.get('answer'),
+                })
+
+        for stage in STAGES:
+            runs[stage].append(durations[stage])
+
+    return {
+        'benchmark': 'nfe-pipeline',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'scale': args.scale, **scale, 'encoding': args.encoding, 'sep': args.sep, 'seed': args.seed,
+            'repeat': args.repeat, 'embedding_latency': args.embedding_latency, 'llm_latency': args.llm_latency,
+        },
+        'environment': _environment(),
+        'dataset': {key: value for key, value in dataset.items() if key != 'path'},
+        'stages': {stage: _summarize(stage_runs) for stage, stage_runs in runs.items()},
+        'peak_rss_bytes': peak_rss_bytes(),
+        'llm_calls': llm.calls,
+        'answers': answers,
+    }
+
+
+def compare(result: Dict, baseline: Dict) -> List[str]:
+    """Linhas de comparação por etapa (mediana quente atual / da referência)."""
+    lines = []
+    for stage, current in result['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous or not previous['warm_median']:
+            continue
+        ratio = current['warm_median'] / previous['warm_median']
+        lines.append(f"{stage:22s} {previous['warm_median']:9.4f}s -> {current['warm_median']:9.4f}s  ({ratio:.2f}x)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de NF-e")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--periods', type=int, help="Sobrescreve a quantidade de meses da escala")
+    parser.add_argument('--notes-per-period', dest='notes_per_period', type=int, help="Sobrescreve as notas por mês")
+    parser.add_argument('--extra-columns', dest='extra_columns', type=int, help="Sobrescreve as colunas adicionais")
+    parser.add_argument('--encoding', default='utf-8', choices=['utf-8', 'latin1'])
+    parser.add_argument('--sep', default=';', choices=[';', ','])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="Repetições; a primeira é a execução fria")
+    parser.add_argument('--embedding-latency', type=float, default=0.0, help="Latência simulada por chamada ao modelo (s)")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Latência simulada por chamada ao LLM (s)")
+    parser.add_argument('--workdir', help="Diretório de trabalho (padrão: temporário)")
+    parser.add_argument('--output', help="Arquivo JSON de saída (padrão: benchmarks/results/<escala>.json)")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args(argv)
+
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix='nfe-bench-')
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', f"{args.scale}.json")
+
+    result = run_benchmark(args)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    for stage, summary in result['stages'].items():
+        print(f"{stage:22s} fria {summary['cold']:9.4f}s  quente (mediana) {summary['warm_median']:9.4f}s")
+    print(f"Resultados em {output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print("\n".join(compare(result, json.load(f))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Orçamento de inicialização do app Streamlit.
+
+Importa `main` em processos Python novos (como em um pod recém-iniciado) e verifica:
+- o tempo de importação (mediana das execuções) contra o orçamento;
+- que nenhuma dependência pesada (crewai, langchain, torch, ...) foi carregada na importação.
+
+Sai com código 1 se o orçamento for estourado, para uso em CI. Com --importtime, lista os
+módulos mais caros da importação (saída de `python -X importtime`).
+
+Uso:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget 1.5 --runs 5 --importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Devem ser carregados só no primeiro uso (consulta, agentes CrewAI, modelo de embeddings)
+HEAVY_MODULES = [
+    'crewai', 'langchain', 'langchain_core', 'langchain_groq', 'sentence_transformers',
+    'transformers', 'torch', 'onnxruntime', 'pyarrow', 'duckdb',
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _run_probe(importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', _PROBE]
+    return subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+
+
+def measure(runs: int) -> Dict:
+    """Tempo de `import main` em `runs` processos novos e módulos pesados carregados."""
+    times, loaded = [], set()
+    for _ in range(runs):
+        process = _run_probe()
+        if process.returncode != 0:
+            raise RuntimeError(f"Falha ao importar main:\n{process.stderr.strip()}")
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        loaded.update(result['loaded'])
+    return {'runs': times, 'median': statistics.median(times), 'max': max(times), 'heavy_loaded': sorted(loaded)}
+
+
+def slowest_imports(limit: int = 15) -> List[str]:
+    """Módulos de primeiro nível com maior tempo acumulado na importação de `main`."""
+    process = _run_probe(importtime=True)
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit() or name.startswith('  '):
+            continue
+        entries.append((int(cumulative), name.strip()))
+    return [f"{us / 1e6:8.3f}s  {name}" for us, name in sorted(entries, reverse=True)[:limit]]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica o orçamento de inicialização do app")
+    parser.add_argument('--budget', type=float, default=2.0, help="Tempo máximo (mediana) para importar main, em segundos")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--importtime', action='store_true', help="Lista os módulos mais caros da importação")
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(f"import main: mediana {result['median']:.3f}s, máximo {result['max']:.3f}s (orçamento {args.budget:.3f}s)")
+    if args.importtime:
+        print("\n".join(slowest_imports()))
+
+    failures = []
+    if result['median'] > args.budget:
+        failures.append(f"importação acima do orçamento ({result['median']:.3f}s > {args.budget:.3f}s)")
+    if result['heavy_loaded']:
+        failures.append(f"dependências pesadas carregadas na importação: {', '.join(result['heavy_loaded'])}")
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
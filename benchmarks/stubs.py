@@ -0,0 +1,67 @@
+import hashlib
+import re
+import time
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+
+from utils.tracing import add_count
+
+
+def _tokens(text: str) -> List[str]:
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.findall(r'\w+', text)
+
+
+class StubEmbeddingModel:
+    """
+    Substituto offline do SentenceTransformer: bag-of-words com hashing em `dimension`
+    posições, normalizado. Determinístico e sem download de modelo; textos com palavras
+    em comum ficam próximos, o que basta para exercitar seleção e ranking de colunas.
+    """
+
+    def __init__(self, dimension: int = 384, latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in _tokens(text):
+            digest = hashlib.md5(token.encode('utf-8')).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts, convert_to_tensor: bool = False, **kwargs) -> np.ndarray:
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.vstack([self._vector(text) for text in texts]) if texts else np.empty((0, self.dimension))
+
+
+class FakeLLM:
+    """
+    LLM local para benchmarks e testes: responde de forma determinística, com latência
+    simulada opcional, e contabiliza chamadas e tokens (aproximados por palavras) no span atual.
+    """
+
+    def __init__(self, latency: float = 0.0, answer: Optional[str] = None):
+        self.latency = latency
+        self.answer = answer
+        self.calls = 0
+
+    def invoke(self, prompt: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        response = self.answer or f"Resposta simulada para: {prompt[:200]}"
+        prompt_tokens, completion_tokens = len(prompt.split()), len(response.split())
+        add_count('llm_calls')
+        add_count('llm_prompt_tokens', prompt_tokens)
+        add_count('llm_completion_tokens', completion_tokens)
+        add_count('llm_total_tokens', prompt_tokens + completion_tokens)
+        return response
@@ -0,0 +1,178 @@
+import csv
+import io
+import os
+import random
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# Colunas no formato das exportações de NF-e do Portal da Transparência
+COMMON_COLUMNS = [
+    'CHAVE DE ACESSO', 'MODELO', 'SÉRIE', 'NÚMERO', 'NATUREZA DA OPERAÇÃO', 'DATA EMISSÃO',
+    'CPF/CNPJ Emitente', 'RAZÃO SOCIAL EMITENTE', 'INSCRIÇÃO ESTADUAL EMITENTE', 'UF EMITENTE',
+    'MUNICÍPIO EMITENTE', 'CNPJ DESTINATÁRIO', 'NOME DESTINATÁRIO', 'UF DESTINATÁRIO',
+    'INDICADOR IE DESTINATÁRIO', 'DESTINO DA OPERAÇÃO', 'CONSUMIDOR FINAL', 'PRESENÇA DO COMPRADOR',
+]
+HEADER_COLUMNS = COMMON_COLUMNS + ['EVENTO MAIS RECENTE', 'DATA/HORA EVENTO MAIS RECENTE', 'VALOR NOTA FISCAL']
+ITEM_COLUMNS = COMMON_COLUMNS + [
+    'NÚMERO PRODUTO', 'DESCRIÇÃO DO PRODUTO/SERVIÇO', 'CÓDIGO NCM/SH', 'NCM/SH (TIPO DE PRODUTO)',
+    'CFOP', 'QUANTIDADE', 'UNIDADE', 'VALOR UNITÁRIO', 'VALOR TOTAL',
+]
+
+UFS = ['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'PE', 'CE', 'GO', 'DF', 'ES']
+MUNICIPIOS = ['SÃO PAULO', 'RIO DE JANEIRO', 'BELO HORIZONTE', 'PORTO ALEGRE', 'CURITIBA',
+              'FLORIANÓPOLIS', 'SALVADOR', 'RECIFE', 'FORTALEZA', 'GOIÂNIA', 'BRASÍLIA', 'VITÓRIA']
+NATUREZAS = ['VENDA DE MERCADORIA', 'VENDA', 'REMESSA', 'DEVOLUÇÃO DE COMPRA', 'PRESTAÇÃO DE SERVIÇO']
+PRODUTOS = [
+    ('NOTEBOOK', '84713012', 'Máquinas automáticas para processamento de dados', 'UN', 3500.0),
+    ('CADEIRA DE ESCRITÓRIO', '94013090', 'Assentos giratórios de altura ajustável', 'UN', 650.0),
+    ('PAPEL A4', '48025610', 'Papel e cartão não revestidos', 'CX', 28.9),
+    ('CANETA ESFEROGRÁFICA', '96081000', 'Canetas esferográficas', 'UN', 1.5),
+    ('CAFÉ TORRADO', '09012100', 'Café torrado, não descafeinado', 'KG', 42.0),
+    ('ÁGUA MINERAL', '22011000', 'Águas minerais e águas gaseificadas', 'UN', 2.3),
+    ('SERVIÇO DE MANUTENÇÃO', '00000000', 'Serviços', 'UN', 180.0),
+    ('MONITOR LED', '85285200', 'Monitores capazes de se conectar a máquinas de processamento de dados', 'UN', 890.0),
+]
+CFOPS = ['5102', '6102', '5405', '5933', '6108']
+
+
+class NFeGenerator:
+    """Gera notas (cabeçalho) e itens sintéticos, reprodutíveis pela semente."""
+
+    def __init__(self, seed: int = 42, companies: int = 50):
+        self.random = random.Random(seed)
+        self.emitentes = [self._company(i, 'EMITENTE') for i in range(companies)]
+        self.destinatarios = [self._company(i, 'CLIENTE') for i in range(companies * 2)]
+
+    def _company(self, index: int, kind: str) -> Dict:
+        uf = self.random.randrange(len(UFS))
+        return {
+            'cnpj': f"{self.random.randrange(10 ** 13, 10 ** 14):014d}",
+            'nome': f"{kind} {index:04d} LTDA",
+            'ie': f"{self.random.randrange(10 ** 8, 10 ** 9)}",
+            'uf': UFS[uf],
+            'municipio': MUNICIPIOS[uf],
+        }
+
+    def notes(self, year: int, month: int, count: int, max_items: int = 5):
+        """Gera (linha do cabeçalho, linhas de itens) para `count` notas do mês."""
+        start = datetime(year, month, 1)
+        for number in range(1, count + 1):
+            emitente = self.random.choice(self.emitentes)
+            destinatario = self.random.choice(self.destinatarios)
+            issued = start + timedelta(days=self.random.randrange(28), seconds=self.random.randrange(86400))
+            # cUF + AAMM + CNPJ + modelo + série + número + tipo de emissão + código + DV = 44 dígitos
+            key = (f"{UFS.index(emitente['uf']) + 11:02d}{issued:%y%m}{emitente['cnpj']}55001"
+                   f"{number:09d}1{self.random.randrange(10 ** 8):08d}{number % 10}")
+            common = [
+                key, '55 - NF-E EMITIDA EM SUBSTITUIÇÃO AO MODELO 1 OU 1A', '1', str(number),
+                self.random.choice(NATUREZAS), issued.strftime('%d/%m/%Y %H:%M:%S'),
+                emitente['cnpj'], emitente['nome'], emitente['ie'], emitente['uf'], emitente['municipio'],
+                destinatario['cnpj'], destinatario['nome'], destinatario['uf'],
+                '1 - CONTRIBUINTE ICMS', '1 - OPERAÇÃO INTERNA' if emitente['uf'] == destinatario['uf'] else '2 - OPERAÇÃO INTERESTADUAL',
+                '0 - NORMAL', '1 - OPERAÇÃO PRESENCIAL',
+            ]
+
+            items, total = [], 0.0
+            for item_number in range(1, self.random.randint(1, max_items) + 1):
+                name, ncm, ncm_type, unit, price = self.random.choice(PRODUTOS)
+                quantity = self.random.randint(1, 20)
+                unit_price = round(price * self.random.uniform(0.8, 1.2), 2)
+                value = round(quantity * unit_price, 2)
+                total += value
+                items.append(common + [
+                    str(item_number), name, ncm, ncm_type, self.random.choice(CFOPS),
+                    _decimal(quantity), unit, _decimal(unit_price), _decimal(value),
+                ])
+
+            event_time = issued + timedelta(minutes=self.random.randrange(60))
+            header = common + ['AUTORIZAÇÃO DE USO', event_time.strftime('%d/%m/%Y %H:%M:%S'), _decimal(total)]
+            yield header, items
+
+
+def _decimal(value: float) -> str:
+    """Valor com vírgula decimal, como nas exportações oficiais."""
+    return f"{value:.2f}".replace('.', ',')
+
+
+def _csv_bytes(columns: List[str], rows: List[List[str]], sep: str, encoding: str) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=sep, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+    writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue().encode(encoding)
+
+
+def generate_nfe_zip(
+    path: str,
+    periods: int = 1,
+    notes_per_period: int = 1000,
+    extra_columns: int = 0,
+    encoding: str = 'utf-8',
+    sep: str = ';',
+    seed: int = 42,
+    year: int = 2024
+) -> Dict:
+    """
+    Gera um ZIP sintético no layout das exportações de NF-e: por período (mês), um CSV de
+    cabeçalho e um de itens.
+
+    Args:
+        path: Caminho do ZIP gerado
+        periods: Quantidade de meses (2 arquivos por mês)
+        notes_per_period: Notas por mês (cada nota tem de 1 a 5 itens)
+        extra_columns: Colunas textuais adicionais em cada arquivo, para testar arquivos largos
+        encoding: 'utf-8' ou 'latin1'
+        sep: Separador de campos (';' ou ',')
+        seed: Semente; a mesma configuração gera sempre os mesmos bytes
+
+    Returns:
+        Resumo do arquivo gerado (membros, linhas e bytes)
+    """
+    generator = NFeGenerator(seed)
+    extra = [f"CAMPO ADICIONAL {i + 1}" for i in range(extra_columns)]
+    summary = {'path': path, 'members': [], 'header_rows': 0, 'item_rows': 0, 'bytes': 0}
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for period in range(periods):
+            month = period % 12 + 1
+            year_offset = period // 12
+            headers, items = [], []
+            for header, note_items in generator.notes(year + year_offset, month, notes_per_period):
+                headers.append(header + [_filler(generator.random) for _ in extra])
+                items.extend(item + [_filler(generator.random) for _ in extra] for item in note_items)
+
+            prefix = f"{year + year_offset}{month:02d}"
+            for name, columns, rows in ((f"{prefix}_NFe_NotaFiscal.csv", HEADER_COLUMNS, headers),
+                                        (f"{prefix}_NFe_NotaFiscalItem.csv", ITEM_COLUMNS, items)):
+                data = _csv_bytes(columns + extra, rows, sep, encoding)
+                info = zipfile.ZipInfo(name, date_time=(year, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                zf.writestr(info, data)
+                summary['members'].append(name)
+                summary['bytes'] += len(data)
+            summary['header_rows'] += len(headers)
+            summary['item_rows'] += len(items)
+    return summary
+
+
+def _filler(rng: random.Random) -> str:
+    return f"OBS {rng.randrange(10 ** 6):06d}"
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Gera um ZIP sintético de NF-e")
+    parser.add_argument('path')
+    parser.add_argument('--periods', type=int, default=1)
+    parser.add_argument('--notes', type=int, default=1000)
+    parser.add_argument('--extra-columns', type=int, default=0)
+    parser.add_argument('--encoding', default='utf-8', choices=['utf-8', 'latin1'])
+    parser.add_argument('--sep', default=';', choices=[';', ','])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(generate_nfe_zip(args.path, args.periods, args.notes, args.extra_columns,
+                                      args.encoding, args.sep, args.seed), indent=2))
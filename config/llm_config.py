@@ -1,22 +1,80 @@
 from langchain_groq import ChatGroq
+from langchain_core.callbacks import BaseCallbackHandler
 from config.settings import settings
+from utils.llm_gateway import LLMGateway, RetryPolicy, TTLCache
+from utils.tracing import add_count
+from typing import Optional
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class TokenUsageCallback(BaseCallbackHandler):
+    """Soma ao span atual as chamadas ao LLM e os tokens reportados pelo provedor."""
+
+    def on_llm_end(self, response, **kwargs):
+        llm_output = response.llm_output or {}
+        if llm_output.get('cached'):
+            return
+        add_count('llm_calls')
+        usage = llm_output.get('token_usage') or {}
+        for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+            if usage.get(key):
+                add_count(f"llm_{key}", usage[key])
+
+
+def _create_client():
+    """Cliente do provedor, criado uma vez por processo (o SDK mantém o pool de conexões HTTP)."""
+    if settings.LLM_BACKEND == 'stub':
+        # Respostas fixas, sem rede: para testes e benchmarks
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        return FakeListChatModel(responses=[settings.LLM_STUB_RESPONSE])
+
+    if not settings.GROQ_API_KEY:
+        raise ValueError("Chave API Groq não configurada. Defina GROQ_API_KEY no .env")
+    return ChatGroq(
+        groq_api_key=settings.GROQ_API_KEY,
+        groq_api_base=settings.GROQ_API_BASE,  # ex.: servidor local compatível para testes
+        model_name=settings.GROQ_MODEL_NAME,
+        temperature=settings.GROQ_TEMPERATURE,
+        request_timeout=settings.LLM_REQUEST_TIMEOUT,
+        max_retries=0  # Os retries ficam com o gateway
+    )
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway(client=None) -> LLMGateway:
+    """
+    Retorna o gateway de LLM do processo (cliente único, retries e cache de respostas).
+
+    Args:
+        client: Modelo de chat a usar no lugar do configurado (substitui o gateway atual)
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None or client is not None:
+            _gateway = LLMGateway(
+                client=client or _create_client(),
+                model_name=settings.GROQ_MODEL_NAME if settings.LLM_BACKEND != 'stub' else 'stub',
+                temperature=settings.GROQ_TEMPERATURE,
+                retry=RetryPolicy(settings.LLM_MAX_RETRIES, settings.LLM_RETRY_BASE_DELAY,
+                                  settings.LLM_RETRY_MAX_DELAY),
+                response_cache=TTLCache(settings.LLM_CACHE_TTL, settings.LLM_CACHE_MAX_ENTRIES)
+                if settings.LLM_CACHE_ENABLED else None,
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                callbacks=[TokenUsageCallback()]
+            )
+        return _gateway
+
+
 def get_groq_llm():
-    """Configura e retorna a instância do LLM Groq com tratamento de erros"""
+    """Configura e retorna o LLM dos agentes (gateway compartilhado) com tratamento de erros"""
     try:
-        if not settings.GROQ_API_KEY:
-            raise ValueError("Chave API Groq não configurada. Defina GROQ_API_KEY no .env")
-
-        return ChatGroq(
-            groq_api_key=settings.GROQ_API_KEY,
-            model_name=settings.GROQ_MODEL_NAME,
-            temperature=settings.GROQ_TEMPERATURE,
-            request_timeout=60
-        )
+        return get_llm_gateway()
     except Exception as e:
         logger.error(f"Erro ao configurar o LLM Groq: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -8,14 +8,115 @@ class Settings:
     # Configurações de diretório
     DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
     TEMP_EXTRACTION_DIR = os.path.join(DATA_DIR, 'temp_extracted')
+    # Datasets processados (Parquet/pickle) referenciados por handle entre os agentes
+    WORKSPACE_DIR = os.getenv('WORKSPACE_DIR', os.path.join(DATA_DIR, 'workspace'))
+
+    # Destino do ProcessingAgent: 'parquet' (arquivo colunar), 'chunked' (Parquet em partes de
+    # PROCESSING_CHUNK_SIZE linhas, memória limitada pelo bloco) ou 'sql' (DuckDB/SQLite embarcado)
+    PROCESSING_BACKEND = os.getenv('PROCESSING_BACKEND', 'parquet')
+    PROCESSING_CHUNK_SIZE = int(os.getenv('PROCESSING_CHUNK_SIZE', '200000'))
+    WAREHOUSE_DIR = os.getenv('WAREHOUSE_DIR', os.path.join(DATA_DIR, 'warehouse'))
+    SQL_CHUNK_SIZE = int(os.getenv('SQL_CHUNK_SIZE', '100000'))
+
+    # Uploads guardados pelo hash do conteúdo e cache de datasets entre consultas
+    UPLOADS_DIR = os.getenv('UPLOADS_DIR', os.path.join(DATA_DIR, 'uploads'))
+    DATASET_CACHE_MAX_ENTRIES = int(os.getenv('DATASET_CACHE_MAX_ENTRIES', '8'))
+    DATASET_CACHE_MAX_MB = int(os.getenv('DATASET_CACHE_MAX_MB', '2048'))
+    # Extração e datasets processados de cada upload, fora dos workspaces dos jobs (que são apagados)
+    DATASETS_DIR = os.getenv('DATASETS_DIR', os.path.join(WORKSPACE_DIR, 'datasets'))
+
+    # Execução concorrente de consultas (jobs com workspace próprio)
+    JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(DATA_DIR, 'jobs'))
+    JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', '4'))
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '16'))
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+    # Eventos de progresso por job (os mais antigos são descartados) e tamanho máximo do resumo
+    PROGRESS_MAX_EVENTS = int(os.getenv('PROGRESS_MAX_EVENTS', '100'))
+    PROGRESS_SUMMARY_CHARS = int(os.getenv('PROGRESS_SUMMARY_CHARS', '200'))
+
+    # Lê os CSVs direto do ZIP em vez de extrair o arquivo inteiro para o disco
+    ZIP_STREAMING = os.getenv('ZIP_STREAMING', 'true').lower() == 'true'
+
+    # Responde sem o LLM quando as ferramentas resolvem a pergunta; CrewAI só como fallback
+    FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true'
+    # Cache de respostas por (hash do upload, pergunta normalizada): camada em memória e, com
+    # RESULT_CACHE_DIR, arquivos compartilhados entre workers; perguntas com embedding similar
+    # (>= RESULT_CACHE_SIMILARITY, 0 desliga) e mesma assinatura também são atendidas
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+    RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '3600'))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1000'))
+    RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', '')
+    RESULT_CACHE_MAX_FILES = int(os.getenv('RESULT_CACHE_MAX_FILES', '10000'))
+    RESULT_CACHE_SIMILARITY = float(os.getenv('RESULT_CACHE_SIMILARITY', '0.95'))
 
     # Configurações de logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # Spans do pipeline (tempo, CPU, memória, embeddings, tokens) exportados em JSON lines
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+    TRACE_LOG_PATH = os.getenv('TRACE_LOG_PATH', os.path.join(os.path.dirname(__file__), '../agent_performance.log'))
+    TRACE_MAX_TRACES = int(os.getenv('TRACE_MAX_TRACES', '100'))
+    # Rotação do arquivo de spans: tamanho máximo e quantos arquivos antigos manter
+    TRACE_LOG_MAX_MB = int(os.getenv('TRACE_LOG_MAX_MB', '50'))
+    TRACE_LOG_BACKUPS = int(os.getenv('TRACE_LOG_BACKUPS', '3'))
 
     # Configurações Groq
     GROQ_API_KEY = os.getenv('GROQ_API_KEY')
     GROQ_MODEL_NAME = os.getenv('GROQ_MODEL_NAME', 'meta-llama/llama-4-scout-17b-16e-instruct')
     GROQ_TEMPERATURE = float(os.getenv('GROQ_TEMPERATURE', '0.2'))
+    GROQ_API_BASE = os.getenv('GROQ_API_BASE')
+
+    # Gateway de LLM: 'groq' ou 'stub' (respostas fixas, sem rede), retries e cache de respostas
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'groq')
+    LLM_STUB_RESPONSE = os.getenv('LLM_STUB_RESPONSE', 'Resposta de teste.')
+    LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', '60'))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+    LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '1.0'))
+    LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '30'))
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '3600'))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1024'))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+
+    # Configurações de embeddings
+    EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'paraphrase-multilingual-MiniLM-L12-v2')
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', os.path.join(DATA_DIR, 'embedding_cache'))
+    EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv('EMBEDDING_CACHE_MEMORY_ITEMS', '10000'))
+    # Backend de inferência: 'torch', 'torch-int8', 'onnx' ou 'onnx-int8' (mesmo modelo, menos CPU por consulta)
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+    EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', 'onnx/model_qint8_avx2.onnx')
+    EMBEDDING_NUM_THREADS = int(os.getenv('EMBEDDING_NUM_THREADS', '0'))  # 0: padrão da biblioteca
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '0'))  # 0: autoajuste no aquecimento
+
+    # Configurações de seleção de CSV
+    SELECTION_MAX_WORKERS = int(os.getenv('SELECTION_MAX_WORKERS', '4'))
+    SELECTION_SAMPLE_ROWS = int(os.getenv('SELECTION_SAMPLE_ROWS', '5'))
+    # Respostas com vários CSVs: arquivos até SELECTION_SCORE_MARGIN abaixo do melhor, no máximo SELECTION_MAX_FILES
+    MULTI_FILE_ENABLED = os.getenv('MULTI_FILE_ENABLED', 'true').lower() == 'true'
+    SELECTION_SCORE_MARGIN = float(os.getenv('SELECTION_SCORE_MARGIN', '0.1'))
+    SELECTION_MAX_FILES = int(os.getenv('SELECTION_MAX_FILES', '12'))
+
+    # Configurações de análise
+    ANALYSIS_TOP_K_COLUMNS = int(os.getenv('ANALYSIS_TOP_K_COLUMNS', '3'))
+    COLUMN_SAMPLE_SCAN_ROWS = int(os.getenv('COLUMN_SAMPLE_SCAN_ROWS', '1000'))
+    COLUMN_INDEX_CACHE_SIZE = int(os.getenv('COLUMN_INDEX_CACHE_SIZE', '32'))
+
+    # Índice de estatísticas calculado na ingestão: grupos completos até STATS_MAX_GROUPS valores
+    # distintos por coluna; acima disso, só os STATS_HEAVY_HITTERS mais frequentes
+    STATS_ENABLED = os.getenv('STATS_ENABLED', 'true').lower() == 'true'
+    STATS_MAX_GROUPS = int(os.getenv('STATS_MAX_GROUPS', '500'))
+    STATS_HEAVY_HITTERS = int(os.getenv('STATS_HEAVY_HITTERS', '20'))
+    STATS_HLL_PRECISION = int(os.getenv('STATS_HLL_PRECISION', '11'))
+
+    # Agregação em paralelo (pool de processos) em datasets Parquet com PARALLEL_MIN_ROWS linhas ou mais,
+    # em partições de ~PARALLEL_PARTITION_ROWS linhas (arquivos ou faixas de row groups)
+    PARALLEL_ENABLED = os.getenv('PARALLEL_ENABLED', 'true').lower() == 'true'
+    PARALLEL_WORKERS = int(os.getenv('PARALLEL_WORKERS', '0'))  # 0: todos os núcleos
+    PARALLEL_MIN_ROWS = int(os.getenv('PARALLEL_MIN_ROWS', '2000000'))
+    PARALLEL_PARTITION_ROWS = int(os.getenv('PARALLEL_PARTITION_ROWS', '1000000'))
+    # Linhas por row group nos Parquet do workspace (unidade mínima de partição)
+    PARQUET_ROW_GROUP_SIZE = int(os.getenv('PARQUET_ROW_GROUP_SIZE', '250000'))
 
 
 settings = Settings()
\ No newline at end of file
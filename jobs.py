@@ -0,0 +1,150 @@
+import os
+import time
+import shutil
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from config.settings import settings
+from utils.dataset_cache import get_dataset_cache, store_upload
+from utils.progress import ProgressLog
+from utils.tracing import trace
+
+logger = logging.getLogger(__name__)
+
+# Status possíveis de um job
+PENDING = 'pendente'
+RUNNING = 'executando'
+DONE = 'concluído'
+FAILED = 'erro'
+
+# Executor da consulta: (zip_path, pergunta, dataset_key, workspace, on_stage) -> resposta
+JobRunner = Callable[..., object]
+
+
+class QueueFullError(Exception):
+    """A fila de jobs atingiu o limite configurado (backpressure)."""
+
+
+class Job:
+    """Uma consulta submetida, com workspace próprio e eventos de progresso."""
+
+    def __init__(self, query: str, dataset_key: str, zip_path: str, jobs_dir: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.dataset_key = dataset_key
+        self.zip_path = zip_path
+        self.workspace = os.path.join(jobs_dir, self.id)
+        self.status = PENDING
+        self.result = None
+        self.error: Optional[str] = None
+        self.trace_id: Optional[str] = None
+        self.progress = ProgressLog()
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        """Aplica uma transição de estado sob o lock: um snapshot nunca vê o job pela metade."""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def record_event(self, stage: str, status: str, duration: Optional[float] = None, result=None):
+        """Callback de progresso no formato do pipeline; do resultado só fica um resumo curto."""
+        self.progress.record(stage, status, duration, result)
+
+    def snapshot(self, events_after: int = 0) -> Dict:
+        """Estado do job; `events_after` limita os eventos aos de sequência maior (polling incremental)."""
+        with self._lock:
+            return {
+                'id': self.id,
+                'query': self.query,
+                'status': self.status,
+                'result': self.result,
+                'error': self.error,
+                'trace_id': self.trace_id,
+                'events': self.progress.events(events_after),
+                'events_dropped': self.progress.dropped,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            }
+
+
+class JobScheduler:
+    """Executa consultas em um pool limitado de threads, com fila limitada e workspaces isolados."""
+
+    def __init__(self, runner: JobRunner, max_workers: int, max_pending: int, jobs_dir: str):
+        self.runner = runner
+        self.jobs_dir = jobs_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nfe-job')
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, upload: bytes, query: str) -> Job:
+        """
+        Enfileira uma consulta sobre o ZIP enviado.
+
+        Raises:
+            QueueFullError: se já houver jobs demais em execução ou aguardando
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Muitas consultas em andamento. Tente novamente em instantes.")
+        try:
+            dataset_key, zip_path = store_upload(upload)
+            get_dataset_cache().get_or_create(dataset_key, zip_path)
+
+            job = Job(query, dataset_key, zip_path, self.jobs_dir)
+            os.makedirs(job.workspace, exist_ok=True)
+
+            with self._lock:
+                self._jobs[job.id] = job
+            self._executor.submit(self._run, job)
+            logger.info(f"Job {job.id} enfileirado (dataset {dataset_key[:12]})")
+            return job
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _run(self, job: Job):
+        job.update(status=RUNNING, started_at=time.time())
+        try:
+            with trace("Consulta", job_id=job.id, query=job.query, dataset_key=job.dataset_key) as span:
+                job.update(trace_id=span.trace_id)
+                result = self.runner(job.zip_path, job.query, job.dataset_key, job.workspace, job.record_event)
+            job.update(status=DONE, result=result, finished_at=time.time())
+        except Exception as e:
+            logger.exception(f"Erro no job {job.id}")
+            job.update(status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            self._slots.release()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str, events_after: int = 0) -> Optional[Dict]:
+        """Estado atual do job, para consulta (polling) pela interface."""
+        job = self.get(job_id)
+        return job.snapshot(events_after) if job is not None else None
+
+    def cleanup(self, max_age: Optional[float] = None):
+        """Remove jobs finalizados há mais de `max_age` segundos, junto com seus workspaces."""
+        max_age = settings.JOB_RETENTION_SECONDS if max_age is None else max_age
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and now - job.finished_at > max_age
+            ]
+            for job_id in expired:
+                job = self._jobs.pop(job_id)
+                shutil.rmtree(job.workspace, ignore_errors=True)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
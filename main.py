@@ -1,24 +1,53 @@
-from crewai import Agent, Task, Crew, Process
-from agents import (
-    ExtractionAgent, SelectionAgent,
-    ProcessingAgent, AnalysisAgent, ResponseAgent
-)
+# Imports leves: o formulário precisa aparecer antes de crewai, langchain, pandas e do modelo
+# de embeddings serem carregados. As dependências pesadas são importadas no primeiro uso
+# (ver benchmarks/startup.py para o orçamento de inicialização).
 from utils.logging_utils import setup_logging
-from config.llm_config import get_groq_llm
+from utils.progress import COMPLETED, ERROR, STARTED, stage_progress
+from utils.tracing import trace
+from config.settings import settings
+from jobs import DONE, FAILED, PENDING, RUNNING, JobScheduler, QueueFullError
 import streamlit as st
-import os
 import logging
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional
 import time
 
+if TYPE_CHECKING:
+    from crewai import Agent, Task
+    from pipeline import StageCallback
+    from utils.embedding_utils import EmbeddingService
+
 # Configura logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-def setup_agents() -> Dict[str, Agent]:
+@st.cache_resource(show_spinner="Carregando modelo de embeddings...")
+def load_embedding_service() -> 'EmbeddingService':
+    """
+    Carrega o modelo de embeddings uma única vez por processo, sobrevivendo aos reruns.
+
+    Chamado só na primeira consulta (pelo job), nunca no carregamento da página. O
+    autoajuste do lote fica fora do caminho da requisição: ele mede vários tamanhos
+    e atrasaria a primeira resposta; só o lote sequencial de batch.py o executa.
+    """
+    from utils.embedding_utils import warmup_embedding_service
+
+    return warmup_embedding_service(autotune=False)
+
+
+def setup_agents() -> Dict[str, 'Agent']:
     """Configura e retorna todos os agentes."""
+    from crewai import Agent
+    from agents import (
+        ExtractionAgent, SelectionAgent,
+        ProcessingAgent, AnalysisAgent, ResponseAgent
+    )
+    from config.llm_config import get_groq_llm
+
     llm = get_groq_llm()
+    embeddings = load_embedding_service()
+    selection = SelectionAgent(embeddings)
+    processing = ProcessingAgent()
 
     agents = {
         'extraction': Agent(
@@ -33,10 +62,10 @@ def setup_agents() -> Dict[str, Agent]:
         ),
         'selection': Agent(
             role='Especialista em Seleção',
-            goal='Identificar o arquivo CSV mais relevante',
+            goal='Identificar os arquivos CSV relevantes para a pergunta',
             backstory="""Você tem uma habilidade única para encontrar o arquivo certo baseado
             no contexto da pergunta e metadados dos arquivos.""",
-            tools=[SelectionAgent().select_relevant_csv],
+            tools=[selection.select_relevant_csv, selection.select_relevant_csvs],
             verbose=True,
             llm=llm,
             allow_delegation=False
@@ -46,7 +75,7 @@ def setup_agents() -> Dict[str, Agent]:
             goal='Processar e limpar dados CSV',
             backstory="""Você transforma dados brutos em informações analisáveis, lidando com
             problemas de formatação e qualidade.""",
-            tools=[ProcessingAgent().process_csv_data],
+            tools=[processing.process_csv_data, processing.process_csv_files],
             verbose=True,
             llm=llm,
             allow_delegation=False
@@ -56,7 +85,7 @@ def setup_agents() -> Dict[str, Agent]:
             goal='Extrair insights dos dados processados',
             backstory="""Você encontra padrões e insights em conjuntos de dados complexos
             de notas fiscais.""",
-            tools=[AnalysisAgent().analyze_and_answer],
+            tools=[AnalysisAgent(embeddings).analyze_and_answer],
             verbose=True,
             llm=llm,
             allow_delegation=False
@@ -74,24 +103,38 @@ def setup_agents() -> Dict[str, Agent]:
     return agents
 
 
-def create_tasks(agents: Dict[str, Agent], zip_path: str, user_query: str) -> List[Task]:
-    """Cria o fluxo de tarefas."""
-    return [
-        Task(
-            description=f"Extrair arquivos de {zip_path}",
+def create_tasks(
+    agents: Dict[str, 'Agent'],
+    zip_path: str,
+    user_query: str,
+    dataset_key: Optional[str] = None,
+    skip_extraction: bool = False
+) -> List['Task']:
+    """Cria o fluxo de tarefas.
+
+    Com `skip_extraction`, o upload já está no cache de datasets e a extração é pulada.
+    """
+    from crewai import Task
+
+    dataset_note = f" (dataset_key: {dataset_key})" if dataset_key else ""
+    tasks = []
+    if not skip_extraction:
+        tasks.append(Task(
+            description=f"Extrair arquivos de {zip_path}{dataset_note}",
             agent=agents['extraction'],
             expected_output="Lista de caminhos dos arquivos extraídos",
             async_execution=False
-        ),
+        ))
+    return tasks + [
         Task(
-            description=f"Selecionar arquivo CSV relevante para: '{user_query}'",
+            description=f"Selecionar os arquivos CSV relevantes para: '{user_query}'{dataset_note}",
             agent=agents['selection'],
-            expected_output="Caminho para o arquivo CSV mais relevante",
+            expected_output="Caminhos dos arquivos CSV relevantes, do mais ao menos relevante",
             context=[],
             async_execution=False
         ),
         Task(
-            description="Processar o arquivo CSV selecionado",
+            description=f"Processar os arquivos CSV selecionados{dataset_note}",
             agent=agents['processing'],
             expected_output="Dados processados em formato serializável",
             context=[],
@@ -114,52 +157,145 @@ def create_tasks(agents: Dict[str, Agent], zip_path: str, user_query: str) -> Li
     ]
 
 
-def update_progress(task_name: str, message: str, duration: float = None, progress_container=None):
-    """Atualiza o progresso na interface do Streamlit."""
-    log_message = f"[{task_name}] {message}"
-    if duration is not None:
-        log_message += f" (Tempo gasto: {duration:.2f} segundos)"
-    st.session_state.task_logs.append(log_message)
-    if progress_container:
-        with progress_container:
-            st.markdown("\n".join(st.session_state.task_logs))
+def format_event(event: Dict) -> str:
+    """Formata um evento de progresso de um job para exibição."""
+    log_message = f"[{event['stage']}] {event['status']}"
+    if event.get('duration') is not None:
+        log_message += f" (Tempo gasto: {event['duration']:.2f} segundos)"
+    if event.get('summary'):
+        log_message += f" — {event['summary']}"
+    return log_message
 
 
-def execute_task(task: Task, previous_result=None, progress_container=None):
+def execute_task(task: 'Task', previous_result=None, on_stage: Optional['StageCallback'] = None):
     """Executa uma tarefa com monitoramento de progresso e tempo."""
     task_name = task.description.split()[0]
     start_time = time.time()
+    report = on_stage or (lambda *args: None)
 
-    update_progress(task_name, "Iniciado", progress_container=progress_container)
+    report(task_name, STARTED, None, None)
 
     try:
         # Tentar executar a tarefa
-        result = task.execute(context=previous_result)
+        with trace(f"Tarefa: {task_name}", agent=task.agent.role):
+            result = task.execute(context=previous_result)
         end_time = time.time()
         duration = end_time - start_time
 
-        update_progress(task_name, f"Concluído: {result}", duration, progress_container)
+        report(task_name, COMPLETED, duration, result)
         return result
     except AttributeError:
         # Fallback para agent.run se execute falhar
         logger.warning(f"Método execute falhou para {task_name}. Usando agent.run.")
-        result = task.agent.run(task.description, context=previous_result)
+        with trace(f"Tarefa: {task_name}", agent=task.agent.role):
+            result = task.agent.run(task.description, context=previous_result)
         end_time = time.time()
         duration = end_time - start_time
 
-        update_progress(task_name, f"Concluído (via agent.run): {result}", duration, progress_container)
+        report(task_name, f"{COMPLETED} (via agent.run)", duration, result)
         return result
     except Exception as e:
         end_time = time.time()
         duration = end_time - start_time
-        update_progress(task_name, f"Erro: {str(e)}", duration, progress_container)
+        report(task_name, ERROR, duration, e)
         raise
 
 
+def run_crew(zip_path: str, user_query: str, dataset_key: str, on_stage: Optional['StageCallback'] = None):
+    """Executa o fluxo completo com os agentes CrewAI e o LLM."""
+    from utils.dataset_cache import get_dataset_cache
+
+    dataset = get_dataset_cache().get_or_create(dataset_key, zip_path)
+
+    # Configurar agentes e tarefas
+    agents = setup_agents()
+    tasks = create_tasks(agents, zip_path, user_query, dataset_key,
+                         skip_extraction=dataset.files is not None)
+    if dataset.files is not None:
+        previous_result = {'files': dataset.files, 'dataset_key': dataset_key}
+    else:
+        previous_result = None
+
+    # Executar tarefas sequencialmente
+    for task in tasks:
+        previous_result = execute_task(task, previous_result, on_stage)
+    return previous_result
+
+
+def answer_query(zip_path: str, user_query: str, dataset_key: str,
+                 workspace: Optional[str] = None, on_stage: Optional['StageCallback'] = None):
+    """Responde a pergunta pelo caminho rápido e recorre aos agentes CrewAI se necessário."""
+    from pipeline import run_pipeline
+
+    if settings.FAST_PATH_ENABLED:
+        # Caminho rápido: ferramentas chamadas diretamente, sem LLM
+        try:
+            with trace("Caminho rápido"):
+                pipeline_result = run_pipeline(zip_path, user_query, dataset_key, load_embedding_service(),
+                                               on_stage=on_stage, workspace=workspace)
+            if pipeline_result['resolved']:
+                return pipeline_result['answer']
+            logger.info("Fast path não resolveu a pergunta; usando os agentes CrewAI")
+        except Exception:
+            logger.exception("Erro no fast path; usando os agentes CrewAI")
+
+    with trace("CrewAI"):
+        return run_crew(zip_path, user_query, dataset_key, on_stage)
+
+
+@st.cache_resource
+def get_job_scheduler() -> JobScheduler:
+    """Pool de jobs compartilhado por todas as sessões do processo."""
+    return JobScheduler(
+        runner=answer_query,
+        max_workers=settings.JOB_MAX_WORKERS,
+        max_pending=settings.JOB_MAX_PENDING,
+        jobs_dir=settings.JOBS_DIR
+    )
+
+
+def render_job(job: Dict):
+    """Exibe status, progresso e resposta de um job."""
+    st.markdown(f"**Pergunta:** {job['query']}  \n**Status:** {job['status']}")
+    # Uma linha por etapa (o último evento dela), com resumos curtos: tamanho limitado por consulta
+    stages = stage_progress(job['events'])
+    if stages:
+        st.markdown("  \n".join(format_event(event) for event in stages))
+
+    if job['status'] == DONE:
+        st.success("✅ Análise concluída!")
+        st.subheader("Resposta:")
+        st.markdown(job['result'])
+    elif job['status'] == FAILED:
+        st.error(f"❌ Erro durante o processamento")
+        st.error(f"Detalhes: {job['error']}")
+
+    if job['trace_id'] and job['status'] in (DONE, FAILED):
+        with st.expander("Desempenho"):
+            from monitoring import AgentMonitor
+
+            AgentMonitor().render(job['trace_id'])
+
+
+@st.fragment(run_every=settings.JOB_POLL_INTERVAL)
+def render_active_job(job_id: str):
+    """Atualiza periodicamente só o bloco do job em andamento, sem reexecutar a página."""
+    job = get_job_scheduler().status(job_id)
+    if job is None:
+        return
+    render_job(job)
+    if job['status'] not in (PENDING, RUNNING):
+        # Job terminou: uma execução completa para parar o polling deste bloco
+        st.rerun()
+
+
 def main():
     st.set_page_config(page_title="Sistema de Consulta NF-e", layout="wide")
     st.title("📄 Consulta de Notas Fiscais Eletrônicas")
 
+    scheduler = get_job_scheduler()
+    scheduler.cleanup()
+
     with st.sidebar:
         st.header("Configuração")
         zip_file = st.file_uploader("Carregue arquivo ZIP com CSVs", type=['zip'])
@@ -167,43 +303,26 @@ def main():
         submitted = st.button("Enviar Consulta")
 
     # Inicializar session_state
-    if 'task_logs' not in st.session_state:
-        st.session_state.task_logs = []
-
-    progress_container = st.empty()
+    if 'job_ids' not in st.session_state:
+        st.session_state.job_ids = []
 
     if submitted and zip_file and user_query:
-        with st.spinner("Processando sua solicitação..."):
-            try:
-                # Limpar logs anteriores
-                st.session_state.task_logs = []
-
-                # Salvar arquivo temporário
-                os.makedirs('data', exist_ok=True)
-                zip_path = os.path.join('data', 'temp_upload.zip')
-                with open(zip_path, 'wb') as f:
-                    f.write(zip_file.getvalue())
-
-                # Configurar agentes e tarefas
-                agents = setup_agents()
-                tasks = create_tasks(agents, zip_path, user_query)
-
-                # Executar tarefas sequencialmente
-                previous_result = None
-                for task in tasks:
-                    previous_result = execute_task(task, previous_result, progress_container)
-                    # Forçar re-renderização do Streamlit
-                    st.write("")  # Hack para garantir atualização
-
-                # Exibir resultados
-                st.success("✅ Análise concluída!")
-                st.subheader("Resposta:")
-                st.markdown(previous_result)
-
-            except Exception as e:
-                st.error(f"❌ Erro durante o processamento")
-                st.error(f"Detalhes: {str(e)}")
-                logger.exception("Erro na execução:")
+        try:
+            job = scheduler.submit(zip_file.getvalue(), user_query)
+            st.session_state.job_ids.append(job.id)
+        except QueueFullError as e:
+            st.warning(f"⏳ {e}")
+
+    # Jobs desta sessão, do mais recente para o mais antigo
+    for job_id in reversed(st.session_state.job_ids):
+        job = scheduler.status(job_id)
+        if job is None:
+            continue
+        with st.container(border=True):
+            if job['status'] in (PENDING, RUNNING):
+                render_active_job(job_id)
+            else:
+                render_job(job)
 
 
 if __name__ == "__main__":
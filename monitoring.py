@@ -1,39 +1,78 @@
 import streamlit as st
 import pandas as pd
-import time
 from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils.tracing import Tracer, get_tracer
+
+
+def _span_depths(spans: List[Dict]) -> Dict[str, int]:
+    parents = {span['span_id']: span['parent_id'] for span in spans}
+    depths = {}
+    for span_id in parents:
+        depth, parent = 0, parents[span_id]
+        while parent in parents:
+            depth, parent = depth + 1, parents[parent]
+        depths[span_id] = depth
+    return depths
+
+
+def spans_to_frame(spans: List[Dict]) -> pd.DataFrame:
+    """Tabela de spans de um trace, com a hierarquia indicada pela indentação do nome."""
+    depths = _span_depths(spans)
+    rows = []
+    for span in spans:
+        counters = span['counters']
+        rss = span['peak_rss_delta']
+        rows.append({
+            'inicio': datetime.fromtimestamp(span['start_time']).strftime("%H:%M:%S"),
+            'etapa': " " * depths[span['span_id']] + span['name'],
+            'tempo': span['wall_time'],
+            'cpu': span['cpu_time'],
+            'rss': rss / (1024 * 1024) if rss is not None else None,
+            'linhas': span['attributes'].get('rows'),
+            'bytes': span['attributes'].get('bytes'),
+            'embeddings': counters.get('embedding_texts', 0),
+            'tokens': counters.get('llm_total_tokens', 0),
+            'status': span['status'] if not span['error'] else f"{span['status']}: {span['error']}"
+        })
+    return pd.DataFrame(rows)
 
 
 class AgentMonitor:
-    def __init__(self):
-        if 'agent_logs' not in st.session_state:
-            st.session_state.agent_logs = []
-
-        self.placeholder = st.empty()
-
-    def update(self, agent_name, task_description, status, execution_time=None):
-        now = datetime.now().strftime("%H:%M:%S")
-        log_entry = {
-            'timestamp': now,
-            'agent': agent_name,
-            'task': task_description,
-            'status': status,
-            'time': execution_time or 'Em andamento'
-        }
-        st.session_state.agent_logs.append(log_entry)
-
-        with self.placeholder.container():
-            st.subheader("Monitoramento dos Agentes")
-            logs_df = pd.DataFrame(st.session_state.agent_logs)
-            st.dataframe(
-                logs_df,
-                column_config={
-                    "timestamp": "Horário",
-                    "agent": "Agente",
-                    "task": "Tarefa",
-                    "status": "Status",
-                    "time": "Tempo"
-                },
-                use_container_width=True,
-                hide_index=True
-            )
\ No newline at end of file
+    """Painel do Streamlit com os spans (tempo, CPU, memória, embeddings, tokens) de uma consulta."""
+
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self.tracer = tracer or get_tracer()
+
+    def render(self, trace_id: str):
+        spans = self.tracer.get_trace(trace_id)
+        if not spans:
+            st.caption("Sem medições para esta consulta.")
+            return
+
+        root = next((span for span in spans if span['parent_id'] is None), spans[0])
+        counters = root['counters']
+        cols = st.columns(4)
+        cols[0].metric("Tempo total", f"{root['wall_time'] or 0:.2f}s")
+        cols[1].metric("CPU", f"{root['cpu_time'] or 0:.2f}s")
+        cols[2].metric("Textos embutidos", f"{counters.get('embedding_texts', 0):.0f}")
+        cols[3].metric("Tokens do LLM", f"{counters.get('llm_total_tokens', 0):.0f}")
+
+        st.dataframe(
+            spans_to_frame(spans),
+            column_config={
+                "inicio": "Horário",
+                "etapa": "Etapa",
+                "tempo": st.column_config.NumberColumn("Tempo (s)", format="%.3f"),
+                "cpu": st.column_config.NumberColumn("CPU (s)", format="%.3f"),
+                "rss": st.column_config.NumberColumn("Δ pico RSS (MB)", format="%.1f"),
+                "linhas": "Linhas",
+                "bytes": "Bytes",
+                "embeddings": "Embeddings",
+                "tokens": "Tokens LLM",
+                "status": "Status"
+            },
+            use_container_width=True,
+            hide_index=True
+        )
@@ -0,0 +1,121 @@
+import inspect
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from agents import (
+    ExtractionAgent, SelectionAgent,
+    ProcessingAgent, AnalysisAgent, ResponseAgent
+)
+from config.settings import settings
+from utils.embedding_utils import EmbeddingService
+from utils.progress import COMPLETED, ERROR, STARTED
+from utils.result_cache import get_result_cache
+from utils.tracing import trace
+
+logger = logging.getLogger(__name__)
+
+# Callback de progresso: (etapa, status, duração em segundos ou None, resultado ou exceção).
+# O callback deve guardar só um resumo do resultado (ver utils.progress).
+StageCallback = Callable[[str, str, Optional[float], object], None]
+
+
+def call_tool(agent, tool_name: str, **kwargs):
+    """Chama diretamente a função de uma ferramenta LangChain, sem passar pelo LLM."""
+    tool_obj = getattr(type(agent), tool_name)
+    func = getattr(tool_obj, 'func', tool_obj)
+    if 'self' in inspect.signature(func).parameters:
+        return func(agent, **kwargs)
+    return func(**kwargs)
+
+
+def _run_stage(name: str, on_stage: Optional[StageCallback], func, *args, **kwargs):
+    start_time = time.time()
+    if on_stage:
+        on_stage(name, STARTED, None, None)
+    try:
+        with trace(f"Etapa: {name}"):
+            result = func(*args, **kwargs)
+    except Exception as e:
+        if on_stage:
+            on_stage(name, ERROR, time.time() - start_time, e)
+        raise
+    if on_stage:
+        on_stage(name, COMPLETED, time.time() - start_time, result)
+    return result
+
+
+def run_pipeline(
+    zip_path: str,
+    query: str,
+    dataset_key: Optional[str] = None,
+    embeddings: Optional[EmbeddingService] = None,
+    on_stage: Optional[StageCallback] = None,
+    workspace: Optional[str] = None
+) -> Dict:
+    """
+    Executa extração, seleção, processamento, análise e formatação em sequência,
+    chamando as ferramentas dos agentes diretamente no processo.
+
+    Com `workspace`, a extração (modo sem streaming) e os datasets processados ficam
+    no diretório isolado do job; com `dataset_key`, no diretório do dataset no cache, que
+    sobrevive à limpeza dos jobs.
+
+    Returns:
+        Dicionário com 'resolved' (se a análise respondeu a pergunta), 'answer',
+        'analysis', 'selected_file' (o CSV mais relevante) e 'selected_files' (todos os
+        usados). Quando 'resolved' é False, o chamador deve recorrer ao fluxo com agentes CrewAI.
+        Respostas resolvidas ficam no cache de respostas por (dataset_key, pergunta); um acerto
+        retorna sem executar as etapas, com 'cached' True.
+    """
+    result = {'resolved': False, 'answer': None, 'analysis': None, 'selected_file': None, 'selected_files': []}
+
+    cache = get_result_cache() if settings.RESULT_CACHE_ENABLED and dataset_key else None
+    if cache is not None:
+        cached = _run_stage("Cache de respostas", on_stage, cache.get, dataset_key, query, embeddings)
+        if cached is not None:
+            return {**result, **cached, 'resolved': True, 'cached': True}
+
+    extract_kwargs = {'extract_to': os.path.join(workspace, 'extracted')} if workspace else {}
+    extraction = _run_stage("Extrair", on_stage, call_tool, ExtractionAgent(), 'extract_zip_files',
+                            zip_path=zip_path, dataset_key=dataset_key, **extract_kwargs)
+    if settings.MULTI_FILE_ENABLED:
+        ranked = _run_stage("Selecionar", on_stage, call_tool, SelectionAgent(embeddings), 'select_relevant_csvs',
+                            extracted_files=extraction['files'], query=query, dataset_key=dataset_key)
+        selected_files = [item['path'] for item in ranked]
+    else:
+        selected = _run_stage("Selecionar", on_stage, call_tool, SelectionAgent(embeddings), 'select_relevant_csv',
+                              extracted_files=extraction['files'], query=query, dataset_key=dataset_key)
+        selected_files = [selected] if selected else []
+    if not selected_files:
+        logger.info("Fast path: nenhum CSV selecionado")
+        return result
+    result['selected_file'] = selected_files[0]
+    result['selected_files'] = selected_files
+
+    if len(selected_files) == 1:
+        processed = _run_stage("Processar", on_stage, call_tool, ProcessingAgent(), 'process_csv_data',
+                               csv_path=selected_files[0], workspace=workspace, dataset_key=dataset_key)
+    else:
+        processed = _run_stage("Processar", on_stage, call_tool, ProcessingAgent(), 'process_csv_files',
+                               csv_paths=selected_files, workspace=workspace, dataset_key=dataset_key)
+    if 'error' in processed:
+        logger.info(f"Fast path: erro no processamento: {processed['error']}")
+        return result
+
+    analysis = _run_stage("Analisar", on_stage, call_tool, AnalysisAgent(embeddings), 'analyze_and_answer',
+                          processed_data=processed, query=query)
+    result['analysis'] = analysis
+    if 'error' in analysis or not analysis.get('resolved'):
+        logger.info("Fast path: a análise não resolveu a pergunta")
+        return result
+
+    result['answer'] = _run_stage("Formatar", on_stage, call_tool, ResponseAgent(), 'format_response',
+                                  analysis_result=analysis)
+    result['resolved'] = True
+    if cache is not None:
+        cache.put(dataset_key, query, {
+            key: result[key] for key in ('answer', 'analysis', 'selected_file', 'selected_files')
+        }, embeddings)
+    return result
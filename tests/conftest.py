@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# settings lê as variáveis na importação: dados, caches e logs dos testes ficam em um diretório temporário
+WORKDIR = tempfile.mkdtemp(prefix='nfe-tests-')
+for _name, _sub in (('WORKSPACE_DIR', 'workspace'), ('UPLOADS_DIR', 'uploads'), ('JOBS_DIR', 'jobs'),
+                    ('WAREHOUSE_DIR', 'warehouse'), ('EMBEDDING_CACHE_DIR', 'embedding_cache')):
+    os.environ[_name] = os.path.join(WORKDIR, _sub)
+os.environ['TRACE_LOG_PATH'] = os.path.join(WORKDIR, 'agent_performance.log')
+os.environ.setdefault('PARALLEL_WORKERS', '1')
+
+
+@pytest.fixture
+def embeddings():
+    """Serviço de embeddings com o modelo stub dos benchmarks (sem download de modelo)."""
+    from benchmarks.stubs import StubEmbeddingModel
+    from utils.embedding_utils import EmbeddingService
+
+    return EmbeddingService('stub-hash', model=StubEmbeddingModel())
+
+
+@pytest.fixture(scope='session')
+def nfe_zip(tmp_path_factory):
+    """ZIP sintético pequeno no layout NF-e: 2 meses, cabeçalho e itens por mês."""
+    from benchmarks.synthetic import generate_nfe_zip
+
+    path = str(tmp_path_factory.mktemp('zips') / 'nfe.zip')
+    generate_nfe_zip(path, periods=2, notes_per_period=300, seed=7)
+    return path
+
+
+@pytest.fixture
+def agents():
+    """Pacote de agentes; depende do LangChain (decorador @tool)."""
+    pytest.importorskip('langchain.tools')
+    import agents as package
+
+    return package
+
+
+@pytest.fixture
+def nfe_frame():
+    """Cabeçalhos de NF-e já processados (colunas em minúsculas), 3 meses de 2024."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(3)
+    size = 400
+    return pd.DataFrame({
+        'chave de acesso': [f"{i:044d}" for i in range(size)],
+        'razao social emitente': pd.Categorical(rng.choice(['ACME', 'Beta', 'Gama'], size)),
+        'uf destinatario': pd.Categorical(rng.choice(['SP', 'RJ', 'MG'], size)),
+        'data emissao': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 90, size), unit='D'),
+        'valor nota fiscal': rng.uniform(1, 1000, size).round(2),
+    })
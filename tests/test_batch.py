@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import batch
+from config.settings import settings
+from utils import embedding_utils
+
+
+@pytest.fixture
+def stub_service(monkeypatch, embeddings):
+    """Registra o serviço stub como o modelo padrão do processo."""
+    key = (settings.EMBEDDING_MODEL_NAME, settings.EMBEDDING_BACKEND)
+    monkeypatch.setitem(embedding_utils._services, key, embeddings)
+    monkeypatch.setattr(embeddings, 'batch_size', None)
+    return embeddings
+
+
+def test_pool_workers_skip_batch_autotune(stub_service, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("autoajuste executado no processo do pool")
+
+    monkeypatch.setattr(embedding_utils, 'autotune_batch_size', fail)
+    batch._init_worker()
+    assert stub_service.batch_size is None
+
+
+def test_cores_are_shared_between_workers(monkeypatch):
+    monkeypatch.setattr(batch.os, 'cpu_count', lambda: 8)
+    monkeypatch.delenv('PARALLEL_WORKERS', raising=False)
+    monkeypatch.delenv('EMBEDDING_NUM_THREADS', raising=False)
+    batch._share_cores(4)
+    assert batch.os.environ['PARALLEL_WORKERS'] == '2'
+    assert batch.os.environ['EMBEDDING_NUM_THREADS'] == '2'
+
+
+def test_run_batch_answers_every_question(agents, stub_service, nfe_zip, tmp_path):
+    questions = ["Qual o valor total das notas fiscais?", "Quantas notas por UF de destino?"]
+    output = str(tmp_path / 'respostas.jsonl')
+
+    records = batch.run_batch([{'archive': nfe_zip, 'questions': questions}], output)
+
+    assert [record['error'] for record in records] == [None, None]
+    assert all(record['resolved'] for record in records)
+    with open(output, encoding='utf-8') as f:
+        assert [json.loads(line)['question'] for line in f] == questions
@@ -0,0 +1,31 @@
+import argparse
+import sys
+
+import numpy as np
+import pytest
+
+
+def test_cosine_similarity_matches_normalized_dot_product(agents):
+    from agents.selection_agent import cosine_similarity
+
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    matrix = np.array([[2.0, 0.0], [0.0, 3.0], [1.0, 1.0], [0.0, 0.0]], dtype=np.float32)
+    assert cosine_similarity(query, matrix) == pytest.approx([1.0, 0.0, 2 ** -0.5, 0.0])
+
+
+def test_benchmark_runs_offline(agents, tmp_path, monkeypatch):
+    from benchmarks.run import run_benchmark
+
+    # O benchmark redireciona os diretórios pelo ambiente; o monkeypatch restaura ao final
+    for name in ('WORKSPACE_DIR', 'UPLOADS_DIR', 'JOBS_DIR', 'WAREHOUSE_DIR', 'EMBEDDING_CACHE_DIR', 'TRACE_LOG_PATH'):
+        monkeypatch.setenv(name, 'unused')
+    monkeypatch.setattr(sys, 'path', list(sys.path))
+    args = argparse.Namespace(
+        scale='small', periods=1, notes_per_period=50, extra_columns=0, encoding='latin1', sep=',',
+        seed=1, repeat=2, embedding_latency=0.0, llm_latency=0.0, workdir=str(tmp_path)
+    )
+
+    result = run_benchmark(args)
+
+    assert result['stages']['select_relevant_csv']['calls_per_run'] == len(result['answers'])
+    assert any(answer['resolved'] for answer in result['answers'])
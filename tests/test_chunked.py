@@ -0,0 +1,59 @@
+import zipfile
+
+import pytest
+
+from config.settings import settings
+from utils.dataset_utils import load_dataframe
+from utils.file_utils import iter_csv_chunks, list_zip_csv_members, load_csv, zip_member_path
+from utils.query_engine import build_plan, execute_plan, execute_plan_chunked
+
+QUESTIONS = [
+    "Qual o valor total das notas fiscais?",
+    "Qual o valor médio das notas?",
+    "Qual o menor valor de nota fiscal?",
+    "Quantas notas por UF de destino?",
+    "Qual o valor médio por UF de destino?",
+    "Quais os 2 maiores emitentes por valor?",
+    "Qual o valor total por mês?",
+]
+
+
+def _rows(result):
+    if 'table' not in result:
+        return pytest.approx(result['value'])
+    return sorted(tuple(sorted((k, round(v, 6) if isinstance(v, float) else str(v)) for k, v in row.items()))
+                  for row in result['table'])
+
+
+@pytest.mark.parametrize('question', QUESTIONS)
+def test_chunked_execution_matches_a_single_pass(nfe_frame, question):
+    plan = build_plan(question, nfe_frame)
+    chunks = (nfe_frame.iloc[start:start + 60] for start in range(0, len(nfe_frame), 60))
+
+    assert _rows(execute_plan_chunked(chunks, plan)) == _rows(execute_plan(nfe_frame, plan))
+
+
+def test_zip_members_are_read_in_blocks(tmp_path):
+    zip_path = str(tmp_path / 'dados.zip')
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('dados.csv', 'A;B\n' + ''.join(f'{i};{i},5\n' for i in range(10)))
+
+    chunks = list(iter_csv_chunks(zip_member_path(zip_path, 'dados.csv'), 4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert chunks[-1]['B'].tolist() == [8.5, 9.5]
+
+
+def test_chunked_processing_writes_one_part_per_block(agents, nfe_zip, tmp_path, monkeypatch):
+    from pipeline import call_tool
+
+    monkeypatch.setattr(settings, 'PROCESSING_CHUNK_SIZE', 100)
+    header = next(member for member in list_zip_csv_members(nfe_zip) if member.endswith('NotaFiscal.csv'))
+
+    result = call_tool(agents.ProcessingAgent(), 'process_csv_data', csv_path=header,
+                       workspace=str(tmp_path), backend='chunked')
+
+    handle = result['data_handle']
+    assert handle['chunked'] and len(handle['parts']) == 3
+    assert handle['num_rows'] == result['metadata']['num_rows'] == 300
+    assert load_dataframe(handle)['VALOR NOTA FISCAL'].sum() == \
+        pytest.approx(load_csv(header)['VALOR NOTA FISCAL'].sum())
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.column_index import ColumnIndex, get_column_index, sample_column_values
+
+
+def test_top_k_orders_columns_by_cosine_similarity():
+    index = ColumnIndex(['a', 'b', 'c'], np.array([[1.0, 0.0], [0.0, 2.0], [3.0, 3.0]]))
+
+    ranked = index.top_k(np.array([1.0, 0.0]), k=2)
+
+    assert [name for name, _ in ranked] == ['a', 'c']
+    assert [score for _, score in ranked] == pytest.approx([1.0, 2 ** -0.5])
+    assert len(index.top_k(np.array([1.0, 0.0]), k=10)) == 3
+    assert index.top_k(np.array([1.0, 0.0]), k=0) == []
+
+
+def test_dataset_without_columns_ranks_nothing():
+    index = ColumnIndex.build(pd.DataFrame(), CountingEmbeddings())
+
+    assert index.top_k(np.array([1.0, 0.0]), k=3) == []
+
+
+def test_samples_come_from_categories_or_the_head_only():
+    categorical = pd.Series(pd.Categorical(['SP', 'RJ', 'SP', 'MG']))
+    assert sorted(sample_column_values(categorical)) == ['MG', 'RJ', 'SP']
+
+    values = pd.Series([1, 1, 2] + list(range(100, 200)))
+    assert sample_column_values(values, limit=5, scan_rows=3) == ['1', '2']
+
+
+class CountingEmbeddings:
+    """Conta os textos codificados: um índice reaproveitado não gera novos embeddings."""
+
+    def __init__(self, model_name='contador', backend='torch'):
+        self.model_name = model_name
+        self.backend = backend
+        self.encoded = 0
+
+    def encode_cached(self, texts):
+        self.encoded += len(texts)
+        return np.array([[len(text), 1.0] for text in texts])
+
+
+def test_index_is_reused_for_the_same_dataset():
+    df = pd.DataFrame({'uf emitente': ['SP'], 'valor nota fiscal': [1.0]})
+    embeddings = CountingEmbeddings()
+
+    first = get_column_index(df, embeddings, key='indice-colunas')
+    assert get_column_index(df, embeddings, key='indice-colunas') is first
+    assert embeddings.encoded == 2
+    assert get_column_index(df.rename(columns={'uf emitente': 'uf'}), embeddings, key='indice-colunas') is not first
+
+
+def test_index_is_not_shared_across_models_or_backends():
+    df = pd.DataFrame({'uf emitente': ['SP'], 'valor nota fiscal': [1.0]})
+
+    first = get_column_index(df, CountingEmbeddings(), key='indice-modelos')
+    assert get_column_index(df, CountingEmbeddings('outro-modelo'), key='indice-modelos') is not first
+    assert get_column_index(df, CountingEmbeddings(backend='onnx'), key='indice-modelos') is not first
+    assert get_column_index(df, CountingEmbeddings(), key='indice-modelos') is first
@@ -0,0 +1,49 @@
+import pytest
+
+from utils.column_stats import DatasetStats
+from utils.query_engine import build_plan, execute_plan
+
+QUESTIONS = [
+    "Qual o valor total das notas fiscais?",
+    "Qual o valor médio das notas?",
+    "Qual o maior valor de nota fiscal?",
+    "Quantas notas por UF de destino?",
+    "Quais os 2 maiores emitentes por valor?",
+    "Qual o valor total em fevereiro de 2024?",
+    "Qual o valor total por mês?",
+]
+
+
+def _normalized(result):
+    if 'table' in result:
+        return sorted(tuple(sorted((k, round(v, 6) if isinstance(v, float) else str(v)) for k, v in row.items()))
+                      for row in result['table'])
+    return pytest.approx(result['value'])
+
+
+@pytest.mark.parametrize('question', QUESTIONS)
+def test_index_answers_match_a_full_scan(nfe_frame, question, tmp_path):
+    plan = build_plan(question, nfe_frame)
+    DatasetStats.from_frame(nfe_frame).save(str(tmp_path / 'notas.stats.json'))
+    answer = DatasetStats.load(str(tmp_path / 'notas.stats.json')).answer(plan)
+
+    assert answer is not None
+    assert _normalized(answer) == _normalized(execute_plan(nfe_frame, plan))
+
+
+def test_merged_chunk_indexes_answer_like_the_whole_file(nfe_frame):
+    merged = DatasetStats.from_frame(nfe_frame.iloc[:150]).merge(DatasetStats.from_frame(nfe_frame.iloc[150:]))
+
+    for question in QUESTIONS:
+        plan = build_plan(question, nfe_frame)
+        answer = merged.answer(plan)
+        if plan['count_column']:
+            # Sem os valores, a mescla não prova que as chaves não se repetem entre os blocos
+            assert answer is None
+        else:
+            assert _normalized(answer) == _normalized(execute_plan(nfe_frame, plan)), question
+
+
+def test_range_filters_are_left_to_the_data(nfe_frame):
+    plan = build_plan("Qual o valor total entre 01/01/2024 e 15/01/2024?", nfe_frame)
+    assert DatasetStats.from_frame(nfe_frame).answer(plan) is None
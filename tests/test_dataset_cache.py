@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+
+from utils.dataset_cache import DatasetCache, get_dataset_cache, hash_file, store_upload
+
+
+def test_uploads_are_stored_by_content_hash(tmp_path):
+    key, path = store_upload(b'conteudo', str(tmp_path))
+    again_key, again_path = store_upload(b'conteudo', str(tmp_path))
+
+    assert (key, path) == (again_key, again_path)
+    assert hash_file(path) == key
+    assert store_upload(b'outro', str(tmp_path))[0] != key
+
+
+def test_least_recently_used_dataset_is_evicted():
+    cache = DatasetCache(max_entries=2, max_bytes=10 ** 9)
+    cache.get_or_create('a')
+    cache.get_or_create('b')
+    cache.get('a')
+    cache.get_or_create('c')
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_byte_limit_drops_frames_before_metadata():
+    frame = pd.DataFrame({'valor': range(1000)})
+    size = int(frame.memory_usage(deep=True).sum())
+    cache = DatasetCache(max_entries=10, max_bytes=size + size // 2)
+
+    cache.get_or_create('a').files = ['a.csv']
+    cache.put_frame('a', 'a.parquet', frame)
+    cache.get_or_create('b')
+    cache.put_frame('b', 'b.parquet', frame)
+    assert cache.get('a') is None and cache.get_frame('b.parquet') is frame
+
+    cache.put_frame('b', 'b2.parquet', frame)
+    assert cache.get('b') is not None and cache.get_frame('b.parquet') is None
+
+
+def test_follow_up_question_skips_extraction(agents, nfe_zip, monkeypatch):
+    from agents import extraction_agent
+    from pipeline import call_tool
+
+    listed = []
+    original = extraction_agent.list_zip_csv_members
+    monkeypatch.setattr(extraction_agent, 'list_zip_csv_members', lambda path: listed.append(path) or original(path))
+    get_dataset_cache().get_or_create('seguimento', nfe_zip)
+
+    first = call_tool(agents.ExtractionAgent(), 'extract_zip_files', zip_path=nfe_zip, dataset_key='seguimento', stream=True)
+    second = call_tool(agents.ExtractionAgent(), 'extract_zip_files', zip_path=nfe_zip, dataset_key='seguimento', stream=True)
+
+    assert first['files'] == second['files']
+    assert listed == [nfe_zip]
+
+
+def test_evicted_dataset_is_removed_from_disk(tmp_path):
+    from utils.sql_backend import SQLBackend
+
+    key, zip_path = store_upload(b'upload removido')
+    cache = DatasetCache(max_entries=1, max_bytes=10 ** 9)
+    entry = cache.get_or_create(key, zip_path)
+    os.makedirs(entry.directory)
+    open(os.path.join(entry.directory, 'notas.parquet'), 'wb').close()
+    database = SQLBackend.for_dataset(key).database
+    archive = tmp_path / 'lote.zip'
+    archive.write_bytes(b'arquivo do lote')
+    kept = cache.get_or_create('lote', str(archive))
+
+    cache.get_or_create('outro')
+
+    assert not os.path.exists(entry.directory)
+    assert not os.path.exists(zip_path) and not os.path.exists(database)
+    assert os.path.exists(kept.zip_path)
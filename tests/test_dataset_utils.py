@@ -0,0 +1,52 @@
+import pandas as pd
+
+from utils.dataset_cache import get_dataset_cache
+from utils.dataset_utils import load_dataframe, load_head, resolve_dataframe, resolve_handle, save_dataframe, union_handle
+
+
+def _frame(ufs):
+    return pd.DataFrame({
+        'uf': pd.Categorical(ufs),
+        'data': pd.to_datetime(['2024-01-01'] * len(ufs)),
+        'valor': [float(i) for i in range(len(ufs))],
+    })
+
+
+def test_handle_round_trip_keeps_dtypes_and_projects_columns(tmp_path):
+    handle = save_dataframe(_frame(['SP', 'RJ', 'SP']), str(tmp_path), name='notas')
+
+    assert handle['format'] == 'parquet' and handle['num_rows'] == 3
+    df = load_dataframe(handle)
+    assert isinstance(df['uf'].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(df['data'])
+    assert list(load_dataframe(handle, columns=['valor']).columns) == ['valor']
+    assert load_head(handle, 2)['valor'].tolist() == [0.0, 1.0]
+
+
+def test_resolve_accepts_handles_and_inline_records(tmp_path):
+    df = _frame(['SP', 'RJ'])
+    handle = save_dataframe(df, str(tmp_path), name='notas')
+
+    assert resolve_dataframe({'data_handle': handle}, columns=['valor'])['valor'].tolist() == [0.0, 1.0]
+    inline = resolve_dataframe({'data': df.to_dict(orient='records')})
+    assert inline['uf'].tolist() == ['SP', 'RJ']
+
+
+def test_union_is_concatenated_on_read_with_merged_categories(tmp_path):
+    parts = [save_dataframe(_frame(['SP', 'RJ']), str(tmp_path), name='jan'),
+             save_dataframe(_frame(['MG']), str(tmp_path), name='fev')]
+    handle = union_handle(parts)
+
+    df = load_dataframe(handle)
+    assert handle['num_rows'] == len(df) == 3
+    assert isinstance(df['uf'].dtype, pd.CategoricalDtype)
+    assert set(df['uf'].cat.categories) == {'SP', 'RJ', 'MG'}
+
+
+def test_cached_frame_is_handed_over_without_reading_the_file(tmp_path):
+    df = _frame(['SP'])
+    handle = save_dataframe(df, str(tmp_path), name='cache')
+    get_dataset_cache().get_or_create('handoff')
+    get_dataset_cache().put_frame('handoff', handle['path'], df)
+
+    assert resolve_handle(handle) is df
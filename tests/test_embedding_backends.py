@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.stubs import StubEmbeddingModel
+from utils import embedding_backends
+from utils.embedding_backends import autotune_batch_size, load_model
+from utils.embedding_utils import EmbeddingService
+
+
+class BatchRecordingModel(StubEmbeddingModel):
+    """Stub que registra o batch_size recebido e só é rápido com lotes de 16.
+
+    A duração de cada chamada avança um relógio falso, então o autoajuste não
+    depende da carga da máquina.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def encode(self, texts, batch_size=None, **kwargs):
+        self.batch_sizes.append(batch_size)
+        if batch_size is not None:
+            self.now += 0.001 if batch_size == 16 else 0.01
+        return super().encode(texts, **kwargs)
+
+
+@pytest.fixture
+def timed_model(monkeypatch):
+    model = BatchRecordingModel()
+    monkeypatch.setattr(embedding_backends, 'time', SimpleNamespace(perf_counter=model.perf_counter))
+    return model
+
+
+def test_autotune_picks_the_fastest_batch_size(timed_model):
+    assert autotune_batch_size(timed_model, ['texto'], candidates=(8, 16, 32), repeats=1) == 16
+
+
+def test_warmup_fixes_the_batch_size_unless_autotune_is_off(timed_model):
+    model = timed_model
+    service = EmbeddingService('stub-autotune', model=model)
+    service.batch_size = None
+
+    assert service.warmup(autotune=False).batch_size is None
+    assert service.warmup().batch_size == 16
+    service.encode(['a', 'b'])
+    assert model.batch_sizes[-1] == service.batch_size
+
+
+def test_onnx_backend_falls_back_to_quantized_torch(monkeypatch):
+    loaded = []
+
+    def missing_onnx(*args):
+        raise ImportError("onnxruntime")
+
+    monkeypatch.setattr(embedding_backends, '_load_onnx', missing_onnx)
+    monkeypatch.setattr(embedding_backends, '_load_torch', lambda name, quantize, threads: loaded.append(quantize))
+
+    load_model('modelo', 'onnx-int8', num_threads=2)
+    load_model('modelo', 'onnx')
+    assert loaded == [True, False]
+    with pytest.raises(ValueError):
+        load_model('modelo', 'tensorrt')
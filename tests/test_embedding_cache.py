@@ -0,0 +1,53 @@
+import multiprocessing
+
+import numpy as np
+
+from utils.embedding_cache import EmbeddingCache, MemmapVectorStore
+
+
+def _write_batches(directory: str, worker: int):
+    store = MemmapVectorStore(directory)
+    for batch in range(10):
+        keys = [f"w{worker}-{batch}-{i}" for i in range(5)]
+        store.put_many(keys, np.array([[worker, batch, i, 1.0] for i in range(5)], dtype=np.float32))
+
+
+def test_store_persists_vectors_between_instances(tmp_path):
+    store = MemmapVectorStore(str(tmp_path))
+    store.put_many(['a', 'b'], np.array([[1, 2], [3, 4]], dtype=np.float32))
+    reopened = MemmapVectorStore(str(tmp_path))
+    np.testing.assert_array_equal(reopened.get('b'), [3, 4])
+    assert reopened.get('c') is None
+
+
+def test_store_sees_appends_from_another_instance(tmp_path):
+    reader = MemmapVectorStore(str(tmp_path))
+    writer = MemmapVectorStore(str(tmp_path))
+    writer.put_many(['x'], np.array([[5, 6]], dtype=np.float32))
+    np.testing.assert_array_equal(reader.get_many(['x'])[0], [5, 6])
+
+
+def test_concurrent_processes_do_not_corrupt_the_store(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_write_batches, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    store = MemmapVectorStore(str(tmp_path))
+    assert len(store.index) == 4 * 10 * 5
+    for worker in range(4):
+        for batch in range(10):
+            for i in range(5):
+                np.testing.assert_array_equal(store.get(f"w{worker}-{batch}-{i}"), [worker, batch, i, 1.0])
+
+
+def test_cache_memory_tier_is_bounded_and_backed_by_disk(tmp_path):
+    cache = EmbeddingCache('modelo', cache_dir=str(tmp_path), max_memory_items=2)
+    cache.put_many(['a', 'b', 'c'], np.eye(3, dtype=np.float32))
+    assert cache.stats()['memory_items'] == 2
+    found = EmbeddingCache('modelo', cache_dir=str(tmp_path)).get_many(['a', 'z'])
+    np.testing.assert_array_equal(found[0], [1, 0, 0])
+    assert found[1] is None
@@ -0,0 +1,44 @@
+import threading
+
+import numpy as np
+
+from benchmarks.stubs import StubEmbeddingModel
+from utils.embedding_utils import EmbeddingService, get_embedding_service
+
+
+def test_registry_returns_one_service_per_model_and_backend():
+    service = get_embedding_service('modelo-teste', 'torch')
+    assert get_embedding_service('modelo-teste', 'torch') is service
+    assert get_embedding_service('modelo-teste', 'torch-int8') is not service
+    assert get_embedding_service('outro-modelo', 'torch') is not service
+    assert service.model_name == 'modelo-teste'
+    assert service.backend == 'torch'
+    assert not service.is_loaded
+
+
+def test_model_is_loaded_once_across_threads(monkeypatch):
+    loads = []
+    monkeypatch.setattr(EmbeddingService, '_load_model', lambda self: loads.append(self.model_name) or object())
+    service = EmbeddingService('modelo-compartilhado')
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(service.model)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ['modelo-compartilhado']
+    assert service.is_loaded
+    assert all(model is models[0] for model in models)
+
+
+def test_injected_model_is_shared_and_encode_cached_reuses_vectors():
+    model = StubEmbeddingModel()
+    service = EmbeddingService('stub-registry', model=model)
+    first = service.encode_cached(['valor total', 'uf destino'])
+    second = service.encode_cached(['uf destino', 'valor total'])
+    assert service.model is model
+    assert first.shape == (2, model.dimension)
+    np.testing.assert_allclose(first[::-1], second)
+    assert service.cache.stats()['memory_hits'] == 2
@@ -0,0 +1,42 @@
+import zipfile
+
+import pandas as pd
+
+from utils.file_utils import detect_csv_format, list_zip_csv_members, load_csv, zip_member_path
+
+
+def _write(path, text: str, encoding: str = 'utf-8') -> str:
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def test_detects_encoding_and_separator_once(tmp_path):
+    path = _write(tmp_path / 'latin.csv', 'DESCRIÇÃO,VALOR\nCAFÉ,"1,50"\n', encoding='latin1')
+    csv_format = detect_csv_format(path)
+    assert csv_format['encoding'] == 'latin1'
+    assert csv_format['sep'] == ','
+    assert csv_format['columns'] == ['DESCRIÇÃO', 'VALOR']
+    assert detect_csv_format(path) is csv_format
+
+
+def test_load_csv_parses_decimal_comma(tmp_path):
+    df = load_csv(_write(tmp_path / 'valores.csv', 'CODIGO;VALOR\n1;10,5\n2;7,25\n'))
+    assert df['VALOR'].tolist() == [10.5, 7.25]
+
+
+def test_short_rows_fall_back_to_c_engine(tmp_path):
+    df = load_csv(_write(tmp_path / 'irregular.csv', 'CODIGO;NOME;VALOR\n1;Alfa;10,5\n2;Beta\n3;Gama;7,25\n'))
+    assert len(df) == 3
+    assert pd.isna(df.loc[1, 'VALOR'])
+    assert df.loc[2, 'VALOR'] == 7.25
+
+
+def test_reads_zip_members_in_place(tmp_path):
+    zip_path = str(tmp_path / 'dados.zip')
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('pasta/dados.csv', 'A;B\n' + ''.join(f'{i};{i},5\n' for i in range(10)))
+        archive.writestr('leia-me.txt', 'x')
+    members = list_zip_csv_members(zip_path)
+    assert members == [zip_member_path(zip_path, 'pasta/dados.csv')]
+    assert len(load_csv(members[0])) == 10
+    assert [path.name for path in tmp_path.iterdir()] == ['dados.zip']
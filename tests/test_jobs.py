@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+import pytest
+
+from config.settings import settings
+from jobs import DONE, PENDING, RUNNING, JobScheduler, QueueFullError
+
+
+def _wait(scheduler, job, timeout=30.0):
+    deadline = time.time() + timeout
+    while scheduler.status(job.id)['status'] in (PENDING, RUNNING):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    assert scheduler.status(job.id)['status'] == DONE, scheduler.status(job.id)['error']
+
+
+def test_extracted_paths_include_the_target_directory(agents, nfe_zip, tmp_path):
+    from pipeline import call_tool
+
+    result = call_tool(agents.ExtractionAgent(), 'extract_zip_files', zip_path=nfe_zip, stream=False,
+                       extract_to=str(tmp_path))
+    assert result['files'] and all(os.path.exists(path) for path in result['files'])
+    assert all(path.startswith(str(tmp_path)) for path in result['files'])
+
+
+def test_cached_dataset_survives_job_cleanup(agents, embeddings, tmp_path, monkeypatch):
+    from benchmarks.synthetic import generate_nfe_zip
+    from pipeline import run_pipeline
+    from utils.dataset_cache import get_dataset_cache
+
+    monkeypatch.setattr(settings, 'ZIP_STREAMING', False)
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', False)
+
+    def runner(zip_path, query, dataset_key, workspace, on_stage):
+        result = run_pipeline(zip_path, query, dataset_key, embeddings, on_stage=on_stage, workspace=workspace)
+        assert result['resolved'], result
+        return result['answer']
+
+    scheduler = JobScheduler(runner, max_workers=1, max_pending=2, jobs_dir=str(tmp_path / 'jobs'))
+    # Upload próprio: o dataset começa vazio no cache, sem a extração em streaming de outros testes
+    zip_path = str(tmp_path / 'upload.zip')
+    generate_nfe_zip(zip_path, periods=1, notes_per_period=100, seed=11)
+    with open(zip_path, 'rb') as f:
+        upload = f.read()
+    try:
+        first = scheduler.submit(upload, "Qual o valor total das notas fiscais?")
+        _wait(scheduler, first)
+        scheduler.cleanup(max_age=-1)
+        assert not os.path.exists(first.workspace)
+
+        dataset = get_dataset_cache().get(first.dataset_key)
+        handles = [processed['data_handle'] for processed in dataset.processed.values()]
+        assert handles and all(os.path.exists(handle['path']) for handle in handles)
+        assert all(os.path.exists(path) for path in dataset.files)
+
+        second = scheduler.submit(upload, "Quantas notas por UF de destino?")
+        _wait(scheduler, second)
+    finally:
+        scheduler.shutdown()
+
+
+def test_concurrent_jobs_on_one_upload_process_each_csv_once(agents, embeddings, tmp_path, monkeypatch):
+    from agents import processing_agent
+    from benchmarks.synthetic import generate_nfe_zip
+    from pipeline import run_pipeline
+
+    monkeypatch.setattr(settings, 'RESULT_CACHE_ENABLED', False)
+    saved = []
+    original = processing_agent.save_dataframe
+
+    def save_dataframe(df, workspace=None, name=None):
+        saved.append(name)
+        time.sleep(0.2)  # alarga a janela em que os dois jobs gravariam o mesmo arquivo
+        return original(df, workspace, name=name)
+
+    monkeypatch.setattr(processing_agent, 'save_dataframe', save_dataframe)
+
+    def runner(zip_path, query, dataset_key, workspace, on_stage):
+        result = run_pipeline(zip_path, query, dataset_key, embeddings, on_stage=on_stage, workspace=workspace)
+        assert result['resolved'], result
+        return result['answer']
+
+    zip_path = str(tmp_path / 'upload.zip')
+    generate_nfe_zip(zip_path, periods=1, notes_per_period=100, seed=13)
+    with open(zip_path, 'rb') as f:
+        upload = f.read()
+    scheduler = JobScheduler(runner, max_workers=2, max_pending=2, jobs_dir=str(tmp_path / 'jobs'))
+    try:
+        jobs = [scheduler.submit(upload, "Qual o valor total das notas fiscais?") for _ in range(2)]
+        for job in jobs:
+            _wait(scheduler, job)
+        assert saved and len(saved) == len(set(saved))
+        assert scheduler.status(jobs[0].id)['result'] == scheduler.status(jobs[1].id)['result']
+    finally:
+        scheduler.shutdown()
+
+
+def test_queue_is_bounded_and_jobs_get_their_own_workspace(tmp_path):
+    release = threading.Event()
+    scheduler = JobScheduler(lambda *args: release.wait(5), max_workers=1, max_pending=1,
+                             jobs_dir=str(tmp_path / 'jobs'))
+    try:
+        running = scheduler.submit(b'zip 1', "pergunta")
+        waiting = scheduler.submit(b'zip 2', "pergunta")
+        with pytest.raises(QueueFullError):
+            scheduler.submit(b'zip 3', "pergunta")
+        assert running.workspace != waiting.workspace
+        assert os.path.isdir(running.workspace) and os.path.isdir(waiting.workspace)
+
+        release.set()
+        _wait(scheduler, running)
+        _wait(scheduler, waiting)
+        scheduler.submit(b'zip 3', "pergunta")
+    finally:
+        release.set()
+        scheduler.shutdown()
+
+
+def test_job_finishes_in_a_single_locked_transition(tmp_path):
+    release = threading.Event()
+    scheduler = JobScheduler(lambda *args: release.wait(5) and 'ok', max_workers=1, max_pending=1,
+                             jobs_dir=str(tmp_path / 'jobs'))
+    try:
+        job = scheduler.submit(b'zip', "pergunta")
+        deadline = time.time() + 5
+        while scheduler.status(job.id)['status'] != RUNNING:
+            assert time.time() < deadline
+            time.sleep(0.01)
+
+        with job._lock:
+            release.set()
+            time.sleep(0.2)
+            assert (job.status, job.result, job.finished_at) == (RUNNING, None, None)
+
+        _wait(scheduler, job)
+        snapshot = scheduler.status(job.id)
+        assert snapshot['result'] == 'ok' and snapshot['finished_at'] is not None
+    finally:
+        release.set()
+        scheduler.shutdown()
+
+
+def test_cleanup_drops_finished_jobs_and_their_workspaces(tmp_path):
+    scheduler = JobScheduler(lambda *args: 'ok', max_workers=1, max_pending=1, jobs_dir=str(tmp_path / 'jobs'))
+    try:
+        job = scheduler.submit(b'zip', "pergunta")
+        _wait(scheduler, job)
+        assert scheduler.status(job.id)['result'] == 'ok'
+
+        scheduler.cleanup(max_age=-1)
+        assert scheduler.status(job.id) is None
+        assert not os.path.exists(job.workspace)
+    finally:
+        scheduler.shutdown()
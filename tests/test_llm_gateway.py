@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip('langchain_core')
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+from utils.llm_gateway import LLMGateway, TTLCache, prompt_key  # noqa: E402
+
+
+def test_prompt_key_covers_call_parameters():
+    messages = [HumanMessage(content="Qual o total?")]
+    base = prompt_key('modelo', 0.0, messages)
+
+    assert prompt_key('modelo', 0.0, messages, max_tokens=10) != base
+    assert prompt_key('modelo', 0.0, messages, max_tokens=10) != prompt_key('modelo', 0.0, messages, max_tokens=20)
+    assert prompt_key('modelo', 0.0, messages, tools=[{'name': 'a'}], max_tokens=10) == \
+        prompt_key('modelo', 0.0, messages, max_tokens=10, tools=[{'name': 'a'}])
+
+
+def test_gateway_caches_per_prompt_and_parameters():
+    gateway = LLMGateway(client=FakeListChatModel(responses=['primeira', 'segunda', 'terceira']),
+                         model_name='stub', response_cache=TTLCache(ttl=60, max_entries=10))
+
+    assert gateway.invoke("Qual o total?").content == 'primeira'
+    assert gateway.invoke("Qual o total?").content == 'primeira'
+    assert gateway.invoke("Qual o total?", max_tokens=5).content == 'segunda'
+    assert gateway.invoke("Qual o total?", max_tokens=5).content == 'segunda'
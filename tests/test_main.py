@@ -0,0 +1,44 @@
+import pytest
+
+
+@pytest.fixture
+def app():
+    pytest.importorskip('streamlit')
+    import main
+
+    return main
+
+
+def test_run_crew_reuses_the_dataset_cache(app, nfe_zip, monkeypatch):
+    from utils.dataset_cache import get_dataset_cache, hash_file
+
+    class AgentsReached(Exception):
+        pass
+
+    def setup_agents():
+        raise AgentsReached()
+
+    monkeypatch.setattr(app, 'setup_agents', setup_agents)
+    dataset_key = hash_file(nfe_zip)
+    with pytest.raises(AgentsReached):
+        app.run_crew(nfe_zip, "Qual o valor total das notas fiscais?", dataset_key)
+    assert get_dataset_cache().get(dataset_key) is not None
+
+
+def test_page_load_does_not_load_the_embedding_model(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, 'load_embedding_service', lambda: calls.append(1))
+    monkeypatch.setattr(app, 'get_job_scheduler', lambda: type('Scheduler', (), {'cleanup': lambda self: None})())
+    app.main()
+    assert calls == []
+
+
+def test_embedding_service_is_loaded_without_autotune(app, monkeypatch):
+    from utils import embedding_utils
+
+    calls = []
+    monkeypatch.setattr(embedding_utils, 'warmup_embedding_service', lambda **kwargs: calls.append(kwargs))
+    app.load_embedding_service.clear()
+    app.load_embedding_service()
+    app.load_embedding_service.clear()
+    assert calls == [{'autotune': False}]
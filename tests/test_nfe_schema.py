@@ -0,0 +1,38 @@
+import pandas as pd
+
+from utils.file_utils import load_csv
+from utils.nfe_schema import apply_schema, detect_schema
+
+CHAVE = '35240112345678000190550010000001231000001230'
+
+
+def test_detects_layouts_regardless_of_accents_and_case():
+    assert detect_schema(['Chave de Acesso', 'DATA EMISSÃO', 'valor nota fiscal', 'UF EMITENTE']) == 'nfe_cabecalho'
+    assert detect_schema(['CHAVE DE ACESSO', 'CFOP', 'QUANTIDADE', 'VALOR UNITÁRIO']) == 'nfe_itens'
+    assert detect_schema(['A', 'B']) is None
+
+
+def test_header_csv_is_read_with_the_schema_dtypes(tmp_path):
+    path = tmp_path / 'NFe_NotaFiscal.csv'
+    path.write_bytes((
+        "CHAVE DE ACESSO;NÚMERO;DATA EMISSÃO;UF EMITENTE;VALOR NOTA FISCAL\n"
+        f"{CHAVE};123;05/02/2024 10:00:00;SP;1.234,56\n"
+        f"{CHAVE[:-1]}9;124;06/02/2024 11:30:00;RJ;10,00\n"
+    ).encode('latin1'))
+
+    df = load_csv(str(path))
+
+    assert df['CHAVE DE ACESSO'].iloc[0] == CHAVE
+    assert str(df['NÚMERO'].dtype) == 'Int64'
+    assert df['DATA EMISSÃO'].iloc[0] == pd.Timestamp('2024-02-05 10:00:00')
+    assert isinstance(df['UF EMITENTE'].dtype, pd.CategoricalDtype)
+    assert df['VALOR NOTA FISCAL'].tolist() == [1234.56, 10.0]
+
+
+def test_values_with_dot_or_comma_decimals_are_parsed_as_written():
+    df = pd.DataFrame({'VALOR NOTA FISCAL': ['1.234,56', '1234.56', '1.234.567,8', '10', None]})
+
+    values = apply_schema(df, 'nfe_cabecalho')['VALOR NOTA FISCAL']
+
+    assert values.iloc[:4].tolist() == [1234.56, 1234.56, 1234567.8, 10.0]
+    assert pd.isna(values.iloc[4])
@@ -0,0 +1,59 @@
+import pytest
+
+from config.settings import settings
+from utils import parallel_query
+from utils.dataset_utils import save_dataframe, union_handle
+from utils.parallel_query import execute_plan_parallel, partitions, should_parallelize
+from utils.query_engine import build_plan, execute_plan
+
+
+def _rows(result):
+    if 'table' not in result:
+        return pytest.approx(result['value'])
+    return sorted(tuple(sorted((k, round(v, 6) if isinstance(v, float) else str(v)) for k, v in row.items()))
+                  for row in result['table'])
+
+
+@pytest.fixture
+def parquet_handle(nfe_frame, tmp_path, monkeypatch):
+    """Dois arquivos Parquet (um por mês, como uma união) com row groups de 50 linhas."""
+    monkeypatch.setattr(settings, 'PARQUET_ROW_GROUP_SIZE', 50)
+    return union_handle([save_dataframe(nfe_frame.iloc[:250], str(tmp_path), name='jan'),
+                         save_dataframe(nfe_frame.iloc[250:], str(tmp_path), name='fev')])
+
+
+def test_partitions_split_files_by_row_group_ranges(parquet_handle, monkeypatch):
+    monkeypatch.setattr(settings, 'PARALLEL_PARTITION_ROWS', 100)
+
+    parts = partitions(parquet_handle)
+
+    # 250 linhas: 5 row groups em 3 fatias; 150 linhas: 3 row groups em 2 fatias
+    assert [len(part['row_groups']) for part in parts] == [2, 1, 2, 2, 1]
+    for path in {part['path'] for part in parts}:
+        groups = [group for part in parts if part['path'] == path for group in part['row_groups']]
+        assert groups == list(range(len(groups)))
+
+
+def test_small_datasets_and_single_core_stay_in_process(parquet_handle, monkeypatch):
+    monkeypatch.setattr(settings, 'PARALLEL_MIN_ROWS', 100)
+    monkeypatch.setattr(settings, 'PARALLEL_WORKERS', 1)
+    assert not should_parallelize(parquet_handle)
+
+    monkeypatch.setattr(settings, 'PARALLEL_WORKERS', 2)
+    assert should_parallelize(parquet_handle)
+    monkeypatch.setattr(settings, 'PARALLEL_MIN_ROWS', 10 ** 6)
+    assert not should_parallelize(parquet_handle)
+
+
+def test_parallel_plan_matches_a_single_pass(nfe_frame, parquet_handle, monkeypatch):
+    monkeypatch.setattr(settings, 'PARALLEL_WORKERS', 2)
+    monkeypatch.setattr(settings, 'PARALLEL_PARTITION_ROWS', 100)
+    monkeypatch.setattr(parallel_query, '_pool', None)
+    try:
+        for question in ("Qual o valor total das notas fiscais?", "Quantas notas por UF de destino?",
+                         "Qual o valor total por mês?"):
+            plan = build_plan(question, nfe_frame)
+            parallel, serial = execute_plan_parallel(parquet_handle, plan), execute_plan(nfe_frame, plan)
+            assert _rows(parallel) == _rows(serial), question
+    finally:
+        parallel_query._pool.shutdown()
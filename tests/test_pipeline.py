@@ -0,0 +1,28 @@
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+
+def _header_total(zip_path: str) -> float:
+    """Soma do valor das notas lida direto dos CSVs de cabeçalho do ZIP, sem o pipeline."""
+    total = 0.0
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in archive.namelist():
+            if name.endswith('.csv') and 'Item' not in name:
+                df = pd.read_csv(io.BytesIO(archive.read(name)), sep=';', decimal=',')
+                total += df['VALOR NOTA FISCAL'].sum()
+    return total
+
+
+def test_run_pipeline_answers_from_a_zip(agents, nfe_zip, embeddings):
+    from pipeline import run_pipeline
+
+    result = run_pipeline(nfe_zip, "Qual o valor total das notas fiscais?", embeddings=embeddings)
+
+    assert result['resolved'] is True
+    assert result['answer']
+    assert result['selected_files']
+    (value,) = result['analysis']['analysis'].values()
+    assert value == pytest.approx(_header_total(nfe_zip))
@@ -0,0 +1,19 @@
+import zipfile
+
+from utils.file_utils import list_zip_csv_members
+
+
+def test_multi_dataset_counts_rows_of_every_group(agents, nfe_zip, tmp_path):
+    from pipeline import call_tool
+
+    members = list_zip_csv_members(nfe_zip)
+    with zipfile.ZipFile(nfe_zip) as archive:
+        lines = sum(archive.read(name).count(b'\n') - 1 for name in archive.namelist())
+
+    result = call_tool(agents.ProcessingAgent(), 'process_csv_files', csv_paths=members,
+                       workspace=str(tmp_path), backend='parquet')
+
+    handle = result['data_handle']
+    assert handle['format'] == 'multi' and len(handle['datasets']) == 2
+    assert handle['num_rows'] == sum(dataset['num_rows'] for dataset in handle['datasets']) == lines
+    assert result['metadata']['num_rows'] == lines
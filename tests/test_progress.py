@@ -0,0 +1,34 @@
+import os
+
+from utils.progress import COMPLETED, STARTED, ProgressLog, stage_progress, summarize_result
+
+
+def test_progress_log_keeps_only_the_latest_events():
+    log = ProgressLog(max_events=3)
+    for i in range(5):
+        log.record(f"etapa {i}", STARTED)
+
+    assert [event['seq'] for event in log.events()] == [3, 4, 5]
+    assert [event['seq'] for event in log.events(after=4)] == [5]
+    assert log.dropped == 2
+
+
+def test_results_are_summarized_not_stored():
+    dataset = {'num_rows': 1000, 'columns': ['a', 'b'], 'data': list(range(1000))}
+    log = ProgressLog()
+    event = log.record("Processamento", COMPLETED, 0.5, dataset)
+
+    assert event['summary'] == "1000 linhas, 2 colunas"
+    assert summarize_result(os.path.join('tmp', 'job', 'notas.csv')) == 'notas.csv'
+    assert len(summarize_result('x' * 10000, limit=20)) == 20
+
+
+def test_stage_progress_shows_the_last_event_per_stage():
+    log = ProgressLog()
+    log.record("Extração", STARTED)
+    log.record("Seleção", STARTED)
+    log.record("Extração", COMPLETED, 0.1)
+
+    assert [(event['stage'], event['status']) for event in stage_progress(log.events())] == [
+        ("Extração", COMPLETED), ("Seleção", STARTED)
+    ]
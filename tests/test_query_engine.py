@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from utils.query_engine import build_plan, execute_plan, result_label
+
+
+@pytest.fixture
+def notas():
+    return pd.DataFrame({
+        'chave de acesso': ['a', 'b', 'c', 'd'],
+        'razao social emitente': ['ACME', 'ACME', 'Beta', 'Gama'],
+        'uf destinatario': ['SP', 'RJ', 'SP', 'MG'],
+        'data emissao': pd.to_datetime(['2024-01-10', '2024-02-05', '2024-02-20', '2023-02-01']),
+        'valor nota fiscal': [100.0, 50.0, 30.0, 5.0],
+    })
+
+
+def test_total_without_filters(notas):
+    plan = build_plan("Qual o valor total das notas fiscais?", notas)
+    assert plan['operation'] == 'sum' and plan['filters'] == []
+    assert execute_plan(notas, plan) == {'value': 185.0}
+
+
+def test_top_n_ranks_the_grouped_sum(notas):
+    plan = build_plan("Quais os 2 maiores emitentes por valor?", notas)
+    assert (plan['operation'], plan['limit'], plan['group_by']) == ('top', 2, ['razao social emitente'])
+    assert [row['razao social emitente'] for row in execute_plan(notas, plan)['table']] == ['ACME', 'Beta']
+
+
+def test_month_and_year_become_date_filters(notas):
+    plan = build_plan("Qual o valor total em fevereiro de 2024?", notas)
+    assert [(flt['op'], flt['value']) for flt in plan['filters']] == [('month', 2), ('year', 2024)]
+    assert execute_plan(notas, plan) == {'value': 80.0}
+
+
+def test_count_by_destination_state(notas):
+    plan = build_plan("Quantas notas por UF de destino?", notas)
+    table = execute_plan(notas, plan)['table']
+    assert {row['uf destinatario']: row[result_label(plan)] for row in table} == {'SP': 2, 'RJ': 1, 'MG': 1}
+
+
+@pytest.mark.parametrize('question', [
+    "Qual o valor da nota número 123?",
+    "Qual o valor total da chave de acesso 35240112345678000190550010000001231000001230?",
+    "Qual o valor total das notas do CNPJ 12.345.678/0001-90?",
+    "Qual o valor total do CFOP 5102?",
+    "Qual o valor total em janeiro e fevereiro?",
+])
+def test_filters_the_plan_cannot_apply_return_none(notas, question):
+    assert build_plan(question, notas) is None
+
+
+def test_month_without_a_date_column_returns_none(notas):
+    assert build_plan("Qual o valor total em fevereiro?", notas.drop(columns=['data emissao'])) is None
+
+
+def test_identifier_as_grouping_is_not_a_filter(notas):
+    plan = build_plan("Quais os 3 maiores emitentes por cnpj?", notas)
+    assert plan is not None and plan['limit'] == 3
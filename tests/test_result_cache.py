@@ -0,0 +1,43 @@
+import time
+
+from utils.result_cache import ResultCache
+
+ANSWER = {'answer': "O valor total é R$ 10,00", 'analysis': {'total': 10.0}}
+
+
+def test_questions_are_matched_after_normalization():
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.put('dataset', "Qual o valor TOTAL das notas?", ANSWER)
+
+    assert cache.get('dataset', "qual o valor  total das notas?") == ANSWER
+    assert cache.get('outro-dataset', "Qual o valor total das notas?") is None
+
+
+def test_entries_expire_and_are_bounded():
+    cache = ResultCache(ttl=60, max_entries=2)
+    for question in ("a", "b", "c"):
+        cache.put('dataset', question, ANSWER)
+    assert len(cache) == 2 and cache.get('dataset', "a") is None
+
+    expired = ResultCache(ttl=0.01, max_entries=2)
+    expired.put('dataset', "a", ANSWER)
+    time.sleep(0.02)
+    assert expired.get('dataset', "a") is None
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    ResultCache(ttl=60, max_entries=10, directory=str(tmp_path)).put('dataset', "total", ANSWER)
+    other = ResultCache(ttl=60, max_entries=10, directory=str(tmp_path), max_files=1)
+
+    assert other.get('dataset', "total") == ANSWER
+    other.put('dataset', "por uf", ANSWER)
+    assert len(list(tmp_path.glob('*.json'))) == 1
+
+
+def test_similar_question_hits_only_with_the_same_signature(embeddings):
+    cache = ResultCache(ttl=60, max_entries=10, similarity=0.8)
+    cache.put('dataset', "Qual o valor total das notas fiscais?", ANSWER, embeddings)
+
+    assert cache.get('dataset', "Qual é o valor total das notas fiscais emitidas?", embeddings) == ANSWER
+    assert cache.get('dataset', "Qual o valor total das notas fiscais em 2024?", embeddings) is None
+    assert cache.get('dataset', "Qual o valor total das notas fiscais por UF?", embeddings) is None
@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+import pytest
+
+from utils.dataset_cache import get_dataset_cache
+
+
+class KeywordEmbeddings:
+    """Embeddings por palavras-chave: bastam para ordenar arquivos sem carregar um modelo."""
+
+    WORDS = ['valor', 'nota', 'uf', 'produto', 'quantidade']
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        vectors = np.array([[float(word in text.lower()) for word in self.WORDS]
+                            for text in ([texts] if single else texts)], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+    def encode_cached(self, texts):
+        return self.encode(list(texts))
+
+
+@pytest.fixture
+def selection_agent(agents):
+    return agents.SelectionAgent
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    header = tmp_path / 'cabecalho.csv'
+    header.write_text('NOTA;UF;VALOR\n' + ''.join(f'{i};SP;{i},5\n' for i in range(500)))
+    items = tmp_path / 'itens.csv'
+    items.write_text('PRODUTO;QUANTIDADE\n' + ''.join(f'P{i};{i}\n' for i in range(500)))
+    return str(header), str(items)
+
+
+def test_profiles_sample_rows_on_worker_threads(selection_agent, csv_files, monkeypatch):
+    header, items = csv_files
+    threads = set()
+    original = selection_agent.profile_csv
+
+    def profile_csv(csv_file, sample_rows=None):
+        threads.add(threading.get_ident())
+        return original(csv_file, sample_rows)
+
+    monkeypatch.setattr(selection_agent, 'profile_csv', staticmethod(profile_csv))
+    agent = selection_agent(KeywordEmbeddings())
+    # Com o LangChain, @tool embrulha o método; a função original fica em .func
+    select = getattr(selection_agent.select_relevant_csv, 'func', selection_agent.select_relevant_csv)
+
+    assert select(agent, [items, header], "Qual o valor por UF?") == header
+    assert threading.get_ident() not in threads
+    assert 'Amostra de nota: 0, 1, 2, 3, 4' in original(header, 5)
+
+
+def test_profiles_are_computed_once_per_dataset(selection_agent, csv_files, monkeypatch):
+    profiled = []
+    original = selection_agent.profile_csv
+
+    def profile_csv(csv_file, sample_rows=None):
+        profiled.append(csv_file)
+        return original(csv_file, sample_rows)
+
+    monkeypatch.setattr(selection_agent, 'profile_csv', staticmethod(profile_csv))
+    get_dataset_cache().get_or_create('selecao-perfis')
+    agent = selection_agent(KeywordEmbeddings())
+
+    first = agent.rank_csv_files(list(csv_files), "Qual o valor por UF?", 'selecao-perfis')
+    second = agent.rank_csv_files(list(csv_files), "Qual a quantidade por produto?", 'selecao-perfis')
+
+    assert sorted(profiled) == sorted(csv_files)
+    assert [path for path, _ in first] == list(csv_files)
+    assert [path for path, _ in second] == list(reversed(csv_files))
@@ -0,0 +1,49 @@
+import zipfile
+
+import pytest
+
+from utils.file_utils import zip_member_path
+from utils.sql_backend import SQLBackend, table_name_for
+
+
+@pytest.fixture
+def same_name_zip(tmp_path):
+    """Dois CSVs de mesmo nome em pastas diferentes do ZIP, com tamanhos distintos."""
+    path = str(tmp_path / 'filiais.zip')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('filial_a/notas.csv', "UF;VALOR\nSP;10,5\nRJ;4,5\n")
+        archive.writestr('filial_b/notas.csv', "UF;VALOR\nMG;1,0\nSP;2,0\nBA;3,0\n")
+    return path
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    return SQLBackend(str(tmp_path / 'warehouse.sqlite'), engine='sqlite')
+
+
+def test_same_basename_in_different_folders_gets_distinct_tables(same_name_zip, warehouse):
+    first = zip_member_path(same_name_zip, 'filial_a/notas.csv')
+    second = zip_member_path(same_name_zip, 'filial_b/notas.csv')
+    assert table_name_for(first) != table_name_for(second)
+    assert table_name_for(first).startswith('notas_')
+
+    assert warehouse.load_csv(table_name_for(first), first) == 2
+    assert warehouse.load_csv(table_name_for(second), second) == 3
+    assert warehouse.column_sum(table_name_for(first), 'valor') == pytest.approx(15.0)
+    assert warehouse.column_sum(table_name_for(second), 'valor') == pytest.approx(6.0)
+
+
+def test_table_is_reused_only_for_the_same_source(same_name_zip, tmp_path, warehouse):
+    first = zip_member_path(same_name_zip, 'filial_a/notas.csv')
+    second = zip_member_path(same_name_zip, 'filial_b/notas.csv')
+    warehouse.load_csv('notas', first)
+
+    # Cópia do mesmo upload em outro caminho: mesmo membro, a tabela é reaproveitada
+    copy = tmp_path / 'copia.zip'
+    copy.write_bytes(open(same_name_zip, 'rb').read())
+    assert warehouse.load_csv('notas', zip_member_path(str(copy), 'filial_a/notas.csv')) == 2
+    assert warehouse.table_info('notas')['source'] == first
+
+    # Outro membro no mesmo nome de tabela: recarrega em vez de devolver os dados antigos
+    assert warehouse.load_csv('notas', second) == 3
+    assert warehouse.table_info('notas')['source'] == second
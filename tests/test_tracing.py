@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from utils.tracing import JsonlSpanExporter, Tracer, add_count, current_span, set_attribute
+
+
+def test_spans_nest_and_counters_are_inclusive(tmp_path):
+    path = tmp_path / 'spans.jsonl'
+    tracer = Tracer([JsonlSpanExporter(str(path))])
+
+    with tracer.span("Consulta", query="total") as root:
+        with tracer.span("Seleção"):
+            set_attribute('files', 2)
+            add_count('embedding_calls', 3)
+        add_count('embedding_calls')
+    assert current_span() is None
+
+    spans = tracer.get_trace(root.trace_id)
+    assert [span['name'] for span in spans] == ["Consulta", "Seleção"]
+    child = spans[1]
+    assert child['parent_id'] == spans[0]['span_id']
+    assert child['attributes'] == {'files': 2} and child['counters'] == {'embedding_calls': 3}
+    assert spans[0]['counters'] == {'embedding_calls': 4}
+    assert spans[0]['wall_time'] >= child['wall_time'] >= 0
+    assert [json.loads(line)['name'] for line in path.read_text().splitlines()] == ["Seleção", "Consulta"]
+
+
+def test_span_log_is_rotated_by_size(tmp_path):
+    path = tmp_path / 'spans.jsonl'
+    exporter = JsonlSpanExporter(str(path), max_bytes=200, backup_count=2)
+
+    for i in range(20):
+        exporter.export({'name': f"span {i}", 'attributes': {'padding': 'x' * 50}})
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['spans.jsonl', 'spans.jsonl.1', 'spans.jsonl.2']
+    assert all(p.stat().st_size <= 200 for p in tmp_path.iterdir())
+    assert json.loads(path.read_text().splitlines()[-1])['name'] == "span 19"
+
+
+def test_errors_are_recorded_on_the_span():
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span("Processar") as span:
+            raise ValueError("CSV inválido")
+
+    (recorded,) = tracer.get_trace(span.trace_id)
+    assert recorded['status'] == 'error' and recorded['error'] == "ValueError: CSV inválido"
+
+
+def test_only_the_most_recent_traces_are_kept():
+    tracer = Tracer(max_traces=2)
+    ids = []
+    for name in ("a", "b", "c"):
+        with tracer.span(name) as span:
+            ids.append(span.trace_id)
+
+    assert tracer.recent_traces() == [ids[2], ids[1]]
+    assert tracer.get_trace(ids[0]) == []
@@ -0,0 +1,83 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from utils.embedding_utils import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+
+def sample_column_values(series: pd.Series, limit: int = 5, scan_rows: Optional[int] = None) -> List[str]:
+    """Amostra até `limit` valores distintos olhando só as primeiras linhas da coluna."""
+    scan_rows = scan_rows or settings.COLUMN_SAMPLE_SCAN_ROWS
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.cat.categories[:limit]
+    else:
+        values = pd.unique(series.head(scan_rows).dropna())[:limit]
+    return [str(value) for value in values]
+
+
+def column_context(name: str, series: pd.Series) -> str:
+    return f"Coluna: {name}. Valores: {', '.join(sample_column_values(series))}"
+
+
+class ColumnIndex:
+    """Embeddings normalizados das colunas de um dataset, em uma única matriz."""
+
+    def __init__(self, columns: List[str], embeddings: np.ndarray):
+        self.columns = list(columns)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.matrix = embeddings / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, embedding_service: EmbeddingService) -> 'ColumnIndex':
+        if df.columns.empty:
+            return cls([], np.empty((0, 0), dtype=np.float32))
+        contexts = [column_context(col, df[col]) for col in df.columns]
+        return cls(df.columns, embedding_service.encode_cached(contexts))
+
+    def top_k(self, query_embedding: np.ndarray, k: int = 3) -> List[Tuple[str, float]]:
+        """Colunas mais relevantes para a query, com a similaridade de cosseno."""
+        k = min(k, len(self.columns))
+        if k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        scores = self.matrix @ (query / norm if norm else query)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.columns[i], float(scores[i])) for i in best]
+
+
+_indexes: 'OrderedDict[Tuple[str, str, str], ColumnIndex]' = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_column_index(df: pd.DataFrame, embedding_service: EmbeddingService, key: Optional[str] = None) -> ColumnIndex:
+    """
+    Retorna o índice de colunas do dataset, reaproveitando o já construído para a mesma chave.
+
+    A chave inclui o modelo e o backend: embeddings de modelos diferentes não são comparáveis
+    com a query, então cada combinação tem o seu índice.
+    """
+    if key is None:
+        return ColumnIndex.build(df, embedding_service)
+
+    cache_key = (key, embedding_service.model_name, embedding_service.backend)
+    with _indexes_lock:
+        index = _indexes.get(cache_key)
+        if index is not None and index.columns == list(df.columns):
+            _indexes.move_to_end(cache_key)
+            return index
+
+    index = ColumnIndex.build(df, embedding_service)
+    with _indexes_lock:
+        _indexes[cache_key] = index
+        while len(_indexes) > settings.COLUMN_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
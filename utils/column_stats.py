@@ -0,0 +1,395 @@
+import base64
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from utils.query_engine import series_to_table
+
+logger = logging.getLogger(__name__)
+
+
+class HyperLogLog:
+    """Contagem aproximada de distintos (erro típico de 1.04/sqrt(2^p)), mesclável por máximo dos registradores."""
+
+    def __init__(self, precision: Optional[int] = None, registers: Optional[np.ndarray] = None):
+        self.precision = precision or settings.STATS_HLL_PRECISION
+        size = 1 << self.precision
+        self.registers = registers if registers is not None else np.zeros(size, dtype=np.uint8)
+
+    def add(self, series: pd.Series):
+        values = series.dropna()
+        if values.empty:
+            return
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        # Posição do primeiro bit 1 no sufixo (1 = bit mais significativo)
+        bit_length = np.zeros(len(suffix), dtype=np.int64)
+        nonzero = suffix > 0
+        bit_length[nonzero] = np.floor(np.log2(suffix[nonzero].astype(np.float64))).astype(np.int64) + 1
+        rank = (suffix_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def count(self) -> int:
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * size and zeros:
+            # Correção para cardinalidades pequenas (linear counting)
+            estimate = size * np.log(size / zeros)
+        return int(round(estimate))
+
+    def to_string(self) -> str:
+        return base64.b64encode(self.registers.tobytes()).decode('ascii')
+
+    @classmethod
+    def from_string(cls, data: str, precision: int) -> 'HyperLogLog':
+        registers = np.frombuffer(base64.b64decode(data), dtype=np.uint8).copy()
+        return cls(precision, registers)
+
+
+def _plain(value):
+    """Valor Python serializável em JSON (tipos numpy/pandas viram int/float/str)."""
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def _is_measure(series: pd.Series) -> bool:
+    return pd.api.types.is_float_dtype(series)
+
+
+def _is_dimension(series: pd.Series) -> bool:
+    return not _is_measure(series) and not pd.api.types.is_datetime64_any_dtype(series) \
+        and not pd.api.types.is_bool_dtype(series)
+
+
+def _group_entries(keys: pd.Series, df: pd.DataFrame, measures: List[str], rows: pd.Series) -> List[List]:
+    """Linhas [valor, linhas, {medida: soma}] para os valores de `rows` (contagens já calculadas)."""
+    sums = df[measures].groupby(keys, observed=True, sort=False).sum() if measures else None
+    entries = []
+    for value, count in rows.items():
+        measure_sums = {col: float(sums.at[value, col]) for col in measures} if sums is not None else {}
+        entries.append([_plain(value), int(count), measure_sums])
+    return entries
+
+
+def _merge_entries(left: List[List], right: List[List]) -> Dict:
+    merged: Dict = {}
+    for value, rows, sums in left + right:
+        key = (type(value).__name__, value)
+        if key not in merged:
+            merged[key] = [value, 0, {}]
+        merged[key][1] += rows
+        for col, total in sums.items():
+            merged[key][2][col] = merged[key][2].get(col, 0.0) + total
+    return merged
+
+
+class DatasetStats:
+    """
+    Índice de estatísticas de um dataset, calculado na ingestão: por coluna, contagens,
+    nulos, soma, mínimo/máximo, distintos (exatos no arquivo, HyperLogLog após mesclas),
+    tabela de grupos (linhas e somas das medidas por valor) completa para colunas de baixa
+    cardinalidade ou só os valores mais frequentes (heavy hitters) nas demais, e, em colunas
+    de data, linhas e somas por mês.
+
+    Índices de partes com o mesmo layout são mesclados com `merge` (uniões de arquivos e
+    blocos de um mesmo arquivo). `answer` responde um plano de query_engine sem ler os dados
+    quando o índice tem a informação exata; senão retorna None.
+    """
+
+    VERSION = 1
+
+    def __init__(self, num_rows: int, columns: Dict[str, Dict], measures: List[str]):
+        self.num_rows = num_rows
+        self.columns = columns
+        self.measures = measures
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'DatasetStats':
+        """Calcula o índice de um DataFrame (colunas em minúsculas no índice)."""
+        df = df.copy(deep=False)
+        df.columns = [str(col).lower() for col in df.columns]
+        measures = [col for col in df.columns if _is_measure(df[col])]
+        max_groups, heavy_hitters = settings.STATS_MAX_GROUPS, settings.STATS_HEAVY_HITTERS
+
+        columns = {}
+        for col in df.columns:
+            series = df[col]
+            count = int(series.count())
+            stats = {'dtype': str(series.dtype), 'count': count, 'nulls': int(len(series) - count)}
+
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                stats['sum'] = float(series.sum())
+                stats['min'] = _plain(series.min()) if count else None
+                stats['max'] = _plain(series.max()) if count else None
+            elif pd.api.types.is_datetime64_any_dtype(series):
+                stats['min'] = series.min().isoformat() if count else None
+                stats['max'] = series.max().isoformat() if count else None
+                periods = series.dt.to_period('M').astype(str).where(series.notna())
+                rows = periods.value_counts().sort_index()
+                stats['months'] = _group_entries(periods, df, measures, rows)
+
+            hll = HyperLogLog()
+            hll.add(series)
+            stats['hll'] = hll.to_string()
+
+            if _is_dimension(series):
+                rows = series.value_counts()
+                rows = rows[rows > 0]
+                stats['distinct'], stats['distinct_exact'] = int(len(rows)), True
+                complete = len(rows) <= max_groups
+                kept, keys, frame = rows, series, df
+                if not complete:
+                    # Alta cardinalidade: as somas só dos valores mantidos, sem agrupar o arquivo inteiro
+                    kept = rows.head(heavy_hitters)
+                    mask = series.isin(kept.index)
+                    keys, frame = series[mask], df[mask]
+                stats['groups'] = {
+                    'items': _group_entries(keys, frame, measures, kept),
+                    'complete': complete,
+                    # Limite superior da contagem de qualquer valor fora da lista
+                    'error': 0 if complete else int(rows.iloc[heavy_hitters]) if len(rows) > heavy_hitters else 0
+                }
+            else:
+                stats['distinct'], stats['distinct_exact'] = int(series.nunique()), True
+            stats['unique'] = stats['distinct'] == count == len(series)
+            columns[col] = stats
+        return cls(len(df), columns, measures)
+
+    def merge(self, other: 'DatasetStats') -> 'DatasetStats':
+        """Índice da concatenação dos dois datasets."""
+        columns = {}
+        for col in list(dict.fromkeys(list(self.columns) + list(other.columns))):
+            left, right = self.columns.get(col), other.columns.get(col)
+            if left is None or right is None:
+                # Coluna ausente em uma das partes: só a contagem de nulos continua exata
+                source = left or right
+                missing = other.num_rows if left else self.num_rows
+                columns[col] = {'dtype': source['dtype'], 'count': source['count'],
+                                'nulls': source['nulls'] + missing, 'unique': False}
+                continue
+            columns[col] = self._merge_column(left, right)
+        measures = [col for col in self.measures if col in other.measures]
+        return DatasetStats(self.num_rows + other.num_rows, columns, measures)
+
+    @staticmethod
+    def _merge_column(left: Dict, right: Dict) -> Dict:
+        stats = {'dtype': left['dtype'], 'count': left['count'] + right['count'],
+                 'nulls': left['nulls'] + right['nulls']}
+        if 'sum' in left and 'sum' in right:
+            stats['sum'] = left['sum'] + right['sum']
+        for key, pick in (('min', min), ('max', max)):
+            values = [stats_[key] for stats_ in (left, right) if stats_.get(key) is not None]
+            if key in left or key in right:
+                stats[key] = pick(values) if values else None
+
+        if 'hll' in left and 'hll' in right:
+            precision = settings.STATS_HLL_PRECISION
+            hll = HyperLogLog.from_string(left['hll'], precision).merge(HyperLogLog.from_string(right['hll'], precision))
+            stats['hll'] = hll.to_string()
+            stats['distinct'], stats['distinct_exact'] = hll.count(), False
+
+        if 'months' in left and 'months' in right:
+            merged = _merge_entries(left['months'], right['months'])
+            stats['months'] = sorted(merged.values(), key=lambda entry: entry[0])
+
+        if 'groups' in left and 'groups' in right:
+            merged = sorted(_merge_entries(left['groups']['items'], right['groups']['items']).values(),
+                            key=lambda entry: -entry[1])
+            complete = left['groups']['complete'] and right['groups']['complete'] \
+                and len(merged) <= settings.STATS_MAX_GROUPS
+            error = left['groups']['error'] + right['groups']['error']
+            if complete:
+                # Todos os valores conhecidos: o distinto volta a ser exato
+                stats['distinct'], stats['distinct_exact'] = len(merged), True
+            else:
+                kept = merged[:settings.STATS_HEAVY_HITTERS]
+                if len(merged) > len(kept):
+                    error += merged[len(kept)][1]
+                merged = kept
+            stats['groups'] = {'items': merged, 'complete': complete, 'error': error}
+
+        # Sem os valores, não há como saber se as partes repetem valores entre si
+        stats['unique'] = False
+        return stats
+
+    def column(self, name: Optional[str]) -> Optional[Dict]:
+        return self.columns.get(name.lower()) if name else None
+
+    def _count_is_rows(self, plan: Dict) -> bool:
+        """A contagem de distintos da coluna é igual à de linhas (coluna sem repetições nem nulos)."""
+        if not plan['count_column']:
+            return True
+        stats = self.column(plan['count_column'])
+        return bool(stats and stats.get('unique'))
+
+    def answer(self, plan: Dict) -> Optional[Dict]:
+        """
+        Resultado do plano (no formato de query_engine.execute_plan) calculado só pelo índice,
+        ou None quando o índice não basta (filtros por intervalo, agrupamentos incompletos,
+        mais de uma dimensão, etc.).
+        """
+        operation = plan['operation']
+        value_column = plan['value_column'].lower() if plan['value_column'] else None
+        if value_column and value_column not in self.columns:
+            return None
+        if any(flt['op'] not in ('month', 'year') for flt in plan['filters']):
+            return None
+
+        if plan['filters'] or plan['bucket']:
+            if plan['group_by']:
+                return None
+            return self._answer_by_month(plan, operation, value_column)
+
+        if not plan['group_by']:
+            if operation == 'count':
+                if plan['count_column']:
+                    stats = self.column(plan['count_column'])
+                    if not stats or not stats.get('distinct_exact'):
+                        return None
+                    return {'value': int(stats['distinct'])}
+                return {'value': int(self.num_rows)}
+            stats = self.columns[value_column]
+            if 'sum' not in stats:
+                return None
+            if operation == 'sum':
+                return {'value': float(stats['sum'])}
+            if operation == 'mean':
+                return {'value': stats['sum'] / stats['count'] if stats['count'] else None}
+            if operation in ('max', 'min'):
+                value = stats.get(operation)
+                return {'value': float(value) if value is not None else None}
+            return None
+
+        if len(plan['group_by']) != 1 or operation not in ('sum', 'count', 'top'):
+            return None
+        group_column = plan['group_by'][0]
+        stats = self.column(group_column)
+        if not stats or not stats.get('groups', {}).get('complete'):
+            return None
+        values = self._entry_values(stats['groups']['items'], operation, value_column, plan)
+        if values is None:
+            return None
+        return {'table': series_to_table(values.rename_axis(group_column), plan)}
+
+    def _entry_values(self, entries: List[List], operation: str, value_column: Optional[str],
+                      plan: Dict) -> Optional[pd.Series]:
+        """Série valor do grupo -> resultado (linhas na contagem, soma da medida nas demais)."""
+        if operation == 'count':
+            if not self._count_is_rows(plan):
+                return None
+            return pd.Series({entry[0]: entry[1] for entry in entries}, dtype='int64')
+        if value_column not in self.measures:
+            return None
+        return pd.Series({entry[0]: entry[2].get(value_column, 0.0) for entry in entries}, dtype='float64')
+
+    def _answer_by_month(self, plan: Dict, operation: str, value_column: Optional[str]) -> Optional[Dict]:
+        stats = self.column(plan['date_column'])
+        if not stats or 'months' not in stats or operation not in ('sum', 'count'):
+            return None
+        if any(flt['column'].lower() != plan['date_column'].lower() for flt in plan['filters']):
+            return None
+
+        entries = []
+        for entry in stats['months']:
+            if entry[0] in (None, 'NaT'):
+                continue
+            year, month = (int(part) for part in entry[0].split('-'))
+            if all((flt['op'] == 'month' and month == flt['value']) or (flt['op'] == 'year' and year == flt['value'])
+                   for flt in plan['filters']):
+                entries.append(entry)
+
+        values = self._entry_values(entries, operation, value_column, plan)
+        if values is None:
+            return None
+        if plan['bucket']:
+            return {'table': series_to_table(values.rename_axis('periodo'), plan)}
+        return {'value': int(values.sum()) if operation == 'count' else float(values.sum())}
+
+    def to_dict(self) -> Dict:
+        return {'version': self.VERSION, 'num_rows': self.num_rows, 'measures': self.measures,
+                'columns': self.columns}
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> 'DatasetStats':
+        return cls(payload['num_rows'], payload['columns'], payload['measures'])
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, default=_plain)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'DatasetStats':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def stats_path_for(data_path: str) -> str:
+    """Arquivo do índice ao lado do dataset (ex.: <nome>.parquet -> <nome>.stats.json)."""
+    return f"{os.path.splitext(data_path)[0]}.stats.json"
+
+
+def build_stats(df: pd.DataFrame, path: str) -> Optional[str]:
+    """Calcula e grava o índice do DataFrame; retorna o caminho ou None se falhar."""
+    try:
+        DatasetStats.from_frame(df).save(path)
+        return path
+    except Exception as e:
+        logger.warning(f"Falha ao calcular o índice de estatísticas ({path}): {e}")
+        return None
+
+
+_loaded: 'OrderedDict[Tuple, DatasetStats]' = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def load_stats(handle: Dict) -> Optional[DatasetStats]:
+    """
+    Índice de um handle de dataset (mesclando as partes de uniões), ou None se alguma
+    parte não tiver índice. Mantém os últimos índices lidos em memória.
+    """
+    paths = handle.get('stats')
+    if not settings.STATS_ENABLED or not paths:
+        return None
+    try:
+        key = tuple((path, os.path.getmtime(path)) for path in paths)
+    except OSError:
+        return None
+
+    with _loaded_lock:
+        stats = _loaded.get(key)
+        if stats is not None:
+            _loaded.move_to_end(key)
+            return stats
+
+    try:
+        stats = DatasetStats.load(paths[0])
+        for path in paths[1:]:
+            stats = stats.merge(DatasetStats.load(path))
+    except Exception as e:
+        logger.warning(f"Índice de estatísticas ilegível para {handle.get('path')}: {e}")
+        return None
+
+    with _loaded_lock:
+        _loaded[key] = stats
+        while len(_loaded) > settings.COLUMN_INDEX_CACHE_SIZE:
+            _loaded.popitem(last=False)
+    return stats
@@ -0,0 +1,203 @@
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+if TYPE_CHECKING:
+    # Só para anotações: o módulo é importado na inicialização do app e não deve carregar o pandas
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(data: bytes) -> str:
+    """Hash do conteúdo de um upload, usado como chave do dataset."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, block_size: int = 1024 * 1024) -> str:
+    """Hash do conteúdo de um arquivo em disco, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_upload(data: bytes, directory: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Salva o upload com o hash do conteúdo como nome e retorna (chave, caminho).
+
+    O arquivo é imutável: reenvios do mesmo ZIP não o regravam, e a escrita é atômica
+    para que jobs concorrentes nunca vejam um ZIP parcial.
+    """
+    directory = directory or settings.UPLOADS_DIR
+    os.makedirs(directory, exist_ok=True)
+    key = hash_bytes(data)
+    path = os.path.join(directory, f"{key}.zip")
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return key, path
+
+
+class DatasetEntry:
+    """
+    Estado reaproveitável de um upload: arquivos, perfis e dados processados.
+
+    Os arquivos extraídos e os datasets processados ficam em `directory`, do cache e não do
+    job: os handles guardados aqui continuam válidos depois que o workspace do job é apagado.
+    """
+
+    def __init__(self, key: str, zip_path: Optional[str] = None):
+        self.key = key
+        self.zip_path = zip_path
+        self.directory = os.path.join(settings.DATASETS_DIR, key)
+        self.files: Optional[List[str]] = None
+        self.profiles: Dict[str, str] = {}
+        self.processed: Dict[str, Dict] = {}
+        self.frames: Dict[str, 'pd.DataFrame'] = {}
+        self.frame_bytes: Dict[str, int] = {}
+        self.last_access = time.time()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def lock_for(self, path: str) -> threading.Lock:
+        """Lock por arquivo do dataset, para quem grava no diretório compartilhado entre jobs."""
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def size_bytes(self) -> int:
+        frames = sum(self.frame_bytes.get(path, 0) for path in self.frames)
+        profiles = sum(len(context) for context in self.profiles.values())
+        return frames + profiles
+
+    def remove_files(self):
+        """
+        Apaga do disco o que o dataset criou: o diretório (extração, Parquet, estatísticas),
+        o upload guardado por `store_upload` e o banco e as estatísticas do warehouse.
+        ZIPs fora de UPLOADS_DIR (ex.: arquivos do lote) não pertencem ao cache e ficam.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+        paths = glob.glob(os.path.join(glob.escape(settings.WAREHOUSE_DIR), f"{self.key}[._]*"))
+        databases = [path for path in paths if path.endswith(('.duckdb', '.sqlite'))]
+        if databases:
+            from utils.sql_backend import close_sql_backend
+
+            for database in databases:
+                close_sql_backend(database)
+        if self.zip_path and os.path.dirname(os.path.abspath(self.zip_path)) == os.path.abspath(settings.UPLOADS_DIR):
+            paths.append(self.zip_path)
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Falha ao remover {path}: {e}")
+
+
+class DatasetCache:
+    """Cache LRU de datasets por hash do upload, limitado em entradas e em bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, DatasetEntry]' = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Optional[str]) -> Optional[DatasetEntry]:
+        if not key:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_access = time.time()
+                self._entries.move_to_end(key)
+            return entry
+
+    def get_or_create(self, key: str, zip_path: Optional[str] = None) -> DatasetEntry:
+        with self._lock:
+            entry = self.get(key)
+            if entry is not None:
+                if zip_path:
+                    entry.zip_path = zip_path
+                return entry
+            entry = DatasetEntry(key, zip_path)
+            self._entries[key] = entry
+        self.evict()
+        return entry
+
+    def get_frame(self, path: str) -> Optional['pd.DataFrame']:
+        """Procura um DataFrame já carregado pelo caminho do seu handle."""
+        with self._lock:
+            for entry in reversed(self._entries.values()):
+                df = entry.frames.get(path)
+                if df is not None:
+                    return df
+        return None
+
+    def put_frame(self, key: str, path: str, df: 'pd.DataFrame'):
+        with self._lock:
+            entry = self.get(key)
+            if entry is None:
+                return
+            entry.frames[path] = df
+            entry.frame_bytes[path] = int(df.memory_usage(deep=True).sum())
+        self.evict()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes() for entry in self._entries.values())
+
+    def evict(self):
+        """
+        Remove os datasets menos usados até respeitar os limites configurados, junto com os
+        arquivos deles em disco (apagados fora do lock).
+        """
+        evicted: List[DatasetEntry] = []
+        with self._lock:
+            while len(self._entries) > self.max_entries:
+                key, entry = self._entries.popitem(last=False)
+                evicted.append(entry)
+                logger.info(f"Dataset removido do cache: {key}")
+
+            total = self.total_bytes()
+            while total > self.max_bytes and len(self._entries) > 1:
+                key, entry = self._entries.popitem(last=False)
+                total -= entry.size_bytes()
+                evicted.append(entry)
+                logger.info(f"Dataset removido do cache (limite de memória): {key}")
+
+            # Um único dataset acima do limite mantém só os metadados
+            if total > self.max_bytes and self._entries:
+                entry = next(iter(self._entries.values()))
+                entry.frames.clear()
+                entry.frame_bytes.clear()
+
+        for entry in evicted:
+            entry.remove_files()
+
+
+_dataset_cache: Optional[DatasetCache] = None
+_dataset_cache_lock = threading.Lock()
+
+
+def get_dataset_cache() -> DatasetCache:
+    """Retorna o cache de datasets do processo (sobrevive aos reruns do Streamlit)."""
+    global _dataset_cache
+    if _dataset_cache is None:
+        with _dataset_cache_lock:
+            if _dataset_cache is None:
+                _dataset_cache = DatasetCache(
+                    max_entries=settings.DATASET_CACHE_MAX_ENTRIES,
+                    max_bytes=settings.DATASET_CACHE_MAX_MB * 1024 * 1024
+                )
+    return _dataset_cache
@@ -0,0 +1,136 @@
+import os
+import uuid
+import logging
+import pandas as pd
+from pandas.api.types import union_categoricals
+from typing import Dict, Iterator, List, Optional
+from config.settings import settings
+from utils.dataset_cache import get_dataset_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def save_dataframe(df: pd.DataFrame, workspace: Optional[str] = None, name: Optional[str] = None) -> Dict:
+    """
+    Persiste o DataFrame em formato colunar no workspace e retorna um handle serializável.
+
+    Usa Parquet quando o pyarrow está disponível; caso contrário, pickle (preserva os dtypes).
+    """
+    workspace = workspace or settings.WORKSPACE_DIR
+    os.makedirs(workspace, exist_ok=True)
+    name = name or uuid.uuid4().hex
+
+    path, fmt = None, None
+    if _parquet_available():
+        try:
+            path = os.path.join(workspace, f"{name}.parquet")
+            df.to_parquet(path, index=False, row_group_size=settings.PARQUET_ROW_GROUP_SIZE)
+            fmt = 'parquet'
+        except Exception as e:
+            logger.warning(f"Falha ao salvar em Parquet, usando pickle: {e}")
+    if fmt is None:
+        path = os.path.join(workspace, f"{name}.pkl")
+        df.to_pickle(path)
+        fmt = 'pickle'
+
+    logger.info(f"Dataset salvo em {path} ({fmt}, {len(df)} linhas)")
+    return {
+        'path': path,
+        'format': fmt,
+        'num_rows': len(df),
+        'columns': list(df.columns)
+    }
+
+
+def load_dataframe(handle: Dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Carrega o DataFrame referenciado por um handle, opcionalmente apenas algumas colunas."""
+    fmt = handle.get('format')
+    if fmt == 'parquet':
+        return pd.read_parquet(handle['path'], columns=columns)
+    if fmt == 'pickle':
+        df = pd.read_pickle(handle['path'])
+        return df[columns] if columns else df
+    if fmt == 'union':
+        return concat_frames([resolve_handle(part, columns) for part in handle['parts']])
+    if fmt == 'multi':
+        from utils.multi_dataset import MultiDataset
+        return MultiDataset(handle).load(columns)
+    if fmt == 'sql':
+        from utils.sql_backend import SQLBackend
+        return SQLBackend.from_handle(handle).select(handle['table'], columns)
+    raise ValueError(f"Formato de dataset desconhecido: {fmt}")
+
+
+def union_handle(handles: List[Dict]) -> Dict:
+    """Handle de vários datasets com as mesmas colunas, concatenados só quando lidos."""
+    if len(handles) == 1:
+        return handles[0]
+    return {
+        'path': '|'.join(handle['path'] for handle in handles),
+        'format': 'union',
+        'parts': handles,
+        'num_rows': sum(handle['num_rows'] for handle in handles),
+        'columns': list(handles[0]['columns'])
+    }
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatena as partes mantendo as colunas categóricas como categoria (união das categorias)."""
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if all(isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames) \
+                and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = union_categoricals([frame[col] for frame in frames], ignore_order=True)
+    return df
+
+
+def resolve_handle(handle: Dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """DataFrame de um handle, usando o já carregado no cache de datasets quando houver."""
+    df = get_dataset_cache().get_frame(handle['path'])
+    if df is not None:
+        return df[columns] if columns else df
+    return load_dataframe(handle, columns=columns)
+
+
+def load_head(handle: Dict, n: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Primeiras `n` linhas de um handle; em Parquet lê só o primeiro lote, não o arquivo todo."""
+    df = get_dataset_cache().get_frame(handle['path'])
+    if df is not None:
+        return (df[columns] if columns else df).head(n)
+    if handle.get('format') == 'union':
+        return load_head(handle['parts'][0], n, columns)
+    if handle.get('format') == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        batch = next(pq.ParquetFile(handle['path']).iter_batches(batch_size=n, columns=columns), None)
+        if batch is not None:
+            return pa.Table.from_batches([batch]).to_pandas()
+    return load_dataframe(handle, columns=columns).head(n)
+
+
+def iter_handle_chunks(handle: Dict, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """DataFrames de um handle parte a parte (uma união em blocos nunca é concatenada)."""
+    if handle.get('format') == 'union':
+        for part in handle['parts']:
+            yield from iter_handle_chunks(part, columns)
+    else:
+        yield resolve_handle(handle, columns)
+
+
+def resolve_dataframe(processed_data: Dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Obtém o DataFrame do resultado do processamento, seja via handle ou registros inline."""
+    if 'data_handle' in processed_data:
+        return resolve_handle(processed_data['data_handle'], columns)
+    df = pd.DataFrame(processed_data['data'])
+    return df[columns] if columns else df
@@ -0,0 +1,114 @@
+import logging
+import time
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Backends de inferência do modelo de embeddings (EMBEDDING_BACKEND)
+TORCH = 'torch'
+TORCH_INT8 = 'torch-int8'
+ONNX = 'onnx'
+ONNX_INT8 = 'onnx-int8'
+BACKENDS = (TORCH, TORCH_INT8, ONNX, ONNX_INT8)
+
+# Tamanhos de lote testados no autoajuste
+BATCH_SIZE_CANDIDATES = (8, 16, 32, 64, 128)
+
+
+def set_num_threads(num_threads: int):
+    """Limita as threads de inferência do PyTorch (0 mantém o padrão da biblioteca)."""
+    if num_threads <= 0:
+        return
+    try:
+        import torch
+
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+
+def _load_torch(model_name: str, quantize: bool, num_threads: int):
+    from sentence_transformers import SentenceTransformer
+
+    set_num_threads(num_threads)
+    model = SentenceTransformer(model_name, device='cpu')
+    if quantize:
+        import torch
+
+        # Quantização dinâmica: pesos das camadas lineares em int8, ativações quantizadas em tempo de execução
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _load_onnx(model_name: str, file_name: Optional[str], num_threads: int):
+    import onnxruntime
+    from sentence_transformers import SentenceTransformer
+
+    session_options = onnxruntime.SessionOptions()
+    if num_threads > 0:
+        session_options.intra_op_num_threads = num_threads
+        session_options.inter_op_num_threads = 1
+    model_kwargs = {'provider': 'CPUExecutionProvider', 'session_options': session_options}
+    if file_name:
+        model_kwargs['file_name'] = file_name
+    # Mesmo pipeline do SentenceTransformer (tokenização e pooling); só a inferência vai para o ONNX Runtime
+    return SentenceTransformer(model_name, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+
+
+def load_model(model_name: str, backend: str, num_threads: int = 0, onnx_file: Optional[str] = None):
+    """
+    Carrega o modelo de embeddings no backend pedido.
+
+    Os backends ONNX dependem de `onnxruntime`/`optimum` e do suporte a `backend=` do
+    sentence-transformers (>= 3.2); se não estiverem disponíveis, o modelo é carregado
+    no PyTorch (quantizado em int8 quando o backend pedido era 'onnx-int8').
+
+    Args:
+        model_name: Nome do modelo no Hugging Face
+        backend: Um de BACKENDS
+        num_threads: Threads de inferência (0 usa o padrão)
+        onnx_file: Arquivo ONNX dentro do repositório do modelo, para 'onnx-int8'
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embeddings desconhecido: {backend}. Use um de {', '.join(BACKENDS)}")
+
+    if backend in (ONNX, ONNX_INT8):
+        try:
+            return _load_onnx(model_name, onnx_file if backend == ONNX_INT8 else None, num_threads)
+        except (ImportError, TypeError, OSError) as e:
+            fallback = TORCH_INT8 if backend == ONNX_INT8 else TORCH
+            logger.warning(f"Backend {backend} indisponível ({e}); usando {fallback}")
+            backend = fallback
+    return _load_torch(model_name, backend == TORCH_INT8, num_threads)
+
+
+def autotune_batch_size(
+    model,
+    sample_texts: Sequence[str],
+    candidates: Sequence[int] = BATCH_SIZE_CANDIDATES,
+    repeats: int = 2
+) -> int:
+    """
+    Escolhe o tamanho de lote com maior vazão (textos/s) para este modelo e esta máquina.
+
+    Cada candidato codifica `sample_texts` (repetidos até somar 2 lotes do maior candidato)
+    e fica o melhor tempo de `repeats` execuções.
+    """
+    texts = list(sample_texts)
+    target = 2 * max(candidates)
+    texts = (texts * (target // max(len(texts), 1) + 1))[:target]
+
+    best_size, best_rate = candidates[0], 0.0
+    for batch_size in candidates:
+        elapsed = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.encode(texts, batch_size=batch_size)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        rate = len(texts) / elapsed if elapsed > 0 else float('inf')
+        logger.debug(f"Lote {batch_size}: {rate:.0f} textos/s")
+        if rate > best_rate:
+            best_size, best_rate = batch_size, rate
+    logger.info(f"Tamanho de lote escolhido para embeddings: {best_size} ({best_rate:.0f} textos/s)")
+    return best_size
+
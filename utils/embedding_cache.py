@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class MemmapVectorStore:
+    """
+    Armazena vetores em um arquivo float32 mapeado em memória, indexado por chave.
+
+    Vários processos podem gravar no mesmo diretório: cada gravação acontece sob um lock de
+    arquivo (`flock`), a linha inicial vem do tamanho do arquivo de vetores lido sob o lock, e
+    o índice é um log só de acréscimos (`chave\tlinha` por linha) que cada processo lê
+    incrementalmente, sem regravar o índice inteiro a cada inclusão.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.log_path = os.path.join(directory, 'index.log')
+        self.lock_path = os.path.join(directory, '.lock')
+        self.vectors_path = os.path.join(directory, 'vectors.f32')
+        self.index: Dict[str, int] = {}
+        self.dim: Optional[int] = None
+        self._vectors = None
+        self._log_offset = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Lock de arquivo entre processos (compartilhado para leitura, exclusivo para gravação)."""
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        """Carrega os metadados e o log do índice, e mapeia o arquivo de vetores."""
+        try:
+            with self._locked(exclusive=False):
+                if os.path.exists(self.meta_path):
+                    with open(self.meta_path, 'r', encoding='utf-8') as f:
+                        self.dim = json.load(f).get('dim')
+                self._log_offset = 0
+                self._read_log()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Índice do cache de embeddings inválido em {self.directory}: {e}")
+            self.index, self._log_offset = {}, 0
+        self._map_vectors()
+
+    def _read_log(self):
+        """Aplica as entradas do log gravadas depois da última leitura (chamar sob o lock)."""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        self._log_offset += len(data)
+        for line in data.decode('utf-8').splitlines():
+            key, _, row = line.partition('\t')
+            if row:
+                self.index[key] = int(row)
+
+    def _map_vectors(self):
+        self._vectors = None
+        if self.dim and os.path.exists(self.vectors_path):
+            rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+            if rows:
+                self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+
+    def _refresh(self):
+        """Lê o que outros processos acrescentaram ao log e remapeia os vetores se cresceram."""
+        try:
+            log_size = os.path.getsize(self.log_path)
+        except OSError:
+            return
+        if log_size == self._log_offset:
+            return
+        with self._locked(exclusive=False):
+            if self.dim is None and os.path.exists(self.meta_path):
+                with open(self.meta_path, 'r', encoding='utf-8') as f:
+                    self.dim = json.load(f).get('dim')
+            self._read_log()
+        self._map_vectors()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.index.get(key)
+        if row is None or self._vectors is None or row >= self._vectors.shape[0]:
+            return None
+        return np.array(self._vectors[row])
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        self._refresh()
+        return [self.get(key) for key in keys]
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._locked(exclusive=True):
+            self._read_log()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'dim': self.dim}, f)
+                os.replace(tmp_path, self.meta_path)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimensão incompatível com o cache: {vectors.shape[1]} != {self.dim}")
+
+            row_bytes = self.dim * 4
+            with open(self.vectors_path, 'ab') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size % row_bytes:
+                    # Gravação interrompida de outro processo: completa a linha para manter o alinhamento
+                    padding = row_bytes - size % row_bytes
+                    f.write(b'\0' * padding)
+                    size += padding
+                start = size // row_bytes
+                f.write(vectors.tobytes())
+
+            lines = ''.join(f"{key}\t{start + offset}\n" for offset, key in enumerate(keys))
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+            self._read_log()
+        self._map_vectors()
+
+
+class EmbeddingCache:
+    """Cache de embeddings em dois níveis: LRU em memória e vetores persistidos em disco."""
+
+    def __init__(self, model_name: str, cache_dir: Optional[str] = None, max_memory_items: int = 10000):
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self._memory: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = None
+        if cache_dir:
+            safe_name = re.sub(r'[^\w.-]', '_', model_name)
+            try:
+                self._store = MemmapVectorStore(os.path.join(cache_dir, safe_name))
+            except OSError as e:
+                logger.warning(f"Cache de embeddings em disco desativado: {e}")
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Busca os embeddings de cada texto, retornando None para os ausentes."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            found: List[Optional[np.ndarray]] = [None] * len(keys)
+            pending = []
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    found[i] = vector
+                else:
+                    pending.append(i)
+
+            if pending and self._store is not None:
+                for i, vector in zip(pending, self._store.get_many([keys[i] for i in pending])):
+                    if vector is not None:
+                        self.disk_hits += 1
+                        self._remember(keys[i], vector)
+                        found[i] = vector
+
+            self.misses += sum(1 for vector in found if vector is None)
+            return found
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, np.asarray(vector, dtype=np.float32))
+            if self._store is not None:
+                try:
+                    self._store.put_many(keys, vectors)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Falha ao persistir embeddings: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'memory_items': len(self._memory),
+            'disk_items': len(self._store.index) if self._store is not None else 0
+        }
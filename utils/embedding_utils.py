@@ -0,0 +1,119 @@
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.settings import settings
+from utils.embedding_backends import TORCH, autotune_batch_size, load_model
+from utils.embedding_cache import EmbeddingCache
+from utils.tracing import add_count
+
+logger = logging.getLogger(__name__)
+
+_services: Dict[tuple, 'EmbeddingService'] = {}
+
+# Textos no formato dos contextos de colunas/arquivos, usados no autoajuste do lote
+_AUTOTUNE_TEXTS = [
+    "Coluna: VALOR NOTA FISCAL. Exemplos: 1.234,56; 89,90; 15.000,00",
+    "Coluna: RAZÃO SOCIAL EMITENTE. Exemplos: EMPRESA EXEMPLO LTDA; COMERCIAL SILVA ME",
+    "Coluna: DATA EMISSÃO Amostra de DATA EMISSÃO: 01/01/2024 10:00:00, 15/02/2024 08:30:00",
+    "Coluna: DESCRIÇÃO DO PRODUTO/SERVIÇO. Exemplos: PAPEL A4; CANETA ESFEROGRÁFICA; NOTEBOOK",
+]
+_services_lock = threading.Lock()
+
+
+class EmbeddingService:
+    """Modelo de embeddings compartilhado, carregado sob demanda uma única vez por processo."""
+
+    def __init__(self, model_name: str, model=None, backend: Optional[str] = None):
+        """
+        `model` permite injetar um modelo já carregado (ex.: o stub dos benchmarks);
+        `backend` escolhe a inferência (padrão: EMBEDDING_BACKEND).
+        """
+        self.model_name = model_name
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        self.batch_size: Optional[int] = settings.EMBEDDING_BATCH_SIZE or None
+        self._model = model
+        self._lock = threading.Lock()
+        # Vetores quantizados diferem levemente dos do float32: cada backend tem seu cache
+        cache_name = model_name if self.backend == TORCH else f"{model_name}@{self.backend}"
+        self.cache = EmbeddingCache(
+            cache_name,
+            cache_dir=settings.EMBEDDING_CACHE_DIR if settings.EMBEDDING_CACHE_ENABLED else None,
+            max_memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS
+        )
+
+    @property
+    def model(self):
+        """Retorna o modelo, carregando-o na primeira chamada (thread-safe)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def _load_model(self):
+        try:
+            logger.info(f"Carregando modelo de embeddings: {self.model_name} (backend {self.backend})")
+            return load_model(self.model_name, self.backend, settings.EMBEDDING_NUM_THREADS,
+                              settings.EMBEDDING_ONNX_FILE)
+        except Exception as e:
+            logger.error(f"Erro ao carregar o modelo de embeddings: {e}")
+            raise
+
+    def encode(self, texts, **kwargs):
+        """Gera embeddings usando o modelo compartilhado."""
+        add_count('embedding_calls')
+        add_count('embedding_texts', 1 if isinstance(texts, str) else len(texts))
+        if self.batch_size and 'batch_size' not in kwargs:
+            kwargs['batch_size'] = self.batch_size
+        return self.model.encode(texts, **kwargs)
+
+    def encode_cached(self, texts: List[str]) -> np.ndarray:
+        """Gera embeddings reaproveitando o cache; apenas os textos inéditos vão ao modelo."""
+        found = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(found) if vector is None]
+        add_count('embedding_cache_hits', len(texts) - len(missing))
+        if missing:
+            vectors = np.asarray(self.encode([texts[i] for i in missing]), dtype=np.float32)
+            self.cache.put_many([texts[i] for i in missing], vectors)
+            for i, vector in zip(missing, vectors):
+                found[i] = vector
+        if not found:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(found)
+
+    def warmup(self, autotune: bool = True) -> 'EmbeddingService':
+        """
+        Carrega o modelo e executa uma inferência curta para aquecer o processo; sem
+        EMBEDDING_BATCH_SIZE configurado e com `autotune`, mede e fixa o tamanho de lote
+        mais rápido.
+        """
+        self.encode("aquecimento")
+        if autotune and self.batch_size is None:
+            self.batch_size = autotune_batch_size(self.model, _AUTOTUNE_TEXTS)
+        return self
+
+
+def get_embedding_service(model_name: Optional[str] = None, backend: Optional[str] = None) -> EmbeddingService:
+    """Retorna o serviço de embeddings do processo para o modelo e backend informados."""
+    key = (model_name or settings.EMBEDDING_MODEL_NAME, backend or settings.EMBEDDING_BACKEND)
+    service = _services.get(key)
+    if service is None:
+        with _services_lock:
+            service = _services.get(key)
+            if service is None:
+                service = EmbeddingService(key[0], backend=key[1])
+                _services[key] = service
+    return service
+
+
+def warmup_embedding_service(model_name: Optional[str] = None, backend: Optional[str] = None,
+                             autotune: bool = True) -> EmbeddingService:
+    """Hook de inicialização: carrega e aquece o modelo antes da primeira consulta."""
+    return get_embedding_service(model_name, backend).warmup(autotune)
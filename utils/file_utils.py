@@ -1,13 +1,60 @@
 import os
 import zipfile
 import pandas as pd
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, List, Optional, Tuple
 from config.settings import settings
 import logging
+import threading
 import csv
+import io
+from utils.nfe_schema import apply_schema, detect_schema, schema_dtypes
 
 logger = logging.getLogger(__name__)
 
+# Referência a um membro de ZIP lido em streaming: zip://<caminho do zip>!/<membro>
+ZIP_MEMBER_PREFIX = 'zip://'
+ZIP_MEMBER_SEPARATOR = '!/'
+
+
+def zip_member_path(zip_path: str, member: str) -> str:
+    """Monta a referência para um membro do ZIP, usada no lugar de um caminho extraído."""
+    return f"{ZIP_MEMBER_PREFIX}{zip_path}{ZIP_MEMBER_SEPARATOR}{member}"
+
+
+def is_zip_member(path: str) -> bool:
+    return path.startswith(ZIP_MEMBER_PREFIX)
+
+
+def split_zip_member(path: str) -> Tuple[str, str]:
+    """Separa uma referência zip:// em (caminho do zip, nome do membro)."""
+    zip_path, member = path[len(ZIP_MEMBER_PREFIX):].split(ZIP_MEMBER_SEPARATOR, 1)
+    return zip_path, member
+
+
+def list_zip_csv_members(zip_path: str) -> List[str]:
+    """Lista os CSVs do ZIP apenas pelo diretório central, sem descompactar nada."""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = [
+            info.filename for info in zip_ref.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.csv')
+        ]
+    logger.info(f"CSVs encontrados no ZIP: {members}")
+    return [zip_member_path(zip_path, member) for member in members]
+
+
+@contextmanager
+def open_csv_source(file_path: str) -> Iterator[IO[bytes]]:
+    """Abre um CSV em modo binário, seja um arquivo em disco ou um membro de ZIP (streaming)."""
+    if is_zip_member(file_path):
+        zip_path, member = split_zip_member(file_path)
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref, zip_ref.open(member) as source:
+            yield source
+    else:
+        with open(file_path, 'rb') as source:
+            yield source
+
+
 def extract_zip(zip_path: str, extract_to: Optional[str] = None) -> List[str]:
     """Extrai arquivos ZIP para o diretório especificado."""
     extract_to = extract_to or settings.TEMP_EXTRACTION_DIR
@@ -23,45 +70,250 @@ def extract_zip(zip_path: str, extract_to: Optional[str] = None) -> List[str]:
         logger.error(f"Erro ao extrair arquivo ZIP: {e}")
         raise
 
-def load_csv(file_path: str) -> pd.DataFrame:
-    """Carrega um arquivo CSV como DataFrame com suporte a múltiplas codificações."""
-    encodings = ['utf-8', 'latin1', 'iso-8859-1']
-    separator = None
+# Bytes lidos do início do arquivo para detectar codificação e separador
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_DELIMITERS = ';,\t|'
+
+_csv_format_cache: Dict[Tuple, Dict] = {}
+_csv_format_lock = threading.Lock()
+
 
+def file_fingerprint(file_path: str) -> Tuple:
+    """Identifica o conteúdo do arquivo (caminho, tamanho, mtime; CRC para membros de ZIP)."""
+    if is_zip_member(file_path):
+        zip_path, member = split_zip_member(file_path)
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            info = zip_ref.getinfo(member)
+        return (os.path.abspath(zip_path), member, info.file_size, info.CRC)
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def _detect_encoding(head: bytes) -> str:
+    if head.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
     try:
-        # Detectar o separador
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as file:
-                    try:
-                        dialect = csv.Sniffer().sniff(file.read(1024))
-                        separator = dialect.delimiter
-                        break
-                    except:
-                        separator = ';'  # Fallback para ponto-e-vírgula
-                break
-            except UnicodeDecodeError:
-                continue
+        head.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # Caractere multibyte cortado no fim do prefixo ainda é UTF-8 válido
+        if e.start >= len(head) - 3 and e.reason == 'unexpected end of data':
+            return 'utf-8'
+        return 'latin1'
 
-        if not separator:
-            separator = ';'  # Último fallback
 
-        # Tentar carregar o CSV
-        for encoding in encodings:
-            try:
-                return pd.read_csv(file_path, encoding=encoding, sep=separator, decimal=',')
-            except Exception as e:
-                logger.warning(f"Tentativa com codificação {encoding} falhou: {e}")
-                continue
+def _detect_separator(sample: str) -> str:
+    lines = sample.splitlines()[:20]
+    if len(lines) > 1 and len(sample) == CSV_SNIFF_BYTES:
+        lines = lines[:-1]  # Última linha pode estar truncada
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return ';'  # Fallback para ponto-e-vírgula
+
+
+def detect_csv_format(file_path: str) -> Dict:
+    """
+    Detecta codificação, separador, cabeçalho e esquema NF-e uma única vez,
+    a partir de um prefixo limitado do arquivo.
+
+    O resultado fica em cache pela impressão digital do arquivo.
+    """
+    fingerprint = file_fingerprint(file_path)
+    cached = _csv_format_cache.get(fingerprint)
+    if cached is not None:
+        return cached
+
+    with open_csv_source(file_path) as source:
+        head = source.read(CSV_SNIFF_BYTES)
+    encoding = _detect_encoding(head)
+    sample = head.decode(encoding, errors='ignore')
+    separator = _detect_separator(sample)
+    columns = next(csv.reader(io.StringIO(sample), delimiter=separator), [])
+    csv_format = {
+        'encoding': encoding,
+        'sep': separator,
+        'columns': columns,
+        'schema': detect_schema(columns)
+    }
+    with _csv_format_lock:
+        _csv_format_cache[fingerprint] = csv_format
+    return csv_format
+
+
+def _reader_options(csv_format: Dict) -> Dict[str, str]:
+    return {'encoding': csv_format['encoding'], 'sep': csv_format['sep']}
+
 
-        raise ValueError("Não foi possível carregar o CSV com nenhuma codificação suportada.")
+def _pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# Valores tratados como nulos, equivalentes aos padrões do pd.read_csv
+CSV_NULL_VALUES = ['', 'NA', 'N/A', 'NaN', 'nan', 'NULL', 'null', '#N/A']
+
+
+def _read_csv_pyarrow(source, csv_format: Dict, dtype: Optional[Dict] = None,
+                      usecols: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lê o CSV com o parser multithread do pyarrow; colunas textuais do esquema não passam por inferência."""
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    dtype = dtype or {}
+    text_columns = {col: pa.string() for col, kind in dtype.items() if str(kind) in ('category', 'string', 'str', 'object')}
+    table = pa_csv.read_csv(
+        source,
+        read_options=pa_csv.ReadOptions(encoding=csv_format['encoding']),
+        parse_options=pa_csv.ParseOptions(delimiter=csv_format['sep']),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=text_columns,
+            include_columns=usecols or [],
+            decimal_point=',',
+            null_values=CSV_NULL_VALUES,
+            strings_can_be_null=True
+        )
+    )
+    # Texto que não decodifica vira coluna binária no pyarrow: trata como erro de codificação
+    for field in table.schema:
+        if pa.types.is_binary(field.type):
+            raise UnicodeDecodeError(csv_format['encoding'], b'', 0, 1, f"coluna {field.name} não decodificada")
+    df = table.to_pandas()
+    return df.astype(dtype) if dtype else df
+
+
+def _is_arrow_error(error: Exception) -> bool:
+    import pyarrow as pa
+
+    return isinstance(error, pa.ArrowException)
+
+
+def _read_csv(file_path: str, csv_format: Dict, **kwargs):
+    """Lê o CSV do stream do arquivo com o formato detectado (pyarrow quando possível, senão engine C)."""
+    use_pyarrow = (
+        _pyarrow_available()
+        and kwargs.get('nrows') is None
+        and kwargs.get('chunksize') is None
+    )
+    if use_pyarrow:
+        try:
+            with open_csv_source(file_path) as source:
+                return _read_csv_pyarrow(source, csv_format, kwargs.get('dtype'), kwargs.get('usecols'))
+        except UnicodeDecodeError:
+            raise
+        except Exception as e:
+            # Erro de conversão para os dtypes do esquema sobe (load_csv relê com os tipos seguros);
+            # erros do próprio pyarrow (ex.: linhas curtas, ArrowInvalid) caem no engine C
+            if isinstance(e, (ValueError, TypeError)) and not _is_arrow_error(e):
+                raise
+            logger.warning(f"Engine pyarrow falhou para {file_path}, usando engine C: {e}")
+    with open_csv_source(file_path) as source:
+        return pd.read_csv(source, engine='c', decimal=',', **_reader_options(csv_format), **kwargs)
+
+
+def _latin1_fallback(file_path: str, csv_format: Dict) -> Dict:
+    """Byte inválido além do prefixo: o arquivo não é UTF-8, então fixa latin1 no cache."""
+    logger.warning(f"{file_path} não é UTF-8 válido; relendo como latin1")
+    csv_format = dict(csv_format, encoding='latin1')
+    with _csv_format_lock:
+        _csv_format_cache[file_fingerprint(file_path)] = csv_format
+    return csv_format
+
+
+def _schema_dtypes(csv_format: Dict, usecols: Optional[List[str]], safe: bool = False) -> Optional[Dict]:
+    if not csv_format.get('schema'):
+        return None
+    return schema_dtypes(csv_format['schema'], usecols or csv_format['columns'], safe=safe)
+
+
+def _finish_schema(df: pd.DataFrame, csv_format: Dict, apply: bool) -> pd.DataFrame:
+    if apply and csv_format.get('schema'):
+        return apply_schema(df, csv_format['schema'])
+    return df
+
+
+def load_csv(
+    file_path: str,
+    nrows: Optional[int] = None,
+    dtype: Optional[Dict] = None,
+    usecols: Optional[List[str]] = None,
+    schema: bool = True
+) -> pd.DataFrame:
+    """Carrega um arquivo CSV (em disco ou membro de ZIP) como DataFrame.
+
+    Codificação e separador são detectados uma vez por arquivo; a leitura usa o engine
+    pyarrow quando disponível. Com `nrows`, lê apenas o cabeçalho e as primeiras linhas.
+    Exportações de NF-e reconhecidas recebem os dtypes do esquema (ver utils.nfe_schema).
+    """
+    try:
+        csv_format = detect_csv_format(file_path)
+        use_schema = schema and dtype is None
+        if use_schema:
+            dtype = _schema_dtypes(csv_format, usecols)
+        kwargs = {'nrows': nrows, 'dtype': dtype, 'usecols': usecols}
+        try:
+            try:
+                df = _read_csv(file_path, csv_format, **kwargs)
+            except UnicodeDecodeError:
+                if csv_format['encoding'] == 'latin1':
+                    raise
+                csv_format = _latin1_fallback(file_path, csv_format)
+                df = _read_csv(file_path, csv_format, **kwargs)
+        except (ValueError, TypeError) as e:
+            if not use_schema or not dtype or isinstance(e, UnicodeDecodeError):
+                raise
+            # Valor fora do esquema: lê só com os tipos seguros e converte depois
+            logger.warning(f"Dtypes do esquema falharam para {file_path}, convertendo após a leitura: {e}")
+            kwargs['dtype'] = _schema_dtypes(csv_format, usecols, safe=True)
+            df = _read_csv(file_path, csv_format, **kwargs)
+        return _finish_schema(df, csv_format, use_schema)
     except Exception as e:
         logger.error(f"Erro ao carregar CSV: {e}")
         raise
 
+
+def iter_csv_chunks(
+    file_path: str,
+    chunksize: int,
+    dtype: Optional[Dict] = None,
+    usecols: Optional[List[str]] = None,
+    schema: bool = True
+) -> Iterator[pd.DataFrame]:
+    """Lê o CSV em blocos de até `chunksize` linhas, sem carregar o arquivo inteiro."""
+    csv_format = detect_csv_format(file_path)
+    use_schema = schema and dtype is None
+    if use_schema:
+        # Nos blocos só os tipos seguros vão ao parser; o restante é convertido por bloco
+        dtype = _schema_dtypes(csv_format, usecols, safe=True)
+    rows_read = 0
+    try:
+        with open_csv_source(file_path) as source:
+            reader = pd.read_csv(source, engine='c', decimal=',', chunksize=chunksize,
+                                 dtype=dtype, usecols=usecols, **_reader_options(csv_format))
+            for chunk in reader:
+                rows_read += len(chunk)
+                yield _finish_schema(chunk, csv_format, use_schema)
+    except UnicodeDecodeError:
+        if csv_format['encoding'] == 'latin1':
+            raise
+        csv_format = _latin1_fallback(file_path, csv_format)
+        # Relê como latin1, pulando os blocos já entregues
+        with open_csv_source(file_path) as source:
+            reader = pd.read_csv(source, engine='c', decimal=',', chunksize=chunksize,
+                                 dtype=dtype, usecols=usecols,
+                                 skiprows=range(1, rows_read + 1), **_reader_options(csv_format))
+            for chunk in reader:
+                yield _finish_schema(chunk, csv_format, use_schema)
+
+
 def find_csv_files(directory: str) -> List[str]:
     """Encontra todos os arquivos CSV em um diretório."""
     csv_files = []
+    if is_zip_member(directory):
+        return csv_files
     for root, _, files in os.walk(directory):
         for file in files:
             if file.lower().endswith('.csv'):
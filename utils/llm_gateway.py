@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.outputs import ChatResult
+
+from utils.tracing import add_count
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Cache LRU com expiração por tempo, seguro entre threads."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RetryPolicy:
+    """Backoff exponencial com jitter total; respeita o Retry-After dos limites de taxa."""
+
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status == 429 or status >= 500
+        name = type(error).__name__
+        return isinstance(error, (TimeoutError, ConnectionError)) or 'Timeout' in name or 'Connection' in name
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return None
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(backoff, self.retry_after(error) or 0.0)
+
+    def should_retry(self, attempt: int, error: Exception) -> bool:
+        return attempt < self.max_retries and self.is_retryable(error)
+
+
+def prompt_key(model: str, temperature: float, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+               **kwargs) -> str:
+    """
+    Chave do cache: (modelo, temperatura, hash do prompt). O hash cobre também os parâmetros
+    da chamada (tools, response_format, max_tokens...): o mesmo prompt com outros parâmetros
+    tem outra resposta.
+    """
+    payload = json.dumps(
+        [[message.type, message.content, message.additional_kwargs] for message in messages]
+        + [stop or [], sorted(kwargs.items())],
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    prompt_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return f"{model}|{temperature}|{prompt_hash}"
+
+
+class LLMGateway(BaseChatModel):
+    """
+    Modelo de chat usado pelos agentes: encaminha para um cliente único do processo
+    (com o pool de conexões dele), aplica retries com jitter e guarda as respostas
+    em cache por (modelo, temperatura, prompt) com TTL.
+
+    O cliente é qualquer modelo de chat do LangChain (ChatGroq, ou um stub nos testes).
+    """
+
+    client: Any
+    model_name: str
+    temperature: float = 0.0
+    retry: Any = None
+    # Não `cache`: esse campo do BaseChatModel liga o cache global do LangChain
+    response_cache: Any = None
+    max_concurrency: int = 4
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return 'nfe-llm-gateway'
+
+    @property
+    def _identifying_params(self):
+        return {'model_name': self.model_name, 'temperature': self.temperature}
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        # Mantém a soma de token_usage do cliente (o padrão do LangChain descarta)
+        return self.client._combine_llm_outputs(llm_outputs)
+
+    def _cached(self, key: str) -> Optional[ChatResult]:
+        if self.response_cache is None:
+            return None
+        result = self.response_cache.get(key)
+        if result is None:
+            return None
+        add_count('llm_cache_hits')
+        logger.info("Resposta do LLM servida do cache")
+        # Sem token_usage: a resposta em cache não consome tokens de novo
+        return ChatResult(generations=result.generations, llm_output={'cached': True})
+
+    def _store(self, key: str, result: ChatResult):
+        if self.response_cache is not None:
+            self.response_cache.put(key, result)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        key = prompt_key(self.model_name, self.temperature, messages, stop, **kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        attempt = 0
+        while True:
+            try:
+                result = self.client._generate(messages, stop=stop, **kwargs)
+                break
+            except Exception as e:
+                if self.retry is None or not self.retry.should_retry(attempt, e):
+                    raise
+                delay = self.retry.delay(attempt, e)
+                logger.warning(f"Falha na chamada ao LLM ({type(e).__name__}); nova tentativa em {delay:.1f}s")
+                add_count('llm_retries')
+                time.sleep(delay)
+                attempt += 1
+        self._store(key, result)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        key = prompt_key(self.model_name, self.temperature, messages, stop, **kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        attempt = 0
+        while True:
+            try:
+                result = await self.client._agenerate(messages, stop=stop, **kwargs)
+                break
+            except Exception as e:
+                if self.retry is None or not self.retry.should_retry(attempt, e):
+                    raise
+                delay = self.retry.delay(attempt, e)
+                logger.warning(f"Falha na chamada ao LLM ({type(e).__name__}); nova tentativa em {delay:.1f}s")
+                add_count('llm_retries')
+                await asyncio.sleep(delay)
+                attempt += 1
+        self._store(key, result)
+        return result
+
+    async def acomplete_many(self, prompts: List[str]) -> List[str]:
+        """Executa prompts independentes em paralelo, limitado a `max_concurrency` simultâneos."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def complete(prompt: str) -> str:
+            async with semaphore:
+                message = await self.ainvoke([HumanMessage(content=prompt)])
+                return message.content
+
+        return list(await asyncio.gather(*(complete(prompt) for prompt in prompts)))
+
+    def complete_many(self, prompts: List[str]) -> List[str]:
+        """Versão síncrona de `acomplete_many` (para chamadores fora de um event loop)."""
+        return asyncio.run(self.acomplete_many(prompts))
@@ -0,0 +1,170 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.column_stats import load_stats
+from utils.dataset_utils import iter_handle_chunks, load_head, resolve_handle
+from utils.nfe_schema import normalize_column_name
+from utils.parallel_query import execute_plan_parallel, should_parallelize
+from utils.query_engine import COLUMN_ROLES, execute_plan, execute_plan_chunked, plan_columns, resolve_role
+from utils.sql_backend import SQLBackend
+from utils.tracing import add_count
+
+logger = logging.getLogger(__name__)
+
+
+class MultiDataset:
+    """
+    Datasets de um upload com layouts diferentes (ex.: cabeçalho e itens de NF-e), cada um
+    possivelmente a união de vários arquivos. As colunas são lidas sob demanda e o join
+    pela chave de acesso só acontece quando o plano precisa de colunas dos dois lados.
+    Planos que o índice de estatísticas do dataset responde não leem os dados; datasets grandes
+    são agregados em paralelo, por partição.
+    """
+
+    def __init__(self, handle: Dict):
+        self.handle = handle
+        self.datasets: List[Dict] = handle['datasets']
+
+    @classmethod
+    def from_handle(cls, handle: Dict) -> 'MultiDataset':
+        """Aceita também o handle de um único dataset (ex.: tabela do banco embarcado)."""
+        if handle['format'] == 'multi':
+            return cls(handle)
+        return cls({'format': 'multi', 'path': handle['path'], 'datasets': [handle],
+                    'num_rows': handle['num_rows'], 'columns': cls.columns_of(handle)})
+
+    @staticmethod
+    def columns_of(dataset: Dict) -> List[str]:
+        return [str(col).lower() for col in dataset['columns']]
+
+    def _by_schema(self, schema: str) -> Optional[Dict]:
+        return next((dataset for dataset in self.datasets if dataset.get('schema') == schema), None)
+
+    def _load(self, dataset: Dict, columns: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """Lê colunas (em minúsculas) de um dos datasets; em uniões, só as partes necessárias."""
+        if dataset['format'] == 'sql':
+            return SQLBackend.from_handle(dataset).select(dataset['table'], columns, limit=limit)
+
+        original = {str(col).lower(): col for col in dataset['columns']}
+        selected = [original[col] for col in columns] if columns else None
+        if limit is not None:
+            df = load_head(dataset, limit, selected)
+        else:
+            df = resolve_handle(dataset, selected)
+        df = df.copy(deep=False)
+        df.columns = df.columns.str.lower()
+        return df
+
+    def _iter_chunks(self, dataset: Dict, columns: List[str]):
+        """Blocos (partes) de um dataset processado em modo 'chunked', com colunas em minúsculas."""
+        original = {str(col).lower(): col for col in dataset['columns']}
+        for df in iter_handle_chunks(dataset, [original[col] for col in columns]):
+            df = df.copy(deep=False)
+            df.columns = df.columns.str.lower()
+            yield df
+
+    def sample(self, n: int) -> pd.DataFrame:
+        """
+        Amostra com as colunas de todos os datasets, para escolher colunas e montar o plano.
+        As linhas não se correspondem entre datasets: servem só para nomes, dtypes e valores típicos.
+        """
+        frames, seen = [], set()
+        for dataset in self.datasets:
+            df = self._load(dataset, limit=n).reset_index(drop=True)
+            df = df[[col for col in df.columns if col not in seen]]
+            seen.update(df.columns)
+            frames.append(df)
+        return pd.concat(frames, axis=1)
+
+    def dataset_for(self, columns: List[str]) -> Optional[Dict]:
+        """Dataset que contém todas as colunas; o cabeçalho tem preferência (uma linha por nota)."""
+        candidates = [dataset for dataset in self.datasets if set(columns) <= set(self.columns_of(dataset))]
+        header = next((dataset for dataset in candidates if dataset.get('schema') == 'nfe_cabecalho'), None)
+        return header or (candidates[0] if candidates else None)
+
+    def _item_level(self, plan: Dict, items: Dict) -> Dict:
+        """No join, a medida vem dos itens: o valor do cabeçalho se repetiria em cada item da nota."""
+        value_column = plan['value_column']
+        item_columns = self.columns_of(items)
+        if not value_column or value_column in item_columns:
+            return plan
+        normalized = normalize_column_name(value_column)
+        for role, candidates in COLUMN_ROLES.items():
+            replacement = resolve_role(item_columns, role) if normalized in candidates else None
+            if replacement:
+                logger.info(f"Join cabeçalho + itens: usando {replacement} no lugar de {value_column}")
+                return dict(plan, value_column=replacement)
+        return plan
+
+    def _joined(self, items: Dict, header: Dict, columns: List[str], key: str) -> pd.DataFrame:
+        item_columns = [col for col in columns if col in self.columns_of(items) and col != key]
+        header_columns = [col for col in columns if col not in item_columns and col != key]
+        left = self._load(items, item_columns + [key])
+        right = self._load(header, header_columns + [key]).drop_duplicates(key)
+        # A chave é categoria nos itens e texto no cabeçalho
+        left[key] = left[key].astype(object)
+        right[key] = right[key].astype(object)
+        return left.merge(right, on=key, how='left')
+
+    def execute_plan(self, plan: Dict) -> Tuple[Dict, Dict]:
+        """
+        Executa o plano no dataset que tem todas as colunas ou no join itens + cabeçalho.
+
+        Returns:
+            (resultado no formato de query_engine.execute_plan, plano efetivamente executado)
+        """
+        dataset = self.dataset_for(plan_columns(plan))
+        header, items = self._by_schema('nfe_cabecalho'), self._by_schema('nfe_itens')
+        if dataset is None and header is not None and items is not None:
+            plan = self._item_level(plan, items)
+            dataset = self.dataset_for(plan_columns(plan))
+
+        if dataset is not None:
+            stats = load_stats(dataset)
+            aggregation = stats.answer(plan) if stats is not None else None
+            if aggregation is not None:
+                logger.info("Plano respondido pelo índice de estatísticas")
+                add_count('stats_index_answers')
+                return aggregation, plan
+            if dataset['format'] == 'sql':
+                return SQLBackend.from_handle(dataset).execute_plan(dataset['table'], plan), plan
+            if should_parallelize(dataset):
+                return execute_plan_parallel(dataset, plan), plan
+            if dataset.get('chunked'):
+                return execute_plan_chunked(self._iter_chunks(dataset, plan_columns(plan)), plan), plan
+            return execute_plan(self._load(dataset, plan_columns(plan)), plan), plan
+
+        if header is None or items is None:
+            raise ValueError(f"As colunas {plan_columns(plan)} não estão em um mesmo arquivo")
+        if items['format'] == 'sql':
+            warehouse = SQLBackend.from_handle(items)
+            view = warehouse.create_join_view(items['table'], header['table'])
+            return warehouse.execute_plan(view, plan), plan
+        key = resolve_role(self.columns_of(items), 'nota')
+        return execute_plan(self._joined(items, header, plan_columns(plan), key), plan), plan
+
+    def column_sum(self, column: str) -> float:
+        dataset = self.dataset_for([column])
+        stats = load_stats(dataset)
+        column_stats = stats.column(column) if stats is not None else None
+        if column_stats and 'sum' in column_stats:
+            return column_stats['sum']
+        if dataset['format'] == 'sql':
+            return SQLBackend.from_handle(dataset).column_sum(dataset['table'], column) or 0.0
+        if dataset.get('chunked'):
+            return sum(df[column].sum() for df in self._iter_chunks(dataset, [column]))
+        return self._load(dataset, [column])[column].sum()
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Materializa as colunas pedidas (todas por padrão), com join quando vêm dos dois layouts."""
+        columns = [col.lower() for col in columns] if columns else list(self.handle['columns'])
+        dataset = self.dataset_for(columns)
+        if dataset is not None:
+            return self._load(dataset, columns)
+        header, items = self._by_schema('nfe_cabecalho'), self._by_schema('nfe_itens')
+        if header is None or items is None:
+            raise ValueError(f"As colunas {columns} não estão em um mesmo arquivo")
+        key = resolve_role(self.columns_of(items), 'nota')
+        return self._joined(items, header, columns, key)[columns]
@@ -0,0 +1,132 @@
+import re
+import logging
+import unicodedata
+import pandas as pd
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tipos lógicos usados no registro de esquemas
+CATEGORY = 'category'
+TEXT = 'string'
+KEY = 'Int64'
+DECIMAL = 'float64'
+DATE = 'date'
+
+_COMMON_COLUMNS = {
+    'CHAVE DE ACESSO': TEXT,  # 44 dígitos: não cabe em int64
+    'MODELO': CATEGORY,
+    'SERIE': KEY,
+    'NUMERO': KEY,
+    'NATUREZA DA OPERACAO': CATEGORY,
+    'DATA EMISSAO': DATE,
+    'CPF/CNPJ EMITENTE': CATEGORY,
+    'RAZAO SOCIAL EMITENTE': CATEGORY,
+    'INSCRICAO ESTADUAL EMITENTE': CATEGORY,
+    'UF EMITENTE': CATEGORY,
+    'MUNICIPIO EMITENTE': CATEGORY,
+    'CNPJ DESTINATARIO': CATEGORY,
+    'NOME DESTINATARIO': CATEGORY,
+    'UF DESTINATARIO': CATEGORY,
+    'INDICADOR IE DESTINATARIO': CATEGORY,
+    'DESTINO DA OPERACAO': CATEGORY,
+    'CONSUMIDOR FINAL': CATEGORY,
+    'PRESENCA DO COMPRADOR': CATEGORY,
+}
+
+# Layouts das exportações CSV de NF-e (cabeçalho e itens)
+NFE_SCHEMAS = {
+    'nfe_cabecalho': {
+        'required': {'CHAVE DE ACESSO', 'DATA EMISSAO', 'VALOR NOTA FISCAL'},
+        'columns': dict(_COMMON_COLUMNS, **{
+            'EVENTO MAIS RECENTE': CATEGORY,
+            'DATA/HORA EVENTO MAIS RECENTE': DATE,
+            'VALOR NOTA FISCAL': DECIMAL,
+        })
+    },
+    'nfe_itens': {
+        'required': {'CHAVE DE ACESSO', 'CFOP', 'QUANTIDADE', 'VALOR UNITARIO'},
+        'columns': dict(_COMMON_COLUMNS, **{
+            # Uma nota tem vários itens: a chave se repete e compensa como categoria
+            'CHAVE DE ACESSO': CATEGORY,
+            'NUMERO PRODUTO': KEY,
+            'DESCRICAO DO PRODUTO/SERVICO': CATEGORY,
+            'CODIGO NCM/SH': CATEGORY,
+            'NCM/SH (TIPO DE PRODUTO)': CATEGORY,
+            'CFOP': CATEGORY,
+            'QUANTIDADE': DECIMAL,
+            'UNIDADE': CATEGORY,
+            'VALOR UNITARIO': DECIMAL,
+            'VALOR TOTAL': DECIMAL,
+        })
+    }
+}
+
+
+def normalize_column_name(name: str) -> str:
+    """Normaliza o nome da coluna: sem acentos, maiúsculo e sem espaços extras."""
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip().upper()
+
+
+def detect_schema(columns: Iterable[str]) -> Optional[str]:
+    """Reconhece o layout de NF-e a partir dos nomes das colunas do cabeçalho."""
+    normalized = {normalize_column_name(col) for col in columns}
+    for name, schema in NFE_SCHEMAS.items():
+        if schema['required'] <= normalized:
+            return name
+    return None
+
+
+def schema_dtypes(schema_name: str, columns: Iterable[str], safe: bool = False) -> Dict[str, str]:
+    """
+    Monta o mapa de dtypes para o pd.read_csv com os nomes originais das colunas.
+
+    Datas são convertidas depois da leitura. Com `safe`, inclui apenas tipos que não
+    falham na leitura (categorias e texto).
+    """
+    types = NFE_SCHEMAS[schema_name]['columns']
+    dtypes = {}
+    for col in columns:
+        kind = types.get(normalize_column_name(col))
+        if kind is None or kind == DATE:
+            continue
+        if safe and kind not in (CATEGORY, TEXT):
+            continue
+        dtypes[col] = kind
+    return dtypes
+
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    first = series.first_valid_index()
+    if first is None:
+        return pd.to_datetime(series, errors='coerce')
+    if re.match(r'^\d{4}-\d{2}-\d{2}', str(series.at[first])):
+        return pd.to_datetime(series, format='ISO8601', errors='coerce')
+    return pd.to_datetime(series, dayfirst=True, errors='coerce')
+
+
+def apply_schema(df: pd.DataFrame, schema_name: str) -> pd.DataFrame:
+    """Converte as colunas do DataFrame para os dtypes do esquema (datas, chaves e valores)."""
+    types = NFE_SCHEMAS[schema_name]['columns']
+    for col in df.columns:
+        kind = types.get(normalize_column_name(col))
+        if kind is None or str(df[col].dtype) == kind:
+            continue
+        if kind == DATE:
+            df[col] = _parse_dates(df[col])
+        elif kind == KEY:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(KEY)
+        elif kind == DECIMAL:
+            values = df[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                # Com vírgula decimal (1.234,56) os pontos são de milhar; sem vírgula (1234.56) o ponto é o decimal
+                text = values.astype(str)
+                decimal_comma = text.str.contains(',', regex=False)
+                values = text.mask(decimal_comma,
+                                   text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+            df[col] = pd.to_numeric(values, errors='coerce')
+        else:
+            df[col] = df[col].astype(kind)
+    return df
@@ -0,0 +1,102 @@
+import atexit
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from config.settings import settings
+from utils.query_engine import merge_partials, partial_aggregate, plan_columns
+from utils.tracing import add_count, set_attribute
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def worker_count() -> int:
+    """Processos do pool de agregação (PARALLEL_WORKERS; 0 usa todos os núcleos)."""
+    return settings.PARALLEL_WORKERS or os.cpu_count() or 1
+
+
+def _parquet_files(handle: Dict) -> Optional[List[Dict]]:
+    """Arquivos Parquet de um handle (uniões achatadas); None se alguma parte não for Parquet."""
+    if handle.get('format') == 'union':
+        files = []
+        for part in handle['parts']:
+            part_files = _parquet_files(part)
+            if part_files is None:
+                return None
+            files.extend(part_files)
+        return files
+    return [handle] if handle.get('format') == 'parquet' else None
+
+
+def should_parallelize(handle: Dict) -> bool:
+    """Agregação em paralelo só compensa em datasets Parquet grandes e com mais de um núcleo."""
+    return settings.PARALLEL_ENABLED and worker_count() > 1 \
+        and handle.get('num_rows', 0) >= settings.PARALLEL_MIN_ROWS \
+        and _parquet_files(handle) is not None
+
+
+def partitions(handle: Dict) -> List[Dict]:
+    """
+    Divide o dataset em partições de até ~PARALLEL_PARTITION_ROWS linhas: cada arquivo
+    é uma partição, e arquivos grandes são fatiados por faixas de row groups do Parquet.
+    """
+    import pyarrow.parquet as pq
+
+    result = []
+    for file in _parquet_files(handle):
+        metadata = pq.ParquetFile(file['path']).metadata
+        num_groups = metadata.num_row_groups
+        if num_groups == 0:
+            continue
+        slices = max(1, min(num_groups, math.ceil(metadata.num_rows / settings.PARALLEL_PARTITION_ROWS)))
+        bounds = [round(i * num_groups / slices) for i in range(slices + 1)]
+        for start, end in zip(bounds, bounds[1:]):
+            result.append({'path': file['path'], 'columns': file['columns'], 'row_groups': list(range(start, end))})
+    return result
+
+
+def _aggregate_partition(partition: Dict, columns: List[str], plan: Dict) -> Dict:
+    """Executado no processo do pool: lê a partição (arquivo mapeado em memória) e reduz."""
+    import pyarrow.parquet as pq
+
+    original = {str(col).lower(): col for col in partition['columns']}
+    parquet = pq.ParquetFile(partition['path'], memory_map=True)
+    df = parquet.read_row_groups(partition['row_groups'], columns=[original[col] for col in columns]).to_pandas()
+    df.columns = df.columns.str.lower()
+    return partial_aggregate(df, plan)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Pool de processos compartilhado, criado no primeiro uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn': o app tem threads (jobs, Streamlit), e fork de processo com threads não é seguro
+            _pool = ProcessPoolExecutor(max_workers=worker_count(), mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+            logger.info(f"Pool de agregação iniciado com {worker_count()} processos")
+        return _pool
+
+
+def execute_plan_parallel(handle: Dict, plan: Dict) -> Dict:
+    """
+    Executa o plano em partições do dataset no pool de processos e combina os agregados
+    parciais, no mesmo formato de `query_engine.execute_plan`. Cada processo lê só as
+    colunas do plano da sua partição; o processo principal só recebe os parciais.
+    """
+    parts = partitions(handle)
+    columns = plan_columns(plan)
+    set_attribute('partitions', len(parts))
+    add_count('parallel_partitions', len(parts))
+    logger.info(f"Agregando {handle.get('num_rows')} linhas em {len(parts)} partições")
+
+    pool = get_pool()
+    futures = [pool.submit(_aggregate_partition, part, columns, plan) for part in parts]
+    return merge_partials((future.result() for future in futures), plan)
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config.settings import settings
+
+# Status das etapas
+STARTED = 'Iniciado'
+COMPLETED = 'Concluído'
+ERROR = 'Erro'
+
+
+def truncate(text: str, limit: Optional[int] = None) -> str:
+    """Corta o texto em `limit` caracteres, indicando o corte."""
+    limit = limit or settings.PROGRESS_SUMMARY_CHARS
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def summarize_result(result, limit: Optional[int] = None) -> Optional[str]:
+    """
+    Resumo curto do resultado de uma etapa para o log de progresso.
+
+    Nunca serializa o resultado inteiro: datasets viram contagens de linhas/colunas,
+    listas viram quantidades e textos são truncados.
+    """
+    if result is None:
+        return None
+    if isinstance(result, BaseException):
+        return truncate(str(result), limit)
+    if isinstance(result, dict):
+        if 'error' in result:
+            return truncate(f"Erro: {result['error']}", limit)
+        if 'num_rows' in result:
+            return f"{result['num_rows']} linhas, {len(result.get('columns') or [])} colunas"
+        if 'files' in result:
+            return f"{len(result['files'])} arquivo(s)"
+        if 'answer' in result:
+            return truncate(str(result['answer']), limit)
+        return truncate(', '.join(str(key) for key in result), limit)
+    if isinstance(result, (list, tuple)):
+        return f"{len(result)} item(ns)"
+    if isinstance(result, str):
+        if os.path.sep in result and '\n' not in result:
+            return truncate(os.path.basename(result.split('!/')[-1]), limit)
+        return truncate(result, limit)
+    return type(result).__name__
+
+
+class ProgressLog:
+    """
+    Eventos de progresso de uma consulta: limitados aos `max_events` mais recentes e
+    estruturados (etapa, status, duração, resumo), sem guardar os resultados das etapas.
+    """
+
+    def __init__(self, max_events: Optional[int] = None):
+        self._events = deque(maxlen=max_events or settings.PROGRESS_MAX_EVENTS)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, status: str, duration: Optional[float] = None, result=None) -> Dict:
+        """Registra um evento; tem a assinatura do callback de progresso do pipeline."""
+        event = {
+            'stage': stage,
+            'status': truncate(status),
+            'duration': duration,
+            'summary': summarize_result(result),
+            'time': time.time()
+        }
+        with self._lock:
+            self._seq += 1
+            event['seq'] = self._seq
+            self._events.append(event)
+        return event
+
+    def events(self, after: int = 0) -> List[Dict]:
+        """Eventos com sequência maior que `after` (para consumo incremental)."""
+        with self._lock:
+            return [event for event in self._events if event['seq'] > after]
+
+    @property
+    def dropped(self) -> int:
+        """Quantidade de eventos antigos descartados pelo limite."""
+        with self._lock:
+            return self._seq - len(self._events)
+
+
+def stage_progress(events: List[Dict]) -> List[Dict]:
+    """Último evento de cada etapa, na ordem em que as etapas começaram."""
+    latest: Dict[str, Dict] = {}
+    for event in events:
+        latest[event['stage']] = event
+    return list(latest.values())
@@ -0,0 +1,526 @@
+import re
+import logging
+import unicodedata
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.nfe_schema import normalize_column_name
+
+logger = logging.getLogger(__name__)
+
+# Papéis semânticos -> nomes de coluna (normalizados) nas exportações de NF-e, em ordem de preferência
+COLUMN_ROLES = {
+    'valor': ['VALOR NOTA FISCAL', 'VALOR TOTAL'],
+    'valor_unitario': ['VALOR UNITARIO'],
+    'quantidade': ['QUANTIDADE'],
+    'data': ['DATA EMISSAO'],
+    'nota': ['CHAVE DE ACESSO'],
+    'emitente': ['RAZAO SOCIAL EMITENTE', 'CPF/CNPJ EMITENTE'],
+    'destinatario': ['NOME DESTINATARIO', 'CNPJ DESTINATARIO'],
+    'uf': ['UF EMITENTE'],
+    'uf_destinatario': ['UF DESTINATARIO'],
+    'municipio': ['MUNICIPIO EMITENTE'],
+    'cfop': ['CFOP'],
+    'ncm': ['CODIGO NCM/SH', 'NCM/SH (TIPO DE PRODUTO)'],
+    'produto': ['DESCRICAO DO PRODUTO/SERVICO'],
+    'natureza': ['NATUREZA DA OPERACAO'],
+}
+
+# Palavras da pergunta -> papel da dimensão de agrupamento
+GROUP_KEYWORDS = [
+    (r'uf (de |do )?destin\w*|estado (de |do )?destin\w*', 'uf_destinatario'),
+    (r'emitentes?|fornecedor(es)?|empresas?|vendedor(es)?', 'emitente'),
+    (r'destinatarios?|clientes?|compradores?', 'destinatario'),
+    (r'\bufs?\b|estados?', 'uf'),
+    (r'municipios?|cidades?', 'municipio'),
+    (r'\bcfops?\b', 'cfop'),
+    (r'\bncms?\b', 'ncm'),
+    (r'produtos?|itens|servicos?', 'produto'),
+    (r'natureza', 'natureza'),
+]
+
+MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
+}
+
+MONTH_NAMES = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho',
+               'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+
+DEFAULT_TOP_N = 10
+
+# Filtros por identificador (nota, chave, documento) que o plano não sabe aplicar
+IDENTIFIER_FILTER = r'\b(chaves?( de acesso)?|cnpj|cpf|numero (da|do) (nota|nf\w*|documento)|serie)\b'
+
+TOP_PATTERNS = [r'\b(\d+)\s+(maiores|principais|menores)\b', r'\b(top|maiores|principais|ranking|menores)\b\s*(\d+)?']
+
+
+def normalize_query(query: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples."""
+    text = unicodedata.normalize('NFKD', query.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def resolve_role(columns: Sequence[str], role: str) -> Optional[str]:
+    """Encontra a coluna do DataFrame que cumpre o papel semântico informado."""
+    normalized = {normalize_column_name(col): col for col in columns}
+    for candidate in COLUMN_ROLES.get(role, []):
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def _parse_operation(text: str) -> Tuple[str, Optional[int], bool]:
+    """Retorna (operação, limite do top-N, ordem decrescente)."""
+    # "5 maiores" antes de "maiores": senão o número anterior à palavra se perde
+    top = re.search(TOP_PATTERNS[0], text)
+    if top:
+        return 'top', int(top.group(1)), top.group(2) != 'menores'
+    top = re.search(TOP_PATTERNS[1], text)
+    if top:
+        limit = int(top.group(2)) if top.lastindex and top.group(2) else DEFAULT_TOP_N
+        return 'top', limit, top.group(1) != 'menores'
+
+    if re.search(r'\bquant[ao]s\b|\bnumero de\b|\bcontagem\b|\bquantidade de (notas|nfs?|nf-e|itens|registros|linhas)\b', text):
+        return 'count', None, True
+    if re.search(r'\bmedi[ao]\b', text):
+        return 'mean', None, True
+    if re.search(r'\b(maior|mais)\b', text):
+        return 'max', None, True
+    if re.search(r'\b(menor|menos)\b', text):
+        return 'min', None, False
+    if re.search(r'\b(total|soma|somatorio|quantidade|valor)\b', text):
+        return 'sum', None, True
+    return '', None, True
+
+
+def _parse_group_by(text: str, columns: Sequence[str], operation: str) -> List[str]:
+    """Dimensões de agrupamento: 'por <dimensão>' ou a dimensão citada em um ranking."""
+    group_by = []
+    for pattern, role in GROUP_KEYWORDS:
+        by_pattern = rf'\bpor (\w+ )?({pattern})'
+        mentioned = re.search(by_pattern, text) or (operation in ('top', 'max', 'min') and re.search(pattern, text))
+        if not mentioned:
+            continue
+        # Consome o trecho para que "uf de destino" não case também com "uf"
+        text = text[:mentioned.start()] + ' ' + text[mentioned.end():]
+        column = resolve_role(columns, role)
+        if column and column not in group_by:
+            group_by.append(column)
+    return group_by
+
+
+def _parse_date_filters(text: str, date_column: Optional[str]) -> List[Dict]:
+    if not date_column:
+        return []
+    filters = []
+    between = re.search(r'entre (\d{1,2}/\d{1,2}/\d{4}) e (\d{1,2}/\d{1,2}/\d{4})', text)
+    if between:
+        start = pd.to_datetime(between.group(1), dayfirst=True)
+        end = pd.to_datetime(between.group(2), dayfirst=True) + pd.Timedelta(days=1)
+        filters.append({'column': date_column, 'op': 'between',
+                        'value': [start.isoformat(), end.isoformat()]})
+        return filters
+
+    for name, number in MONTHS.items():
+        if re.search(rf'\b{name}\b', text):
+            filters.append({'column': date_column, 'op': 'month', 'value': number})
+            break
+    year = re.search(r'\b(19|20)\d{2}\b', text)
+    if year:
+        filters.append({'column': date_column, 'op': 'year', 'value': int(year.group(0))})
+    return filters
+
+
+def _parse_value_column(text: str, columns: Sequence[str], numeric_columns: Sequence[str],
+                        relevant_columns: Sequence[str]) -> Optional[str]:
+    if re.search(r'valor(es)? unitario', text):
+        column = resolve_role(columns, 'valor_unitario')
+        if column:
+            return column
+    if re.search(r'\bquantidade\b', text) and not re.search(r'quantidade de (notas|nfs?|nf-e|itens|registros|linhas)', text):
+        column = resolve_role(columns, 'quantidade')
+        if column:
+            return column
+    column = resolve_role(columns, 'valor')
+    if column:
+        return column
+    # Fora do layout NF-e: primeira coluna numérica entre as mais relevantes pela similaridade
+    for col in relevant_columns:
+        if col in numeric_columns:
+            return col
+    return None
+
+
+def _unused_filter_terms(text: str, plan: Dict) -> List[str]:
+    """
+    Termos de filtro da pergunta que o plano não aplica: números e datas fora do top-N e do
+    período, meses sem coluna de data e identificadores (chave de acesso, CNPJ, número da nota).
+    """
+    consumed = []
+    if plan['operation'] == 'top':
+        consumed += TOP_PATTERNS
+    for flt in plan['filters']:
+        if flt['op'] == 'between':
+            consumed.append(r'entre \d{1,2}/\d{1,2}/\d{4} e \d{1,2}/\d{1,2}/\d{4}')
+        elif flt['op'] == 'month':
+            consumed += [rf'\b{name}\b' for name, number in MONTHS.items() if number == flt['value']]
+        else:
+            consumed.append(rf"\b{flt['value']}\b")
+    for pattern in consumed:
+        text = re.sub(pattern, ' ', text, count=1)
+
+    unused = re.findall(r'\d+(?:[/.,-]\d+)*', text)
+    unused += [name for name in MONTHS if re.search(rf'\b{name}\b', text)]
+    unused += [match.group(0) for match in re.finditer(IDENTIFIER_FILTER, text)
+               if not text[:match.start()].endswith('por ')]
+    return unused
+
+
+def build_plan(query: str, df: pd.DataFrame, relevant_columns: Sequence[str] = ()) -> Optional[Dict]:
+    """
+    Converte a pergunta em um plano de agregação estruturado.
+
+    Returns:
+        Plano serializável (operação, coluna de valor, agrupamentos, filtros, período) ou
+        None quando a pergunta não corresponde a uma agregação conhecida ou tem filtros
+        que o plano não aplica (ex.: número da nota, chave de acesso)
+    """
+    text = normalize_query(query)
+    columns = list(df.columns)
+    numeric_columns = [col for col in columns if pd.api.types.is_numeric_dtype(df[col])]
+
+    operation, limit, descending = _parse_operation(text)
+    if not operation:
+        return None
+
+    date_column = resolve_role(columns, 'data')
+    if date_column is not None and not pd.api.types.is_datetime64_any_dtype(df[date_column]):
+        date_column = None
+
+    group_by = _parse_group_by(text, columns, operation)
+    bucket = None
+    if date_column and re.search(r'\bpor mes\b|\bmensa(l|is)\b|\bmes a mes\b|\bcada mes\b', text):
+        bucket = 'M'
+
+    value_column = None
+    count_column = None
+    if operation == 'count':
+        # "Quantas notas": conta chaves distintas quando o arquivo é de itens
+        if re.search(r'\b(notas|nfs?|nf-e)\b', text):
+            count_column = resolve_role(columns, 'nota')
+    else:
+        value_column = _parse_value_column(text, columns, numeric_columns, relevant_columns)
+        if value_column is None:
+            return None
+
+    if operation in ('max', 'min') and group_by:
+        # "Maior fornecedor": ranking do valor somado por grupo, apenas o primeiro
+        operation, limit, descending = 'top', 1, operation == 'max'
+    if operation == 'top' and not group_by:
+        group_by = [col for col in relevant_columns if col not in numeric_columns and col != value_column][:1]
+        if not group_by:
+            return None
+
+    plan = {
+        'operation': operation,
+        'value_column': value_column,
+        'count_column': count_column,
+        'group_by': group_by,
+        'bucket': bucket,
+        'date_column': date_column,
+        'filters': _parse_date_filters(text, date_column),
+        'limit': limit,
+        'descending': descending
+    }
+    # Um filtro ignorado responderia sobre o dataset inteiro: melhor deixar para o LLM
+    unused = _unused_filter_terms(text, plan)
+    if unused:
+        logger.info(f"Pergunta com filtros que o plano não aplica: {', '.join(unused)}")
+        return None
+    return plan
+
+
+def query_signature(query: str) -> Tuple:
+    """
+    Partes da pergunta que decidem o plano (operação e top-N, dimensões citadas, período, meses,
+    números e datas, coluna de valor): perguntas parecidas só são equivalentes com a mesma assinatura.
+    """
+    text = normalize_query(query)
+    return (
+        _parse_operation(text),
+        tuple(role for pattern, role in GROUP_KEYWORDS if re.search(pattern, text)),
+        bool(re.search(r'\bpor mes\b|\bmensa(l|is)\b|\bmes a mes\b|\bcada mes\b', text)),
+        tuple(name for name in MONTHS if re.search(rf'\b{name}\b', text)),
+        tuple(re.findall(r'\d+(?:/\d+)*', text)),
+        bool(re.search(r'valor(es)? unitario', text)),
+        bool(re.search(r'\bquantidade\b', text)),
+        bool(re.search(r'\b(notas|nfs?|nf-e)\b', text)),
+    )
+
+
+def plan_columns(plan: Dict) -> List[str]:
+    """Colunas necessárias para executar o plano (para leitura seletiva)."""
+    columns = list(plan['group_by'])
+    for col in (plan['value_column'], plan['count_column']):
+        if col:
+            columns.append(col)
+    if plan['bucket'] or plan['filters']:
+        columns.append(plan['date_column'])
+    return list(dict.fromkeys(columns))
+
+
+def filter_mask(df: pd.DataFrame, filters: List[Dict]) -> Optional[pd.Series]:
+    mask = None
+    for flt in filters:
+        values = df[flt['column']]
+        if flt['op'] == 'between':
+            start, end = (pd.Timestamp(value) for value in flt['value'])
+            condition = (values >= start) & (values < end)
+        elif flt['op'] == 'month':
+            condition = values.dt.month == flt['value']
+        elif flt['op'] == 'year':
+            condition = values.dt.year == flt['value']
+        else:
+            raise ValueError(f"Filtro desconhecido: {flt['op']}")
+        mask = condition if mask is None else mask & condition
+    return mask
+
+
+def group_keys(df: pd.DataFrame, plan: Dict) -> List:
+    keys = [df[col] for col in plan['group_by']]
+    if plan['bucket']:
+        keys.append(df[plan['date_column']].dt.to_period(plan['bucket']).rename('periodo'))
+    return keys
+
+
+def execute_plan(df: pd.DataFrame, plan: Dict) -> Dict:
+    """
+    Executa o plano de forma vetorizada sobre o DataFrame.
+
+    Returns:
+        {'value': escalar} para agregações sem agrupamento ou
+        {'table': [{...}, ...]} com uma linha por grupo
+    """
+    needed = plan_columns(plan)
+    if needed:
+        df = df[needed]
+    mask = filter_mask(df, plan['filters'])
+    if mask is not None:
+        df = df[mask]
+
+    operation = plan['operation']
+    value_column = plan['value_column']
+    keys = group_keys(df, plan)
+
+    if not keys:
+        if operation == 'count':
+            if plan['count_column']:
+                return {'value': int(df[plan['count_column']].nunique())}
+            return {'value': int(len(df))}
+        series = df[value_column]
+        value = getattr(series, operation)()
+        return {'value': None if pd.isna(value) else float(value)}
+
+    grouped = df.groupby(keys, observed=True, sort=False)
+    if operation == 'count':
+        values = grouped[plan['count_column']].nunique() if plan['count_column'] else grouped.size()
+    else:
+        values = getattr(grouped[value_column], 'sum' if operation == 'top' else operation)()
+    return {'table': series_to_table(values, plan)}
+
+
+def _combine(partials: List[pd.Series], how: str) -> pd.Series:
+    """Reagrega resultados parciais por grupo (índices iguais entre blocos são o mesmo grupo)."""
+    combined = pd.concat(partials)
+    return getattr(combined.groupby(level=list(range(combined.index.nlevels)), sort=False), how)()
+
+
+def partial_aggregate(df: pd.DataFrame, plan: Dict) -> Dict:
+    """
+    Agregado parcial do plano sobre um bloco ou partição dos dados: contagem de linhas,
+    soma e não nulos, extremo, pares (grupo, valor) distintos ou séries por grupo.
+    Parciais de blocos diferentes são combinados por `merge_partials`.
+    """
+    operation = plan['operation']
+    value_column, count_column = plan['value_column'], plan['count_column']
+    partial = {'rows': 0, 'total': 0.0, 'non_null': 0, 'extreme': None, 'distinct': None, 'values': [], 'counts': []}
+
+    needed = plan_columns(plan)
+    if needed:
+        df = df[needed]
+    mask = filter_mask(df, plan['filters'])
+    if mask is not None:
+        df = df[mask]
+    keys = group_keys(df, plan)
+
+    if operation == 'count' and count_column:
+        # Contagem de distintos: só os pares (grupo, valor) distintos do bloco
+        partial['distinct'] = pd.DataFrame({
+            **{f"k{i}": key.reset_index(drop=True) for i, key in enumerate(keys)},
+            'valor': df[count_column].reset_index(drop=True)
+        }).dropna().drop_duplicates()
+        return partial
+
+    if not keys:
+        partial['rows'] = len(df)
+        if operation == 'count':
+            return partial
+        series = df[value_column]
+        if operation in ('sum', 'mean'):
+            partial['total'] = float(series.sum())
+            partial['non_null'] = int(series.count())
+        else:
+            value = getattr(series, operation)()
+            partial['extreme'] = None if pd.isna(value) else value
+        return partial
+
+    grouped = df.groupby(keys, observed=True, sort=False)
+    if operation == 'count':
+        partial['values'].append(grouped.size())
+    elif operation == 'mean':
+        partial['values'].append(grouped[value_column].sum())
+        partial['counts'].append(grouped[value_column].count())
+    else:
+        partial['values'].append(getattr(grouped[value_column], 'sum' if operation == 'top' else operation)())
+    return partial
+
+
+def merge_partials(partials: Iterable[Dict], plan: Dict) -> Dict:
+    """Combina agregados parciais (na ordem em que chegam) no resultado de `execute_plan`."""
+    operation, count_column = plan['operation'], plan['count_column']
+    rows, total, non_null = 0, 0.0, 0
+    extreme = None
+    distinct: Optional[pd.DataFrame] = None
+    values: List[pd.Series] = []
+    counts: List[pd.Series] = []
+
+    for partial in partials:
+        rows += partial['rows']
+        total += partial['total']
+        non_null += partial['non_null']
+        if partial['extreme'] is not None:
+            extreme = partial['extreme'] if extreme is None \
+                else (max if operation == 'max' else min)(extreme, partial['extreme'])
+        if partial['distinct'] is not None:
+            distinct = partial['distinct'] if distinct is None \
+                else pd.concat([distinct, partial['distinct']]).drop_duplicates()
+        values.extend(partial['values'])
+        counts.extend(partial['counts'])
+
+    names = list(plan['group_by']) + (['periodo'] if plan['bucket'] else [])
+    if operation == 'count' and count_column:
+        if distinct is None:
+            return {'value': 0} if not names else {'table': []}
+        if not names:
+            return {'value': int(len(distinct))}
+        result = distinct.groupby([f"k{i}" for i in range(len(names))], sort=False)['valor'].size()
+        result.index.names = names
+        return {'table': series_to_table(result, plan)}
+
+    if not names:
+        if operation == 'count':
+            return {'value': int(rows)}
+        if operation == 'sum':
+            return {'value': total}
+        if operation == 'mean':
+            return {'value': total / non_null if non_null else None}
+        return {'value': None if extreme is None else float(extreme)}
+
+    if not values:
+        return {'table': []}
+    how = {'count': 'sum', 'top': 'sum', 'sum': 'sum', 'mean': 'sum', 'max': 'max', 'min': 'min'}[operation]
+    result = _combine(values, how)
+    if operation == 'mean':
+        result = result / _combine(counts, 'sum')
+    return {'table': series_to_table(result, plan)}
+
+
+def execute_plan_chunked(chunks: Iterable[pd.DataFrame], plan: Dict) -> Dict:
+    """
+    Executa o plano bloco a bloco com agregados parciais, no mesmo formato de `execute_plan`.
+
+    Cada bloco é filtrado e reduzido (soma, contagem, mínimo/máximo ou pares distintos) antes
+    do próximo ser lido: a memória fica limitada ao tamanho do bloco mais os agregados.
+    """
+    return merge_partials((partial_aggregate(df, plan) for df in chunks), plan)
+
+
+def series_to_table(values: pd.Series, plan: Dict) -> List[Dict]:
+    """Ordena e limita o resultado agrupado e o converte em linhas serializáveis."""
+    if plan['bucket'] and plan['operation'] != 'top':
+        values = values.sort_index()
+    else:
+        values = values.sort_values(ascending=not plan['descending'])
+    if plan['limit']:
+        values = values.head(plan['limit'])
+
+    value_name = result_label(plan)
+    table = values.rename(value_name).reset_index()
+    for col in table.columns:
+        if isinstance(table[col].dtype, pd.PeriodDtype):
+            table[col] = table[col].astype(str)
+    return [
+        {key: (value.item() if hasattr(value, 'item') else value) for key, value in row.items()}
+        for row in table.to_dict(orient='records')
+    ]
+
+
+def result_label(plan: Dict) -> str:
+    names = {'sum': 'total', 'count': 'quantidade', 'mean': 'media', 'max': 'maximo', 'min': 'minimo', 'top': 'total'}
+    label = names[plan['operation']]
+    target = plan['value_column'] or plan['count_column']
+    return f"{label}_{target}" if target else label
+
+
+def describe_plan(plan: Dict) -> str:
+    """Descrição curta do plano, usada nas respostas."""
+    parts = []
+    for flt in plan['filters']:
+        if flt['op'] == 'month':
+            parts.append(f"em {MONTH_NAMES[flt['value'] - 1]}")
+        elif flt['op'] == 'year':
+            parts.append(f"em {flt['value']}")
+        elif flt['op'] == 'between':
+            start = pd.Timestamp(flt['value'][0]).strftime('%d/%m/%Y')
+            end = (pd.Timestamp(flt['value'][1]) - pd.Timedelta(days=1)).strftime('%d/%m/%Y')
+            parts.append(f"entre {start} e {end}")
+    if plan['group_by']:
+        parts.append(f"por {', '.join(plan['group_by'])}")
+    if plan['bucket']:
+        parts.append("por mês")
+    return " ".join(parts)
+
+
+def format_answer(plan: Dict, result: Dict) -> str:
+    """Monta a resposta em linguagem natural para o resultado da agregação."""
+    scope = describe_plan(plan)
+    scope = f" {scope}" if scope else ""
+    operation = plan['operation']
+
+    if 'value' in result:
+        value = result['value']
+        if value is None:
+            return f"Nenhum registro encontrado{scope}."
+        if operation == 'count':
+            what = 'notas' if plan['count_column'] else 'registros'
+            return f"Foram encontrados {value:,.0f} {what}{scope}."
+        labels = {'sum': 'O total', 'mean': 'A média', 'max': 'O maior valor', 'min': 'O menor valor'}
+        return f"{labels[operation]} de {plan['value_column']}{scope} é {value:,.2f}"
+
+    table = result['table']
+    if not table:
+        return f"Nenhum registro encontrado{scope}."
+    label = result_label(plan)
+    lines = []
+    for row in table:
+        key = " / ".join(str(value) for name, value in row.items() if name != label)
+        value = row[label]
+        lines.append(f"- {key}: {value:,.0f}" if operation == 'count' else f"- {key}: {value:,.2f}")
+    if operation == 'top':
+        header = f"Top {len(table)} por {plan['value_column']}{scope}:"
+    else:
+        names = {'sum': 'Total', 'count': 'Quantidade', 'mean': 'Média', 'max': 'Máximo', 'min': 'Mínimo'}
+        target = plan['value_column'] or ('notas' if plan['count_column'] else 'registros')
+        header = f"{names[operation]} de {target}{scope}:"
+    return header + "\n" + "\n".join(lines)
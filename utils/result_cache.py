@@ -0,0 +1,218 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+
+from config.settings import settings
+from utils.query_engine import normalize_query, query_signature
+from utils.tracing import add_count
+
+if TYPE_CHECKING:
+    from utils.embedding_utils import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    """Tipos numpy/pandas nas respostas (escalares, datas) em valores JSON."""
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class ResultCache:
+    """
+    Respostas já calculadas por (hash do conteúdo do upload, pergunta normalizada), com TTL
+    e limite de entradas.
+
+    Duas camadas: LRU em memória no processo e, com `directory`, arquivos JSON compartilhados
+    entre processos/workers (cada worker promove para a memória o que encontra no disco).
+    Com `similarity` > 0, uma pergunta escrita de outro jeito também é atendida se o embedding
+    dela tiver similaridade de cosseno >= `similarity` com uma pergunta em memória do mesmo
+    dataset e a mesma assinatura (operação, dimensões, período; ver `query_signature`).
+    """
+
+    def __init__(self, ttl: float, max_entries: int, directory: Optional[str] = None,
+                 max_files: int = 10000, similarity: float = 0.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory or None
+        self.max_files = max_files
+        self.similarity = similarity
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(dataset_key: str, query: str) -> str:
+        return hashlib.sha256(f"{dataset_key}|{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _embed(self, query: str, embeddings: Optional['EmbeddingService']) -> Optional[np.ndarray]:
+        if embeddings is None or self.similarity <= 0:
+            return None
+        vector = np.asarray(embeddings.encode_cached([normalize_query(query)])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remember(self, key: str, entry: Dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _from_memory(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires_at'] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _from_file(self, key: str) -> Optional[Dict]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada inválida no cache de respostas {path}: {e}")
+            return None
+        if entry['expires_at'] < time.time():
+            self._remove_file(path)
+            return None
+        if entry.get('embedding') is not None:
+            entry['embedding'] = np.asarray(entry['embedding'], dtype=np.float32)
+        self._remember(key, entry)
+        return entry
+
+    def _similar(self, dataset_key: str, query: str, vector: np.ndarray) -> Optional[Dict]:
+        # Mesma forma da assinatura guardada (JSON: tuplas viram listas)
+        signature = json.loads(json.dumps(query_signature(query)))
+        now = time.time()
+        best, best_score = None, self.similarity
+        with self._lock:
+            for entry in self._entries.values():
+                if entry['dataset_key'] != dataset_key or entry.get('embedding') is None \
+                        or entry['expires_at'] < now or entry['signature'] != signature:
+                    continue
+                score = float(entry['embedding'] @ vector)
+                if score >= best_score:
+                    best, best_score = entry, score
+        if best is not None:
+            logger.info(f"Pergunta similar no cache de respostas ({best_score:.3f}): {best['query']}")
+        return best
+
+    def get(self, dataset_key: str, query: str, embeddings: Optional['EmbeddingService'] = None) -> Optional[Dict]:
+        """Resposta em cache para a pergunta (ou uma equivalente) no dataset, ou None."""
+        key = self.key_for(dataset_key, query)
+        entry = self._from_memory(key) or self._from_file(key)
+        if entry is None:
+            vector = self._embed(query, embeddings)
+            if vector is not None:
+                entry = self._similar(dataset_key, query, vector)
+        if entry is None:
+            add_count('result_cache_misses')
+            return None
+        add_count('result_cache_hits')
+        return copy.deepcopy(entry['value'])
+
+    def put(self, dataset_key: str, query: str, value: Dict, embeddings: Optional['EmbeddingService'] = None):
+        """Guarda a resposta nas duas camadas; o valor precisa ser serializável em JSON."""
+        key = self.key_for(dataset_key, query)
+        vector = self._embed(query, embeddings)
+        # Ida e volta pelo JSON: a memória guarda exatamente o que outro worker leria do disco
+        payload = json.dumps({
+            'expires_at': time.time() + self.ttl,
+            'dataset_key': dataset_key,
+            'query': query,
+            'signature': query_signature(query),
+            'embedding': vector.tolist() if vector is not None else None,
+            'value': value
+        }, ensure_ascii=False, default=_json_default)
+        entry = json.loads(payload)
+        if vector is not None:
+            entry['embedding'] = vector
+        self._remember(key, entry)
+
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+                self._evict_files()
+            except OSError as e:
+                logger.warning(f"Falha ao gravar no cache de respostas: {e}")
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict_files(self):
+        """Mantém no máximo `max_files` arquivos, removendo os gravados há mais tempo."""
+        files: List[str] = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(files) <= self.max_files:
+            return
+        paths = [os.path.join(self.directory, name) for name in files]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                continue
+        for path in sorted(mtimes, key=mtimes.get)[:len(mtimes) - self.max_files]:
+            self._remove_file(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    self._remove_file(os.path.join(self.directory, name))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Retorna o cache de respostas do processo."""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    ttl=settings.RESULT_CACHE_TTL,
+                    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+                    directory=settings.RESULT_CACHE_DIR,
+                    max_files=settings.RESULT_CACHE_MAX_FILES,
+                    similarity=settings.RESULT_CACHE_SIMILARITY
+                )
+    return _result_cache
@@ -0,0 +1,346 @@
+import os
+import re
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+from utils.file_utils import is_zip_member, iter_csv_chunks, split_zip_member
+from utils.nfe_schema import detect_schema, normalize_column_name
+from utils.query_engine import result_label
+
+logger = logging.getLogger(__name__)
+
+# Tabela interna com a origem, o esquema NF-e e os dtypes de cada tabela carregada
+TABLES_METADATA = '_tabelas'
+JOIN_KEY = 'CHAVE DE ACESSO'
+
+
+def _duckdb_available() -> bool:
+    try:
+        import duckdb  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def source_id(csv_path: str) -> str:
+    """
+    Identidade do CSV dentro do upload: o caminho completo do membro no ZIP (o mesmo em
+    qualquer cópia do upload) ou, para arquivos extraídos, o caminho absoluto.
+    """
+    if is_zip_member(csv_path):
+        return split_zip_member(csv_path)[1]
+    return os.path.abspath(csv_path)
+
+
+def table_name_for(csv_path: str) -> str:
+    """
+    Nome de tabela estável a partir do nome do arquivo CSV, com um hash do caminho
+    completo: CSVs de mesmo nome em pastas diferentes do ZIP não colidem.
+    """
+    base = os.path.splitext(os.path.basename(source_id(csv_path)))[0]
+    name = re.sub(r'\W+', '_', normalize_column_name(base).lower()).strip('_')
+    digest = hashlib.sha1(source_id(csv_path).encode('utf-8')).hexdigest()[:8]
+    return f"t_{name}_{digest}" if not name or name[0].isdigit() else f"{name}_{digest}"
+
+
+def _prepare_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Limpeza por bloco (como no ProcessingAgent) e tipos aceitos pelo banco."""
+    chunk = chunk.dropna(how='all')
+    chunk.columns = [str(col).lower() for col in chunk.columns]
+    for col in chunk.columns:
+        values = chunk[col]
+        if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(values):
+            chunk[col] = values.astype(object).where(values.notna(), '')
+    return chunk
+
+
+class SQLBackend:
+    """
+    Banco analítico embarcado (DuckDB quando disponível, senão SQLite) com as tabelas
+    carregadas dos CSVs de um upload, persistido em disco.
+    """
+
+    def __init__(self, database: str, engine: Optional[str] = None):
+        self.database = database
+        self.engine = engine or ('duckdb' if _duckdb_available() else 'sqlite')
+        os.makedirs(os.path.dirname(database) or '.', exist_ok=True)
+        self._lock = threading.RLock()
+        if self.engine == 'duckdb':
+            import duckdb
+            self.connection = duckdb.connect(database)
+        else:
+            self.connection = sqlite3.connect(database, check_same_thread=False)
+        self._execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLES_METADATA} "
+            "(name TEXT PRIMARY KEY, source TEXT, nfe_schema TEXT, dtypes TEXT)"
+        )
+
+    @classmethod
+    def for_dataset(cls, dataset_key: str) -> 'SQLBackend':
+        """Abre (ou cria) o banco do upload identificado pelo hash do conteúdo."""
+        extension = 'duckdb' if _duckdb_available() else 'sqlite'
+        return get_sql_backend(os.path.join(settings.WAREHOUSE_DIR, f"{dataset_key}.{extension}"))
+
+    @classmethod
+    def from_handle(cls, handle: Dict) -> 'SQLBackend':
+        return get_sql_backend(handle['database'], engine=handle.get('engine'))
+
+    def _execute(self, sql: str, params: Tuple = ()):
+        with self._lock:
+            cursor = self.connection.execute(sql, params)
+            if self.engine == 'sqlite':
+                self.connection.commit()
+            return cursor
+
+    def query(self, sql: str, params: Tuple = ()) -> pd.DataFrame:
+        """Executa uma consulta SQL arbitrária (ex.: joins entre cabeçalho e itens)."""
+        with self._lock:
+            if self.engine == 'duckdb':
+                return self.connection.execute(sql, params).df()
+            return pd.read_sql_query(sql, self.connection, params=params)
+
+    def table_info(self, table: str) -> Optional[Dict]:
+        rows = self._execute(
+            f"SELECT source, nfe_schema, dtypes FROM {TABLES_METADATA} WHERE name = ?", (table,)
+        ).fetchall()
+        if not rows:
+            return None
+        source, schema, dtypes = rows[0]
+        return {'source': source, 'schema': schema, 'dtypes': json.loads(dtypes)}
+
+    def tables(self) -> Dict[str, Dict]:
+        rows = self._execute(f"SELECT name, nfe_schema FROM {TABLES_METADATA}").fetchall()
+        return {name: {'schema': schema} for name, schema in rows}
+
+    def load_csv(self, table: str, csv_path: str, chunksize: Optional[int] = None,
+                 on_chunk: Optional[Callable[[pd.DataFrame], None]] = None) -> int:
+        """
+        Carrega o CSV em blocos para a tabela, uma única vez; retorna o número de linhas.
+        `on_chunk` recebe cada bloco já limpo (ex.: para calcular estatísticas na mesma leitura).
+        """
+        info = self.table_info(table)
+        if info is not None:
+            if source_id(info['source']) == source_id(csv_path):
+                return self.count(table)
+            logger.warning(f"Tabela {table} carregada de {info['source']}; recarregando de {csv_path}")
+
+        chunksize = chunksize or settings.SQL_CHUNK_SIZE
+        rows, dtypes, schema = 0, None, None
+        with self._lock:
+            self._execute(f"DELETE FROM {TABLES_METADATA} WHERE name = ?", (table,))
+            self._execute(f"DROP TABLE IF EXISTS {quote(table)}")
+            for chunk in iter_csv_chunks(csv_path, chunksize):
+                if dtypes is None:
+                    schema = detect_schema(chunk.columns)
+                    dtypes = {str(col).lower(): str(dtype) for col, dtype in chunk.dtypes.items()}
+                chunk = _prepare_chunk(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                self._append(table, chunk, create=rows == 0)
+                rows += len(chunk)
+            self._execute(
+                f"INSERT INTO {TABLES_METADATA} VALUES (?, ?, ?, ?)",
+                (table, csv_path, schema, json.dumps(dtypes or {}))
+            )
+        logger.info(f"Tabela {table} carregada no banco {self.database} ({rows} linhas)")
+        self.create_join_views()
+        return rows
+
+    def _append(self, table: str, chunk: pd.DataFrame, create: bool):
+        if self.engine == 'duckdb':
+            self.connection.register('_chunk', chunk)
+            try:
+                if create:
+                    self.connection.execute(f"CREATE TABLE {quote(table)} AS SELECT * FROM _chunk")
+                else:
+                    self.connection.execute(f"INSERT INTO {quote(table)} SELECT * FROM _chunk")
+            finally:
+                self.connection.unregister('_chunk')
+        else:
+            chunk.to_sql(table, self.connection, if_exists='append', index=False)
+
+    def _register_view(self, view: str, sources: List[str], schema: Optional[str], dtypes: Dict[str, str]):
+        """Registra a visão nos metadados para que as leituras restaurem os dtypes originais."""
+        self._execute(f"DELETE FROM {TABLES_METADATA} WHERE name = ?", (view,))
+        self._execute(
+            f"INSERT INTO {TABLES_METADATA} VALUES (?, ?, ?, ?)",
+            (view, ','.join(sources), schema, json.dumps(dtypes))
+        )
+
+    def create_union_view(self, tables: List[str]) -> str:
+        """Visão UNION ALL de tabelas com as mesmas colunas (ex.: um arquivo por período)."""
+        if len(tables) == 1:
+            return tables[0]
+        view = "uniao_" + hashlib.sha1(','.join(tables).encode('utf-8')).hexdigest()[:12]
+        with self._lock:
+            if self.table_info(view) is None:
+                union = " UNION ALL ".join(f"SELECT * FROM {quote(table)}" for table in tables)
+                self._execute(f"DROP VIEW IF EXISTS {quote(view)}")
+                self._execute(f"CREATE VIEW {quote(view)} AS {union}")
+                info = self.table_info(tables[0])
+                self._register_view(view, tables, info['schema'], info['dtypes'])
+        return view
+
+    def create_join_view(self, item: str, header: str) -> str:
+        """Visão dos itens com as colunas do cabeçalho que faltam neles, pela chave de acesso."""
+        view = f"{item}_com_{header}"
+        key = quote(JOIN_KEY.lower())
+        item_columns = self.columns(item)
+        extra = [col for col in self.columns(header) if col not in item_columns]
+        selected = ", ".join(["i.*"] + [f"h.{quote(col)}" for col in extra])
+        with self._lock:
+            self._execute(f"DROP VIEW IF EXISTS {quote(view)}")
+            self._execute(
+                f"CREATE VIEW {quote(view)} AS SELECT {selected} "
+                f"FROM {quote(item)} i JOIN {quote(header)} h ON i.{key} = h.{key}"
+            )
+            dtypes = dict(self.table_info(header)['dtypes'], **self.table_info(item)['dtypes'])
+            # Sem esquema NF-e: a visão não entra em novos joins
+            self._register_view(view, [item, header], None, dtypes)
+        return view
+
+    def create_join_views(self):
+        """Cria a visão itens + cabeçalho (join pela chave de acesso) quando os dois estão carregados."""
+        tables = self.tables()
+        headers = [name for name, info in tables.items() if info['schema'] == 'nfe_cabecalho']
+        items = [name for name, info in tables.items() if info['schema'] == 'nfe_itens']
+        for header in headers:
+            for item in items:
+                self.create_join_view(item, header)
+
+    def columns(self, table: str) -> List[str]:
+        with self._lock:
+            cursor = self.connection.execute(f"SELECT * FROM {quote(table)} LIMIT 0")
+            return [description[0] for description in cursor.description]
+
+    def count(self, table: str) -> int:
+        return int(self._execute(f"SELECT COUNT(*) FROM {quote(table)}").fetchone()[0])
+
+    def column_sum(self, table: str, column: str) -> Optional[float]:
+        value = self._execute(f"SELECT SUM({quote(column)}) FROM {quote(table)}").fetchone()[0]
+        return None if value is None else float(value)
+
+    def head(self, table: str, n: int) -> pd.DataFrame:
+        """Primeiras linhas da tabela com os dtypes originais do CSV (para amostras e planejamento)."""
+        return self.select(table, limit=n)
+
+    def select(self, table: str, columns: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """Lê colunas da tabela restaurando os dtypes originais do CSV."""
+        selected = ", ".join(quote(col) for col in columns) if columns else "*"
+        sql = f"SELECT {selected} FROM {quote(table)}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        df = self.query(sql)
+        info = self.table_info(table)
+        for col, dtype in (info['dtypes'] if info else {}).items():
+            if col not in df.columns or str(df[col].dtype) == dtype:
+                continue
+            try:
+                if dtype.startswith('datetime64'):
+                    df[col] = pd.to_datetime(df[col], errors='coerce')
+                else:
+                    df[col] = df[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+        return df
+
+    def _date_part(self, column: str, part: str) -> str:
+        if self.engine == 'duckdb':
+            return f"{part}({column})"
+        fmt = {'month': '%m', 'year': '%Y'}[part]
+        return f"CAST(strftime('{fmt}', {column}) AS INTEGER)"
+
+    def _month_bucket(self, column: str) -> str:
+        if self.engine == 'duckdb':
+            return f"strftime({column}, '%Y-%m')"
+        return f"strftime('%Y-%m', {column})"
+
+    def compile_plan(self, table: str, plan: Dict) -> Tuple[str, Tuple]:
+        """Traduz o plano de agregação (utils.query_engine) para SQL parametrizado."""
+        keys = [quote(col) for col in plan['group_by']]
+        selects = list(keys)
+        if plan['bucket']:
+            keys.append(self._month_bucket(quote(plan['date_column'])))
+            selects.append(f"{keys[-1]} AS periodo")
+
+        operation = plan['operation']
+        if operation == 'count':
+            aggregate = f"COUNT(DISTINCT {quote(plan['count_column'])})" if plan['count_column'] else "COUNT(*)"
+        else:
+            function = {'sum': 'SUM', 'top': 'SUM', 'mean': 'AVG', 'min': 'MIN', 'max': 'MAX'}[operation]
+            aggregate = f"{function}({quote(plan['value_column'])})"
+        selects.append(f"{aggregate} AS {quote(result_label(plan))}")
+
+        where, params = [], []
+        for flt in plan['filters']:
+            column = quote(flt['column'])
+            if flt['op'] == 'between':
+                where.append(f"{column} >= ? AND {column} < ?")
+                params.extend(pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S') for value in flt['value'])
+            else:
+                where.append(f"{self._date_part(column, flt['op'])} = ?")
+                params.append(flt['value'])
+
+        sql = f"SELECT {', '.join(selects)} FROM {quote(table)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if keys:
+            sql += " GROUP BY " + ", ".join(keys)
+            if plan['bucket'] and operation != 'top':
+                sql += " ORDER BY periodo"
+            else:
+                sql += f" ORDER BY {quote(result_label(plan))} {'DESC' if plan['descending'] else 'ASC'}"
+            if plan['limit']:
+                sql += f" LIMIT {int(plan['limit'])}"
+        return sql, tuple(params)
+
+    def execute_plan(self, table: str, plan: Dict) -> Dict:
+        """Executa a agregação dentro do banco; mesmo formato de retorno de query_engine.execute_plan."""
+        sql, params = self.compile_plan(table, plan)
+        result = self.query(sql, params)
+        label = result_label(plan)
+        if not plan['group_by'] and not plan['bucket']:
+            value = result[label].iloc[0] if not result.empty else None
+            if value is None or pd.isna(value):
+                return {'value': None}
+            return {'value': int(value) if plan['operation'] == 'count' else float(value)}
+        return {'table': [
+            {key: (value.item() if hasattr(value, 'item') else value) for key, value in row.items()}
+            for row in result.to_dict(orient='records')
+        ]}
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+_backends: Dict[str, SQLBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_sql_backend(database: str, engine: Optional[str] = None) -> SQLBackend:
+    """Conexão compartilhada por banco no processo (o DuckDB aceita um único escritor por arquivo)."""
+    key = os.path.abspath(database)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = SQLBackend(database, engine=engine)
+            _backends[key] = backend
+        return backend
+
+
+def close_sql_backend(database: str):
+    """Fecha e descarta a conexão compartilhada do banco (antes de apagar o arquivo)."""
+    with _backends_lock:
+        backend = _backends.pop(os.path.abspath(database), None)
+    if backend is not None:
+        backend.close()
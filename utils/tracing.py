@@ -0,0 +1,214 @@
+import json
+import logging
+import logging.handlers
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+from config.settings import settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Pico de memória residente do processo até agora (None onde não há `resource`)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB; macOS, em bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Span:
+    """
+    Trecho medido do pipeline: tempo de parede, CPU da thread, crescimento do pico de RSS,
+    atributos (linhas, bytes...) e contadores (chamadas de embeddings, tokens do LLM).
+
+    Os contadores são inclusivos: um incremento vale para o span atual e todos os ancestrais.
+    """
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes: Dict = dict(attributes or {})
+        self.counters: Dict[str, float] = {}
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.thread_time()
+        self._start_rss = peak_rss_bytes()
+        self.wall_time: Optional[float] = None
+        self.cpu_time: Optional[float] = None
+        self.peak_rss_delta: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add(self, counter: str, value: float = 1):
+        span = self
+        while span is not None:
+            with span._lock:
+                span.counters[counter] = span.counters.get(counter, 0) + value
+            span = span.parent
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.wall_time = time.perf_counter() - self._start_wall
+        self.cpu_time = time.thread_time() - self._start_cpu
+        end_rss = peak_rss_bytes()
+        if end_rss is not None and self._start_rss is not None:
+            self.peak_rss_delta = end_rss - self._start_rss
+        if error is not None:
+            self.status = 'error'
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'name': self.name,
+            'start_time': self.start_time,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'peak_rss_delta': self.peak_rss_delta,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+            'counters': dict(self.counters)
+        }
+
+
+class JsonlSpanExporter:
+    """
+    Grava cada span finalizado como uma linha JSON (por padrão em agent_performance.log).
+
+    O arquivo é rotacionado ao passar de `max_bytes` (0 desliga a rotação), mantendo
+    `backup_count` arquivos antigos (.1, .2, ...).
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, backup_count: Optional[int] = None):
+        self.path = path
+        max_bytes = settings.TRACE_LOG_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        backup_count = settings.TRACE_LOG_BACKUPS if backup_count is None else backup_count
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def export(self, span: Dict):
+        line = json.dumps(span, ensure_ascii=False, default=str)
+        self._handler.handle(logging.makeLogRecord({'msg': line, 'levelno': logging.INFO}))
+
+
+class Tracer:
+    """Cria spans aninhados (pelo contexto de execução atual) e os entrega aos exportadores."""
+
+    def __init__(self, exporters: Optional[List] = None, max_traces: int = 100):
+        self.exporters = list(exporters or [])
+        self.max_traces = max_traces
+        self._traces: 'OrderedDict[str, List[Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _record(self, span: Span):
+        data = span.to_dict()
+        with self._lock:
+            self._traces.setdefault(span.trace_id, []).append(data)
+            self._traces.move_to_end(span.trace_id)
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        for exporter in self.exporters:
+            try:
+                exporter.export(data)
+            except Exception as e:
+                logger.warning(f"Falha ao exportar span {span.name}: {e}")
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        span = Span(name, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(error=e)
+            raise
+        else:
+            span.finish()
+        finally:
+            _current_span.reset(token)
+            self._record(span)
+
+    def get_trace(self, trace_id: str) -> List[Dict]:
+        """Spans finalizados de um trace, na ordem de início."""
+        with self._lock:
+            spans = list(self._traces.get(trace_id, []))
+        return sorted(spans, key=lambda span: span['start_time'])
+
+    def recent_traces(self) -> List[str]:
+        with self._lock:
+            return list(reversed(self._traces))
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Tracer do processo; exporta para settings.TRACE_LOG_PATH quando o tracing está ligado."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                exporters = [JsonlSpanExporter(settings.TRACE_LOG_PATH)] if settings.TRACING_ENABLED else []
+                _tracer = Tracer(exporters, max_traces=settings.TRACE_MAX_TRACES)
+    return _tracer
+
+
+def trace(name: str, **attributes):
+    """Context manager que mede o trecho como um span filho do span atual."""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def add_count(counter: str, value: float = 1):
+    """Incrementa um contador no span atual (e nos ancestrais); sem span ativo, não faz nada."""
+    span = _current_span.get()
+    if span is not None:
+        span.add(counter, value)
+
+
+def set_attribute(key: str, value):
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def traced(name: str) -> Callable:
+    """Decorador: executa a função dentro de um span com o nome informado."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+